@@ -0,0 +1,39 @@
+(function () {
+  // suggestions of an AutocompleteSelect search box; the hidden input
+  // before it holds the id of the picked one
+  document.querySelectorAll('[data-autocomplete-url]').forEach((input) => {
+    const hidden = input.previousElementSibling;
+    const options = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+
+    function pick() {
+      const match = Array.from(options.options).find((option) => option.value === input.value);
+      hidden.value = match ? match.dataset.id : '';
+    }
+
+    function suggest() {
+      const query = input.value.trim();
+      if (!query) {
+        return;
+      }
+      const url = input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query);
+      fetch(url, { credentials: 'same-origin' })
+        .then((response) => (response.ok ? response.json() : { results: [] }))
+        .then((data) => {
+          options.replaceChildren(...data.results.map((user) => {
+            const option = document.createElement('option');
+            option.value = user.email;
+            option.dataset.id = user.id;
+            return option;
+          }));
+          pick();
+        });
+    }
+
+    input.addEventListener('input', () => {
+      pick();
+      clearTimeout(timer);
+      timer = setTimeout(suggest, 150);
+    });
+  });
+})();
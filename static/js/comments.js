@@ -0,0 +1,25 @@
+const loadMore = document.getElementById('load-more-comments');
+
+if (loadMore) {
+  loadMore.addEventListener('click', (event) => {
+    event.preventDefault();
+    if (loadMore.dataset.loading) {
+      return;
+    }
+    loadMore.dataset.loading = 'true';
+    const url = loadMore.dataset.url + '?cursor=' + encodeURIComponent(loadMore.dataset.cursor);
+    fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+      .then((response) => response.json())
+      .then((data) => {
+        document.getElementById('comment-list').insertAdjacentHTML('beforeend', data.html);
+        if (data.next) {
+          loadMore.dataset.cursor = data.next;
+        } else {
+          loadMore.remove();
+        }
+      })
+      .finally(() => {
+        delete loadMore.dataset.loading;
+      });
+  });
+}
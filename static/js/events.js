@@ -0,0 +1,74 @@
+(function () {
+  const script = document.currentScript;
+  if (!window.EventSource || !script) {
+    return;
+  }
+  const source = new EventSource(script.dataset.url);
+
+  function showNotice(text) {
+    if (document.getElementById('live-notice')) {
+      return;
+    }
+    const notice = document.createElement('div');
+    notice.id = 'live-notice';
+    notice.className = 'alert alert-info';
+    notice.textContent = text + ' ';
+    const link = document.createElement('a');
+    link.href = window.location.href;
+    link.textContent = 'Refresh';
+    notice.appendChild(link);
+    document.body.prepend(notice);
+  }
+
+  function patch(element, values) {
+    element.querySelectorAll('[data-field]').forEach((cell) => {
+      const value = values[cell.dataset.field];
+      if (value !== undefined && value !== null) {
+        cell.textContent = value;
+      }
+    });
+  }
+
+  function patchTask(event) {
+    const task = event.task;
+    const elements = document.querySelectorAll('[data-task-id="' + task.id + '"]');
+    elements.forEach((element) => {
+      if (event.type === 'task' && event.deleted) {
+        element.remove();
+      } else {
+        patch(element, task);
+      }
+    });
+    return elements.length > 0;
+  }
+
+  function patchSubtask(event) {
+    const list = document.querySelector('[data-subtasks-of="' + event.task.id + '"]');
+    if (!list) {
+      return;
+    }
+    const row = list.querySelector('[data-subtask-id="' + event.id + '"]');
+    if (event.deleted && row) {
+      row.remove();
+    } else if (row) {
+      patch(row, event);
+    } else if (!event.deleted) {
+      showNotice('Subtasks were added.');
+    }
+  }
+
+  source.onmessage = (message) => {
+    const event = JSON.parse(message.data);
+    const shown = patchTask(event);
+    if (event.type === 'subtask') {
+      patchSubtask(event);
+    } else if (event.type === 'task' && !shown && !event.deleted && document.getElementById('task-table-body')) {
+      showNotice('Your tasks have changed.');
+    }
+  };
+
+  // the stream fell behind and dropped events
+  source.addEventListener('reset', () => {
+    showNotice('Some updates were missed.');
+  });
+})();
@@ -1,8 +1,43 @@
 from django.contrib import admin
+from .bulk import bulk_update_tasks
 from .models import User, Task, Comment
 
 # Register your models here.
 
+
+def bulk_action(action, value, description):
+    """admin action applying bulk_update_tasks to the selected tasks"""
+
+    def run(modeladmin, request, queryset):
+        result = bulk_update_tasks(queryset, action, value)
+        modeladmin.message_user(
+            request,
+            f"{result['updated']} of {result['matched']} selected tasks "
+            f"changed, {result['emails']} emails queued.",
+        )
+
+    run.__name__ = f"bulk_{action}_{value or 'all'}".replace("-", "_")
+    return admin.action(description=description)(run)
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ("title", "status", "priority", "assigned_to", "modified")
+    list_filter = ("status", "priority")
+    actions = (
+        [
+            bulk_action("status", status, f"Mark selected tasks {status}")
+            for status, _ in Task.STATUS_CHOICES
+        ]
+        + [
+            bulk_action("priority", priority, f"Set priority to {priority}")
+            for priority, _ in Task.PRIORITY_CHOICES
+        ]
+        + [
+            bulk_action("delete", None, "Delete selected tasks in bulk"),
+        ]
+    )
+
+
 admin.site.register(User)
-admin.site.register(Task)
 admin.site.register(Comment)
@@ -0,0 +1,141 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from . import changelog, counters, fragments
+from .models import (
+    ArchivedComment,
+    ArchivedSubTask,
+    ArchivedTask,
+    Comment,
+    SubTask,
+    Task,
+)
+from .purge import delete_tasks
+
+ARCHIVE_AFTER = timedelta(
+    days=getattr(settings, "TASK_ARCHIVE_AFTER_DAYS", 180)
+)
+BATCH_SIZE = getattr(settings, "TASK_ARCHIVE_BATCH_SIZE", 500)
+COPY_CHUNK_SIZE = 2000
+
+TASK_FIELDS = [
+    field.attname
+    for field in ArchivedTask._meta.concrete_fields
+    if field.name not in ("archived_at", "search_text")
+]
+COMMENT_FIELDS = [
+    field.attname for field in ArchivedComment._meta.concrete_fields
+]
+SUBTASK_FIELDS = [
+    field.attname for field in ArchivedSubTask._meta.concrete_fields
+]
+
+
+class TaskArchiver:
+    """
+    Move completed tasks that have not changed for archive_after, with
+    their comments and subtasks, from the hot tables to the archive
+    tables. Each batch of tasks moves in one transaction, so a task is
+    always in exactly one place. Archived tasks leave the dashboard
+    counters, the participant rows and the search index, and only show
+    up where archived tasks are asked for explicitly.
+    """
+
+    def __init__(self, archive_after=ARCHIVE_AFTER, batch_size=BATCH_SIZE):
+        self.archive_after = archive_after
+        self.batch_size = batch_size
+
+    def due(self):
+        return Task.objects.filter(
+            status="completed",
+            modified__lt=timezone.now() - self.archive_after,
+        )
+
+    def archive(self, task_ids):
+        """move the given tasks if they are still due; returns the count"""
+        now = timezone.now()
+        with transaction.atomic():
+            tasks = list(
+                self.due()
+                .filter(pk__in=task_ids)
+                .select_for_update()
+                .order_by("id")
+                .values(*TASK_FIELDS)
+            )
+            if not tasks:
+                return 0
+            task_ids = [task["id"] for task in tasks]
+            texts = {
+                task["id"]: [task["title"], task["description"]]
+                for task in tasks
+            }
+            comments = Comment.objects.filter(task_reference_id__in=task_ids)
+            subtasks = SubTask.objects.filter(parent_task_id__in=task_ids)
+            ArchivedTask.objects.bulk_create(
+                ArchivedTask(**task, archived_at=now) for task in tasks
+            )
+            self._copy(comments, ArchivedComment, COMMENT_FIELDS, texts)
+            self._copy(subtasks, ArchivedSubTask, SUBTASK_FIELDS)
+            ArchivedTask.objects.bulk_update(
+                [
+                    ArchivedTask(id=task_id, search_text=" ".join(parts))
+                    for task_id, parts in texts.items()
+                ],
+                ["search_text"],
+                batch_size=COPY_CHUNK_SIZE,
+            )
+            counters.tasks_changed((_state(task), None) for task in tasks)
+            changelog.record_tasks(
+                "archived",
+                ((task["id"], _state(task), None) for task in tasks),
+            )
+            delete_tasks(task_ids)
+            fragments.invalidate(task_ids)
+        return len(task_ids)
+
+    def _copy(self, rows, model, fields, texts=None):
+        batch = []
+        for row in (
+            rows.order_by("id").values(*fields).iterator(COPY_CHUNK_SIZE)
+        ):
+            batch.append(model(**row))
+            if texts is not None:
+                texts[row["task_reference_id"]].append(row["comment_text"])
+            if len(batch) >= COPY_CHUNK_SIZE:
+                model.objects.bulk_create(batch)
+                batch = []
+        model.objects.bulk_create(batch)
+
+    def run(self, limit=None):
+        """archive every due task in batches; returns how many moved"""
+        moved = 0
+        while limit is None or moved < limit:
+            size = self.batch_size
+            if limit is not None:
+                size = min(size, limit - moved)
+            task_ids = list(
+                self.due().order_by("id").values_list("id", flat=True)[:size]
+            )
+            if not task_ids:
+                break
+            moved += self.archive(task_ids)
+        return moved
+
+
+def rebuild_indexes(model):
+    """
+    Rebuild the indexes of model's table, which do not shrink by
+    themselves after a large archive run. On PostgreSQL this does not
+    block writes, but it cannot run inside a transaction.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"REINDEX TABLE CONCURRENTLY {table}")
+        elif connection.vendor == "sqlite":
+            cursor.execute(f"REINDEX {table}")
+
+
+def _state(task):
+    return {name: task[name] for name in Task.TRACKED_FIELDS}
@@ -0,0 +1,180 @@
+import gzip
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage,
+    staticfiles_storage,
+)
+from django.core.exceptions import (
+    MiddlewareNotUsed,
+    SuspiciousFileOperation,
+)
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # only gzip variants are written without it
+    brotli = None
+
+# hashed names change with their content, so browsers may keep them
+IMMUTABLE = "public, max-age=31536000, immutable"
+# anything else is checked with the server on every use
+REVALIDATE = "no-cache"
+COMPRESSED_EXTENSIONS = (".css", ".js", ".svg", ".txt", ".json", ".map")
+# (encoding, file suffix), best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+CSS_TOKENS = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|\s+", re.S
+)
+CSS_PUNCTUATION = re.compile(
+    r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|\s*([{};,])\s*|(:)\s+"
+)
+
+
+def minify_css(text):
+    """text without comments and the whitespace CSS does not need"""
+
+    def collapse(match):
+        if match.group(1):
+            return match.group(1)
+        return "" if match.group(2) else " "
+
+    def tighten(match):
+        return match.group(1) or match.group(2) or match.group(3)
+
+    text = CSS_TOKENS.sub(collapse, text)
+    text = CSS_PUNCTUATION.sub(tighten, text)
+    return text.replace(";}", "}").strip()
+
+
+def compress(path):
+    """
+    Write the gzip (and, with the brotli package, brotli) variants of
+    the file at path next to it, unless they would come out no smaller
+    """
+    with open(path, "rb") as source:
+        content = source.read()
+    variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(content)
+    for suffix, data in variants.items():
+        if len(data) < len(content):
+            with open(path + suffix, "wb") as target:
+                target.write(data)
+
+
+class AssetStorage(ManifestStaticFilesStorage):
+    """
+    Static files collected under content hashed names, with stylesheets
+    minified before hashing and precompressed variants of the text files
+    written alongside. Until collectstatic has written a manifest the
+    plain names are used, so development and tests need no build step.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name in paths:
+                if name.endswith(".css"):
+                    with self.open(name) as source:
+                        text = source.read().decode()
+                    with open(self.path(name), "w") as target:
+                        target.write(minify_css(text))
+            # hash the minified copies, not the files they came from
+            paths = {name: (self, name) for name in paths}
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in {*paths, *self.hashed_files.values()}:
+                if name.endswith(COMPRESSED_EXTENSIONS):
+                    compress(self.path(name))
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+def accepted_encodings(header):
+    """the content codings an Accept-Encoding header does not refuse"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        quality = params.strip().lower()
+        if quality.startswith("q=") and quality[2:].strip("0.") == "":
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serve collected static files from STATIC_ROOT, in their brotli or
+    gzip variant when the client accepts it, with far-future immutable
+    caching for hashed names. Other requests, and files not collected,
+    go on to the rest of the stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        if not settings.STATIC_ROOT or "://" in self.prefix:
+            raise MiddlewareNotUsed
+        if not self.prefix.startswith("/"):
+            self.prefix = "/" + self.prefix
+        self.root = os.fspath(settings.STATIC_ROOT)
+        hashed_files = getattr(staticfiles_storage, "hashed_files", {})
+        self.immutable = set(hashed_files.values())
+
+    def __call__(self, request):
+        if request.method in ("GET", "HEAD") and request.path.startswith(
+            self.prefix
+        ):
+            response = self.serve(
+                request, request.path.removeprefix(self.prefix)
+            )
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        if name in self.immutable:
+            cache_control = IMMUTABLE
+        else:
+            cache_control = REVALIDATE
+            if not was_modified_since(
+                request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime
+            ):
+                response = HttpResponseNotModified()
+                response["Cache-Control"] = cache_control
+                return response
+        content_type, _ = mimetypes.guess_type(name)
+        accepted = accepted_encodings(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        encoding = None
+        for coding, suffix in ENCODINGS:
+            if coding in accepted and os.path.isfile(path + suffix):
+                encoding, path = coding, path + suffix
+                break
+        response = FileResponse(
+            open(path, "rb"),
+            content_type=content_type or "application/octet-stream",
+            filename=os.path.basename(name),
+        )
+        if encoding:
+            response["Content-Encoding"] = encoding
+        response["Vary"] = "Accept-Encoding"
+        response["Cache-Control"] = cache_control
+        response["Last-Modified"] = http_date(stat.st_mtime)
+        return response
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models.functions import Lower
+from .metrics import AUTOCOMPLETE_CACHE
+from .models import User
+
+MAX_RESULTS = 10
+# longer prefixes than any email cannot match
+MAX_PREFIX = 254
+CACHE_SIZE = getattr(settings, "AUTOCOMPLETE_CACHE_SIZE", 1024)
+# other processes learn of new users and changed emails this late
+CACHE_SECONDS = getattr(settings, "AUTOCOMPLETE_CACHE_SECONDS", 60)
+
+
+class PrefixCache:
+    """
+    The suggestions of the most recently used prefixes in this process,
+    up to size of them, each kept for at most ttl seconds
+    """
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_SECONDS):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, prefix):
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None or entry[0] < time.monotonic():
+                AUTOCOMPLETE_CACHE.inc(result="miss")
+                return None
+            self._entries.move_to_end(prefix)
+        AUTOCOMPLETE_CACHE.inc(result="hit")
+        return entry[1]
+
+    def put(self, prefix, results):
+        with self._lock:
+            self._entries[prefix] = (time.monotonic() + self.ttl, results)
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = PrefixCache()
+
+
+def suggest_users(prefix, limit=MAX_RESULTS):
+    """
+    [{id, email}] of up to limit users whose email starts with prefix,
+    in any case, by email. The lookup is a range scan of the
+    user_email_prefix_idx index on lower(email).
+    """
+    prefix = prefix.strip().lower()
+    if not prefix or len(prefix) > MAX_PREFIX:
+        return []
+    key = (prefix, limit)
+    results = cache.get(key)
+    if results is None:
+        results = list(
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__startswith=prefix)
+            .order_by("email_lower")
+            .values("id", "email")[:limit]
+        )
+        cache.put(key, results)
+    return results
@@ -0,0 +1,63 @@
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import (
+    DatabaseCreation as PostgresCreation,
+)
+from task_management_app.pool import close_pools, get_pool
+
+
+class DatabaseCreation(PostgresCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # PostgreSQL refuses to drop a database with open connections
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The PostgreSQL backend with connections checked out of a per process
+    ConnectionPool instead of opened for every request, configured with
+    OPTIONS["pool"]: True for the defaults or a dict of the
+    ConnectionPool arguments (min_size, max_size, max_idle, timeout,
+    pre_ping). False connects directly, as the stock backend does.
+    Closing the connection, as Django does at the end of each request,
+    gives it back to the pool.
+    """
+
+    creation_class = DatabaseCreation
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    @property
+    def pool_options(self):
+        options = self.settings_dict["OPTIONS"].get("pool", False)
+        if options is True:
+            return {}
+        return options if isinstance(options, dict) else None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        options = self.pool_options
+        if options is None:
+            return super().get_new_connection(conn_params)
+        self.pool = get_pool(
+            self.alias,
+            conn_params.get("dbname"),
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            options,
+        )
+        return self.pool.acquire()
+
+    def _close(self):
+        if self.connection is None or self.pool is None:
+            return super()._close()
+        pool, self.pool = self.pool, None
+        with self.wrap_database_errors:
+            pool.release(self.connection)
@@ -0,0 +1,398 @@
+import asyncio
+import importlib
+import statistics
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import (
+    DatabaseError,
+    close_old_connections,
+    connection,
+    connections,
+)
+from django.db.backends.signals import connection_created
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import clear_url_caches, reverse
+from . import urls
+from .models import SubTask, User
+from .pool import close_pools, pools
+from .querybudget import QueryCounter
+from .seed import Seeder
+from .visibility import visible_tasks
+
+# GET handlers that change data, which would skew the following runs,
+# POST-only endpoints and the endless event stream
+SKIPPED = {"delete_task", "logout_page", "api_task_bulk", "task_events"}
+# the views with async versions for the ASGI deployment
+HOT_URLS = ("home_page", "task_search", "task_details", "comment_show")
+# cheap views, where opening a connection is most of the work
+POOL_URLS = ("task_details",)
+PARAMS = {
+    "task_search": {"q": "report budget"},
+    "task_export": {"kind": "tasks", "format": "csv"},
+}
+
+
+def benchmark_urls(user):
+    """
+    (name, url, params) for every named URL of the app. Detail URLs point
+    at the visible task with the longest comment thread.
+    """
+    task = (
+        visible_tasks(user)
+        .annotate(comment_total=Count("comments"))
+        .order_by("-comment_total", "id")
+        .first()
+    )
+    subtask = SubTask.objects.filter(parent_task=task).first()
+    targets = {"subtask_editview": subtask}
+    found = []
+    for pattern in urls.urlpatterns:
+        if not pattern.name or pattern.name in SKIPPED:
+            continue
+        kwargs = {}
+        for name in pattern.pattern.converters:
+            target = targets.get(pattern.name, task)
+            if target is None:
+                break
+            kwargs[name] = target.pk
+        else:
+            found.append(
+                (
+                    pattern.name,
+                    reverse(pattern.name, kwargs=kwargs),
+                    PARAMS.get(pattern.name, {}),
+                )
+            )
+    return found
+
+
+def scale(size):
+    """dataset sizes for a benchmark run of size tasks"""
+    return {
+        "users": max(10, size // 20),
+        "tasks": size,
+        "comments": size * 3,
+        "subtasks": size * 2,
+    }
+
+
+@contextmanager
+def benchmark_database():
+    """a throwaway test database, destroyed on exit"""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True
+    )
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_benchmark(size, seed=0, superuser=False):
+    """
+    Empty the database and caches, seed size tasks and return the user
+    to browse as: the busiest seeded user or a new superuser
+    """
+    call_command("flush", interactive=False, verbosity=0)
+    for cache in caches.all():
+        cache.clear()
+    Seeder(seed=seed, **scale(size)).run()
+    if superuser:
+        return User.objects.create_superuser(
+            email="bench-admin@example.com", password="password"
+        )
+    return User.objects.get(email="seed-user-00000@example.com")
+
+
+@contextmanager
+def async_views(enabled):
+    """route the hot views to their async versions (as asgi.py does)"""
+
+    def reload():
+        importlib.reload(urls)
+        # the root urlconf holds a resolver over the old patterns
+        importlib.reload(importlib.import_module(settings.ROOT_URLCONF))
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=enabled):
+            reload()
+            yield
+    finally:
+        reload()
+
+
+@contextmanager
+def query_latency(seconds):
+    """
+    Add a fixed delay to every query, on every thread's connections, to
+    stand in for the network round trip to a remote database.
+    """
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    delayed = []
+
+    def install(sender, connection, **kwargs):
+        if delay not in connection.execute_wrappers:
+            connection.execute_wrappers.insert(0, delay)
+            delayed.append(connection)
+
+    if not seconds:
+        yield
+        return
+    for existing in connections.all():
+        install(None, existing)
+    connection_created.connect(install)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for delayed_connection in delayed:
+            if delay in delayed_connection.execute_wrappers:
+                delayed_connection.execute_wrappers.remove(delay)
+
+
+def summary(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+
+def percentile(ordered, percent):
+    """nearest-rank percentile of sorted values"""
+    return ordered[max(0, -(-len(ordered) * percent // 100) - 1)]
+
+
+def wsgi_throughput(cookies, targets, concurrency, total, close=False):
+    """
+    total GETs spread over targets, concurrency at a time, through the
+    sync handler, each thread with its own client. With close, the
+    connections are closed after every request as in a real deployment
+    (the test client keeps them open).
+    """
+    local = threading.local()
+
+    def one(index):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = Client()
+            client.cookies = cookies
+        _, url, params = targets[index % len(targets)]
+        started = time.perf_counter()
+        _get(client, url, params)
+        if close:
+            close_old_connections()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(one, range(total)))
+    return summary(latencies, time.perf_counter() - started)
+
+
+def asgi_throughput(cookies, targets, concurrency, total):
+    """the same load through the async handler, on one event loop"""
+
+    async def run():
+        clients = asyncio.Queue()
+        for _ in range(concurrency):
+            client = AsyncClient()
+            client.cookies = cookies
+            clients.put_nowait(client)
+
+        async def one(index):
+            client = await clients.get()
+            try:
+                _, url, params = targets[index % len(targets)]
+                started = time.perf_counter()
+                # as ASGIHandler does, so requests do not share one thread
+                async with ThreadSensitiveContext():
+                    response = await client.get(url, params)
+                if response.streaming:
+                    async for _ in response.streaming_content:
+                        pass
+                return (time.perf_counter() - started) * 1000
+            finally:
+                clients.put_nowait(client)
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(one(i) for i in range(total)))
+        return summary(latencies, time.perf_counter() - started)
+
+    return asyncio.run(run())
+
+
+def compare_deployments(user, concurrency, total):
+    """
+    Throughput of the hot views served by the sync views through the WSGI
+    handler and by the async views through the ASGI handler.
+    """
+    login = Client()
+    login.force_login(user)
+    targets = [
+        target for target in benchmark_urls(user) if target[0] in HOT_URLS
+    ]
+    results = {}
+    with async_views(False):
+        results["wsgi"] = wsgi_throughput(
+            login.cookies, targets, concurrency, total
+        )
+    with async_views(True):
+        results["asgi"] = asgi_throughput(
+            login.cookies, targets, concurrency, total
+        )
+    return results
+
+
+def pooled_aliases():
+    return [
+        alias
+        for alias in connections
+        if "pool" in connections[alias].settings_dict["OPTIONS"]
+    ]
+
+
+@contextmanager
+def connection_pooling(enabled):
+    """turn the connection pools of the pooled backend on or off"""
+    aliases = pooled_aliases()
+    saved = {
+        alias: connections[alias].settings_dict["OPTIONS"]["pool"]
+        for alias in aliases
+    }
+    connections.close_all()
+    try:
+        for alias in aliases:
+            options = connections[alias].settings_dict["OPTIONS"]
+            options["pool"] = saved[alias] if enabled else False
+        yield
+    finally:
+        connections.close_all()
+        close_pools()
+        for alias in aliases:
+            connections[alias].settings_dict["OPTIONS"]["pool"] = saved[alias]
+
+
+def compare_pooling(user, concurrency, total):
+    """
+    Throughput of the cheap views with a new connection per request and
+    with pooled connections, and how many connections each pool opened
+    """
+    login = Client()
+    login.force_login(user)
+    targets = [
+        target for target in benchmark_urls(user) if target[0] in POOL_URLS
+    ]
+    results = {}
+    for mode, enabled in (("direct", False), ("pooled", True)):
+        with connection_pooling(enabled):
+            results[mode] = wsgi_throughput(
+                login.cookies, targets, concurrency, total, close=True
+            )
+            results[mode]["opened"] = {
+                alias: pool.opened for (alias, _), pool in pools.items()
+            }
+    return results
+
+
+def _get(client, url, params):
+    response = client.get(url, params)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def measure(client, url, params, repeat=10):
+    """
+    Latency percentiles and query count over repeat requests, after one
+    warm-up request, and the peak traced memory of one more request.
+    """
+    _get(client, url, params)
+    timings, queries = [], []
+    for _ in range(repeat):
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            response = _get(client, url, params)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter.count)
+    tracemalloc.start()
+    try:
+        _get(client, url, params)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timings.sort()
+    return {
+        "status": response.status_code,
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "queries": max(queries),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def index_size(model):
+    """
+    Bytes taken by the indexes of model's table, or None when the
+    database cannot tell (SQLite without the dbstat table)
+    """
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT pg_indexes_size(%s)", [table])
+        elif connection.vendor == "sqlite":
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name IN ("
+                    "SELECT name FROM sqlite_master "
+                    "WHERE type = 'index' AND tbl_name = %s)",
+                    [table],
+                )
+            except DatabaseError:
+                return None
+        else:
+            return None
+        return cursor.fetchone()[0] or 0
+
+
+@contextmanager
+def browsing(user):
+    """a Client logged in as user, usable outside of the test runner"""
+    hosts = [*settings.ALLOWED_HOSTS, "testserver"]
+    with override_settings(ALLOWED_HOSTS=hosts):
+        client = Client()
+        client.force_login(user)
+        yield client
+
+
+def run_benchmark(client, user, repeat=10):
+    """{url name: measurements} for every benchmarked URL as user"""
+    client.force_login(user)
+    return {
+        name: {"url": url, **measure(client, url, params, repeat)}
+        for name, url, params in benchmark_urls(user)
+    }
@@ -0,0 +1,132 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from . import changelog, counters, events, fragments
+from .models import SubTask, Task, TaskParticipant
+from .search import get_search_backend
+from .utils import assignment_mail, queue_mails, status_mail
+from .visibility import participant_roles
+
+ACTIONS = ("status", "priority", "reassign", "delete")
+# the Task column each updating action writes
+FIELDS = {
+    "status": "status",
+    "priority": "priority",
+    "reassign": "assigned_to_id",
+}
+
+
+def _batches(ids):
+    """ids in chunks small enough for the IN list of one statement"""
+    size = connection.features.max_query_params or len(ids) or 1
+    for start in range(0, len(ids), size):
+        end = start + size
+        yield ids[start:end]
+
+
+def bulk_update_tasks(tasks, action, value=None):
+    """
+    Apply action to every task of the tasks queryset with set-based
+    statements instead of one save() per task:
+
+    - "status" and "priority" set the field to value
+    - "reassign" assigns the tasks to the user value
+    - "delete" soft deletes the tasks; PurgeWorker removes them with
+      their comments and subtasks later
+
+    Tasks already in the requested state are left alone. In the same
+    transaction the dashboard counters, participant rows and subtasks
+    follow, cached fragments are dropped and the notification emails are
+    queued in bulk. Returns the matched, updated and emails counts.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"unknown bulk action {action!r}")
+    with transaction.atomic():
+        selected = list(
+            Task.objects.filter(pk__in=tasks.values("id"))
+            .select_related("assigned_by", "assigned_to")
+            .select_for_update(of=("self",))
+            .order_by("id")
+        )
+        if action == "delete":
+            changed = selected
+        else:
+            field = FIELDS[action]
+            target = value.pk if action == "reassign" else value
+            changed = [
+                task for task in selected if getattr(task, field) != target
+            ]
+        ids = [task.pk for task in changed]
+        old = [task.tracked_state() for task in changed]
+        emails = 0
+        if action == "delete":
+            _soft_delete(ids)
+            counters.tasks_changed((state, None) for state in old)
+            changelog.record_tasks(
+                "deleted", ((pk, state, None) for pk, state in zip(ids, old))
+            )
+        else:
+            _update(changed, field, target, value)
+            new = [task.tracked_state() for task in changed]
+            counters.tasks_changed(zip(old, new))
+            changelog.record_tasks("updated", zip(ids, old, new))
+            if action == "reassign":
+                _sync_participants(changed)
+                mails, kind = map(assignment_mail, changed), "assignment"
+            else:
+                mails, kind = map(status_mail, changed), "status"
+            emails = queue_mails(mails, kind)
+        fragments.invalidate(ids)
+        events.tasks_changed(zip(changed, old))
+    return {"matched": len(selected), "updated": len(ids), "emails": emails}
+
+
+def _update(tasks, field, target, value):
+    now = timezone.now()
+    updates = {field: target, "modified": now}
+    completing = field == "status" and target == "completed"
+    if completing:
+        # the completion of a task cascades to its subtasks
+        updates["subtask_completed"] = F("subtask_total")
+    states = {task.pk: task.tracked_state() for task in tasks}
+    for batch in _batches(list(states)):
+        Task.objects.filter(pk__in=batch).update(**updates)
+        if completing:
+            subtasks = SubTask.objects.filter(
+                parent_task_id__in=batch
+            ).exclude(status="completed")
+            done = list(subtasks.values_list("id", "parent_task_id"))
+            subtasks.update(status="completed", modified=now)
+            changelog.record_children(
+                "subtask",
+                "updated",
+                ((pk, task_id, states[task_id]) for pk, task_id in done),
+            )
+    for task in tasks:
+        if field == "assigned_to_id":
+            task.assigned_to = value
+        else:
+            setattr(task, field, target)
+        if completing:
+            task.subtask_completed = task.subtask_total
+        task.modified = now
+
+
+def _sync_participants(tasks):
+    """replace the participant rows of reassigned tasks"""
+    for batch in _batches([task.pk for task in tasks]):
+        TaskParticipant.objects.filter(task_id__in=batch).delete()
+    TaskParticipant.objects.bulk_create(
+        TaskParticipant(
+            task_id=task.pk, user_id=user_id, role=role, created=task.created
+        )
+        for task in tasks
+        for user_id, role in participant_roles(task.tracked_state()).items()
+    )
+
+
+def _soft_delete(ids):
+    now = timezone.now()
+    for batch in _batches(ids):
+        Task.objects.filter(pk__in=batch).update(deleted_at=now, modified=now)
+        get_search_backend().tasks_removed(batch)
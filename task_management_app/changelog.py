@@ -0,0 +1,200 @@
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Exists, Func, OuterRef, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ChangeLogEntry
+from .visibility import participant_roles
+
+BATCH_SIZE = 500
+PAGE_SIZE = getattr(settings, "CHANGELOG_PAGE_SIZE", 200)
+MAX_PAGE_SIZE = 1000
+# how old superseded entries get before compact() removes them
+COMPACT_AFTER = timedelta(
+    days=getattr(settings, "CHANGELOG_COMPACT_AFTER_DAYS", 7)
+)
+
+
+def _entry(kind, action, object_id, task_id, state):
+    return ChangeLogEntry(
+        kind=kind,
+        action=action,
+        object_id=object_id,
+        task_id=task_id,
+        assigned_to_id=state["assigned_to_id"],
+        assigned_by_id=state["assigned_by_id"],
+    )
+
+
+def _write(entries):
+    entries = iter(entries)
+    txid = None
+    if connection.vendor == "postgresql":
+        txid = Func(function="txid_current", output_field=BigIntegerField())
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            return
+        if txid is not None:
+            for entry in batch:
+                entry.txid = txid
+        ChangeLogEntry.objects.bulk_create(batch)
+
+
+def horizon():
+    """
+    The transaction id below which every writer has finished, None when
+    writers commit in id order. Ids are handed out at insert time, so on
+    PostgreSQL a transaction still open may yet commit an entry below one
+    already visible; entries are served in (txid, id) order and only up
+    to the oldest transaction still running, however long it takes.
+    SQLite runs one write transaction at a time.
+    """
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+        return cursor.fetchone()[0]
+
+
+def cursor(entry):
+    """the position of entry in the feed, as the API shows it"""
+    return format_cursor(entry.txid, entry.id)
+
+
+def format_cursor(txid, entry_id):
+    return f"{txid}.{entry_id}" if txid else str(entry_id)
+
+
+def parse_cursor(text):
+    """(txid, entry id) of an API cursor; ValueError when malformed"""
+    txid, _, entry_id = text.rpartition(".")
+    return int(txid or 0), int(entry_id)
+
+
+def record_tasks(action, changes):
+    """
+    Log action on the tasks of (task id, old state, new state) changes,
+    states holding assigned_to_id and assigned_by_id (old is None for a
+    created task, new for a deleted one), plus a "removed" entry for
+    every user a task was taken from
+    """
+
+    def entries():
+        for task_id, old, new in changes:
+            yield _entry("task", action, task_id, task_id, new or old)
+            if old is None or new is None:
+                continue
+            lost = participant_roles(old).keys() - participant_roles(new)
+            for user_id in lost:
+                yield ChangeLogEntry(
+                    kind="task",
+                    action="removed",
+                    object_id=task_id,
+                    task_id=task_id,
+                    assigned_to_id=user_id,
+                )
+
+    _write(entries())
+
+
+def record_children(kind, action, rows):
+    """
+    Log action on the comments or subtasks of (id, task id, task state)
+    rows, for the users on their tasks
+    """
+    _write(
+        _entry(kind, action, object_id, task_id, state)
+        for object_id, task_id, state in rows
+    )
+
+
+def changes_for(user, since, size=PAGE_SIZE):
+    """
+    Up to size committed entries after the since (txid, entry id) cursor
+    that concern user, in feed order, and whether more are ready. Each
+    user's entries come from one index range scan, so the cost follows
+    the number of changes, not of tasks.
+    """
+    txid, entry_id = since
+    log = (
+        ChangeLogEntry.objects.filter(txid__gte=txid)
+        .exclude(txid=txid, id__lte=entry_id)
+        .order_by("txid", "id")
+    )
+    limit = horizon()
+    if limit is not None:
+        log = log.filter(txid__lt=limit)
+    if user.is_superuser:
+        queries = [log.exclude(action="removed")]
+    else:
+        queries = [
+            log.filter(assigned_to_id=user.pk),
+            log.filter(assigned_by_id=user.pk),
+        ]
+    found = {}
+    for query in queries:
+        for entry in query[: size + 1]:
+            found[entry.id] = entry
+    entries = sorted(found.values(), key=lambda entry: (entry.txid, entry.id))
+    return entries[:size], len(entries) > size
+
+
+def head():
+    """the cursor of the newest committed entry, to start syncing from"""
+    log = ChangeLogEntry.objects.order_by("-txid", "-id")
+    limit = horizon()
+    if limit is not None:
+        log = log.filter(txid__lt=limit)
+    newest = log.values_list("txid", "id").first()
+    return format_cursor(*newest) if newest else "0"
+
+
+def compact(compact_after=COMPACT_AFTER, batch_size=BATCH_SIZE):
+    """
+    Delete the entries older than compact_after that a newer entry about
+    the same object for the same users supersedes. The API serves the
+    objects as they are now, so only the newest entry tells a client
+    anything. Cursors stay valid. Returns the number deleted.
+    """
+    before = timezone.now() - compact_after
+    log = ChangeLogEntry.objects.all()
+    boundary = (
+        log.filter(created__gte=before)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    if boundary is not None:
+        log = log.filter(id__lt=boundary)
+    newer = (
+        ChangeLogEntry.objects.annotate(
+            by=Coalesce("assigned_by_id", Value(0))
+        )
+        .filter(
+            Q(txid__gt=OuterRef("txid"))
+            | Q(txid=OuterRef("txid"), id__gt=OuterRef("id")),
+            kind=OuterRef("kind"),
+            object_id=OuterRef("object_id"),
+            assigned_to_id=OuterRef("assigned_to_id"),
+            by=Coalesce(OuterRef("assigned_by_id"), Value(0)),
+        )
+        .values("id")
+    )
+    deleted, last = 0, 0
+    while True:
+        window = list(
+            log.filter(id__gt=last)
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not window:
+            return deleted
+        last = window[-1]
+        with transaction.atomic():
+            superseded = ChangeLogEntry.objects.filter(
+                Exists(newer), id__in=window
+            )
+            deleted += superseded._raw_delete(superseded.db)
@@ -0,0 +1,38 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def _in_own_thread(function):
+    """
+    Run function in an executor thread the way a request would: stale
+    connections of the thread are dropped before and after, honouring
+    CONN_MAX_AGE, so idle pool threads do not hold connections forever.
+    """
+
+    def run():
+        close_old_connections()
+        try:
+            return function()
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def run_queries(*functions):
+    """
+    Results of independent, read-only ORM callables. With
+    ASYNC_PARALLEL_QUERIES they run at the same time, each in a worker
+    thread on its own database connection, which is only cheap with the
+    pooled engine. Otherwise they run one after the other in the
+    request's thread. Use the sequential mode when the request's own
+    uncommitted writes must be visible, as in tests that run inside a
+    transaction.
+    """
+    if getattr(settings, "ASYNC_PARALLEL_QUERIES", False):
+        return await asyncio.gather(
+            *(_in_own_thread(function)() for function in functions)
+        )
+    return [await sync_to_async(function)() for function in functions]
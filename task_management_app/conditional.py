@@ -0,0 +1,119 @@
+import hashlib
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class Validators:
+    """
+    ETag and Last-Modified of a resource, worked out from modified times
+    alone so they are known before anything is serialized.
+    """
+
+    def __init__(self, last_modified, *parts):
+        self.last_modified = last_modified
+        digest = hashlib.sha1(
+            ":".join(str(part) for part in (last_modified, *parts)).encode()
+        ).hexdigest()
+        self.etag = quote_etag(digest)
+
+    @classmethod
+    def for_collection(cls, queryset, *parts, **aggregates):
+        """
+        Validators of a queryset from its newest modified time and its row
+        count, in one aggregate query. An edit moves the newest time and a
+        delete lowers the count. parts tell apart different views of the
+        same rows, such as pages, and aggregates add columns that change
+        without moving modified. No Last-Modified is sent, as a delete
+        does not move the newest modified time.
+        """
+        state = queryset.order_by().aggregate(
+            last_modified=Max("modified"), count=Count("pk"), **aggregates
+        )
+        return cls(None, *state.values(), *parts)
+
+    def not_modified(self, request):
+        """the 304 (or 412) response when the client copy is current"""
+        last_modified = self.last_modified
+        if last_modified is not None:
+            last_modified = int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=self.etag, last_modified=last_modified
+        )
+        if response is not None:
+            self.apply(response)
+        return response
+
+    def apply(self, response):
+        response["ETag"] = self.etag
+        if self.last_modified is not None:
+            response["Last-Modified"] = http_date(
+                self.last_modified.timestamp()
+            )
+        # clients may keep the body but have to revalidate before using it
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class ConditionalPageMixin:
+    """
+    HTML views answering a conditional GET with a 304 before loading or
+    rendering anything. validators() works out the Validators of the
+    page's data, or None to leave the request alone (say, a 404).
+    """
+
+    def validators(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def page_validators(self, request, *args, **kwargs):
+        """
+        The data's validators plus what else goes into the markup: the
+        user, their CSRF cookie (for the tokens in forms) and the query
+        string. Only an ETag, which none of those move Last-Modified for.
+        """
+        # a copy must not bring back messages already shown
+        if len(get_messages(request)):
+            return None
+        data = self.validators(request, *args, **kwargs)
+        if data is None:
+            return None
+        return Validators(
+            None,
+            data.etag,
+            request.user.pk,
+            request.user.is_superuser,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME),
+            request.GET.urlencode(),
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != "GET":
+            return super().dispatch(request, *args, **kwargs)
+        if self.view_is_async:
+            return self.async_dispatch(request, *args, **kwargs)
+        validators = self.page_validators(request, *args, **kwargs)
+        response = validators and validators.not_modified(request)
+        if response:
+            return response
+        return self.finish(
+            validators, super().dispatch(request, *args, **kwargs)
+        )
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        validators = await sync_to_async(self.page_validators)(
+            request, *args, **kwargs
+        )
+        response = validators and validators.not_modified(request)
+        if response:
+            return response
+        return self.finish(
+            validators, await super().dispatch(request, *args, **kwargs)
+        )
+
+    def finish(self, validators, response):
+        if validators is None or response.status_code != 200:
+            return response
+        return validators.apply(response)
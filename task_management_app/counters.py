@@ -0,0 +1,154 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Q
+from .models import TaskCounter, User
+from .visibility import participant_roles, visible_tasks
+
+STATUS_FIELDS = {
+    "pending": "pending",
+    "in-progress": "in_progress",
+    "completed": "completed",
+}
+
+
+def participants(state):
+    """users who see a task with the given tracked state on their dashboard"""
+    return set(participant_roles(state))
+
+
+def _apply(user_ids, status, delta):
+    """add delta to the counters of the given users and the global row"""
+    updates = {"total": F("total") + delta}
+    field = STATUS_FIELDS.get(status)
+    if field:
+        updates[field] = F(field) + delta
+    TaskCounter.objects.filter(
+        Q(user_id__in=user_ids) | Q(is_global=True)
+    ).update(**updates)
+
+
+def task_changed(old, new):
+    """
+    Move a task between counters. old is None for a created task and new
+    is None for a deleted one. Counters that have not been built yet are
+    left alone and get computed on the next dashboard load.
+    """
+    if old is not None and new is not None:
+        if old["status"] == new["status"] and participants(
+            old
+        ) == participants(new):
+            return
+    with transaction.atomic():
+        if old is not None:
+            _apply(participants(old), old["status"], -1)
+        if new is not None:
+            _apply(participants(new), new["status"], 1)
+
+
+def tasks_changed(changes):
+    """
+    Move many tasks between counters at once. changes holds (old, new)
+    pairs as taken by task_changed. The deltas are summed per user first
+    and users ending up with the same deltas share one UPDATE.
+    """
+    deltas = defaultdict(Counter)
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            field = STATUS_FIELDS.get(state["status"])
+            # None stands for the global counter, which sees every task
+            for user_id in participants(state) | {None}:
+                deltas[user_id]["total"] += sign
+                if field:
+                    deltas[user_id][field] += sign
+    groups = defaultdict(list)
+    for user_id, delta in deltas.items():
+        delta = frozenset((f, d) for f, d in delta.items() if d)
+        if delta:
+            groups[delta].append(user_id)
+    with transaction.atomic():
+        for delta, user_ids in groups.items():
+            condition = Q(user_id__in=[u for u in user_ids if u is not None])
+            if None in user_ids:
+                condition |= Q(is_global=True)
+            TaskCounter.objects.filter(condition).update(
+                **{field: F(field) + amount for field, amount in delta}
+            )
+
+
+def count_tasks(tasks):
+    """count a task queryset by status with a single aggregate query"""
+    aggregate = {"total": Count("id")}
+    for status, field in STATUS_FIELDS.items():
+        aggregate[field] = Count("id", filter=Q(status=status))
+    return tasks.aggregate(**aggregate)
+
+
+def rebuild_counter(user):
+    """
+    Recompute the counter of a user (or the global one for superusers).
+    The row is created and locked before the tasks are counted, so a
+    writer that finds it waits and adds its delta on top of the count.
+    A writer that looked just before the row existed and committed after
+    the count is left out; reconcile_counters puts that right.
+    """
+    if user.is_superuser:
+        lookup = {"is_global": True, "user": None}
+    else:
+        lookup = {"is_global": False, "user": user}
+    with transaction.atomic():
+        counter, _ = TaskCounter.objects.select_for_update().get_or_create(
+            **lookup
+        )
+        for field, value in count_tasks(visible_tasks(user)).items():
+            setattr(counter, field, value)
+        counter.save()
+    return counter
+
+
+def reconcile_counters(batch_size=500):
+    """
+    Recount every built counter, correcting any drift; returns how many
+    were wrong. Each counter is recounted in its own short transaction.
+    """
+    wrong, last = 0, 0
+    while True:
+        batch = list(
+            TaskCounter.objects.filter(id__gt=last)
+            .select_related("user")
+            .order_by("id")[:batch_size]
+        )
+        if not batch:
+            return wrong
+        last = batch[-1].id
+        for counter in batch:
+            user = counter.user
+            if counter.is_global:
+                user = User(is_superuser=True)
+            fresh = rebuild_counter(user)
+            wrong += any(
+                getattr(fresh, field) != getattr(counter, field)
+                for field in ("total", *STATUS_FIELDS.values())
+            )
+
+
+def get_dashboard_counts(user):
+    """dashboard counts for a user, built on first use"""
+    if user.is_superuser:
+        counter = TaskCounter.objects.filter(is_global=True).first()
+    else:
+        counter = TaskCounter.objects.filter(user=user).first()
+    if counter is None:
+        counter = rebuild_counter(user)
+    return counter
+
+
+def invalidate(user_ids):
+    """
+    Drop the counters of the given users and the global one after a bulk
+    write that bypassed the signals; they are rebuilt on next use.
+    """
+    TaskCounter.objects.filter(
+        Q(user_id__in=user_ids) | Q(is_global=True)
+    ).delete()
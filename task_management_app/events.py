@@ -0,0 +1,457 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+from collections import defaultdict, deque
+from functools import lru_cache
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    DatabaseError,
+    connections,
+    transaction,
+)
+from django.utils.module_loading import import_string
+from .metrics import EVENT_STREAMS, EVENTS_PUBLISHED
+from .models import Task
+from .visibility import participant_roles
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# NOTIFY payloads must stay under 8000 bytes
+PAYLOAD_BYTES = 7900
+# the advisory lock a process holds while it has streams open
+LISTENER_LOCK = 0x74657674
+# how long a publisher trusts its last look for that lock
+LISTENER_CHECK_SECONDS = 1
+# how long browsers wait before reconnecting a stream that ended
+RETRY_MS = 3000
+# the Task columns sent with every event, for the pages to patch in place
+TASK_FIELDS = (
+    "id",
+    "title",
+    "status",
+    "priority",
+    "comment_count",
+    "subtask_total",
+    "subtask_completed",
+    "assigned_to_id",
+    "assigned_by_id",
+)
+
+
+class Overflow(Exception):
+    """a subscriber fell too far behind and missed events"""
+
+
+class Subscription:
+    """
+    The events waiting to be sent down one stream, at most max_events of
+    them taking max_bytes. A subscriber that falls further behind is
+    marked overflowed rather than slowing the publishers down or growing
+    without bound; its stream then tells the page to refresh.
+    """
+
+    def __init__(self, loop, max_events=100, max_bytes=64 * 1024):
+        self.loop = loop
+        self.max_events = max_events
+        self.max_bytes = max_bytes
+        self.events = deque()
+        self.size = 0
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def offer(self, data):
+        """queue data from any thread"""
+        self.loop.call_soon_threadsafe(self.put, data)
+
+    def put(self, data):
+        if self.overflowed:
+            return
+        if (
+            len(self.events) >= self.max_events
+            or self.size + len(data) > self.max_bytes
+        ):
+            self.overflowed = True
+            self.events.clear()
+            self.size = 0
+        else:
+            self.events.append(data)
+            self.size += len(data)
+        self.ready.set()
+
+    async def get(self, timeout):
+        """the queued events, [] after timeout seconds without any"""
+        if not self.events and not self.overflowed:
+            try:
+                await asyncio.wait_for(self.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self.ready.clear()
+        if self.overflowed:
+            raise Overflow
+        events, self.events, self.size = list(self.events), deque(), 0
+        return events
+
+
+class Broker:
+    """
+    Fans events out to the streams of the users they concern. Streams
+    subscribe with their user's id, or None to receive every event
+    (superusers).
+
+    Publishers hand over notices, the compact form of events: a task
+    notice is {"type": "task", "id", "created", "users"} and a subtask or
+    comment one {"type", "id", "task_id", "users", "fields"}, users being
+    the ids to tell besides the task's current users. They become events
+    in the processes with streams, which read the task rows once for all
+    the notices they get.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id, subscription):
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    @property
+    def listening(self):
+        """whether events may reach a stream at all"""
+        return bool(self._subscribers)
+
+    def publish(self, notices):
+        raise NotImplementedError
+
+    def events(self, notices):
+        """(user ids, event) of each notice, with the task rows as of now"""
+        rows = task_rows(
+            {notice.get("task_id", notice["id"]) for notice in notices}
+        )
+        for notice in notices:
+            users = set(notice["users"])
+            if notice["type"] == "task":
+                row = rows.get(notice["id"])
+                if row is None:
+                    # deleted outright: only its former users can be told
+                    row, deleted = {"id": notice["id"]}, True
+                else:
+                    row = dict(row)
+                    deleted = row.pop("deleted_at") is not None
+                    users |= recipients(row)
+                yield users, {
+                    "type": "task",
+                    "id": notice["id"],
+                    "created": notice["created"],
+                    "deleted": deleted,
+                    "task": row,
+                }
+            else:
+                row = rows.get(notice["task_id"])
+                if row is None or row["deleted_at"] is not None:
+                    continue
+                row = dict(row)
+                del row["deleted_at"]
+                yield recipients(row) | users, {
+                    "type": notice["type"],
+                    "id": notice["id"],
+                    "task": row,
+                    **notice["fields"],
+                }
+
+    def dispatch(self, notices):
+        """turn notices into events for the streams of this process"""
+        if not self._subscribers:
+            return
+        for user_ids, event in self.events(notices):
+            self.deliver(user_ids, json.dumps(event))
+
+    def deliver(self, user_ids, data):
+        """hand data to the streams of this process"""
+        with self._lock:
+            targets = set()
+            for user_id in (*user_ids, None):
+                targets.update(self._subscribers.get(user_id, ()))
+        for subscription in targets:
+            try:
+                subscription.offer(data)
+            except RuntimeError:
+                # the stream's event loop is gone
+                pass
+
+
+class InProcessBroker(Broker):
+    """a single process serves every stream (one ASGI worker)"""
+
+    def publish(self, notices):
+        EVENTS_PUBLISHED.inc(len(notices), broker="inprocess")
+        self.dispatch(notices)
+
+
+def payloads(notices, limit=PAYLOAD_BYTES):
+    """notices as JSON arrays of at most limit bytes each"""
+    batch, size = [], 2
+    for notice in notices:
+        data = json.dumps(notice, separators=(",", ":"))
+        if batch and size + len(data) + 1 > limit:
+            yield "[" + ",".join(batch) + "]"
+            batch, size = [], 2
+        batch.append(data)
+        size += len(data) + 1
+    if batch:
+        yield "[" + ",".join(batch) + "]"
+
+
+class PostgresBroker(Broker):
+    """
+    Events go through a PostgreSQL NOTIFY channel, so the streams of
+    every worker process and node get them. Each process serving streams
+    listens with one dedicated connection, opened with the first stream,
+    which holds a shared advisory lock while the process has streams:
+    publishers look for that lock, at most every LISTENER_CHECK_SECONDS,
+    and send nothing when no process holds it.
+    """
+
+    channel = "task_events"
+
+    def __init__(self, alias=DEFAULT_DB_ALIAS):
+        super().__init__()
+        self.alias = alias
+        self._listener = None
+        self._wakeup = None
+        self._checked = (None, False)
+
+    @property
+    def listening(self):
+        checked_at, listening = self._checked
+        now = time.monotonic()
+        if checked_at is None or now - checked_at > LISTENER_CHECK_SECONDS:
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks"
+                    " WHERE locktype = 'advisory' AND granted"
+                    " AND classid = 0 AND objid = %s AND objsubid = 1"
+                    " AND database = (SELECT oid FROM pg_database"
+                    " WHERE datname = current_database()))",
+                    [LISTENER_LOCK],
+                )
+                (listening,) = cursor.fetchone()
+            self._checked = (now, listening)
+        return listening
+
+    def publish(self, notices):
+        EVENTS_PUBLISHED.inc(len(notices), broker="postgres")
+        # a payload takes under 8000 bytes; all go in one round trip
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_notify(%s, payload)"
+                " FROM unnest(%s::text[]) AS payload",
+                [self.channel, list(payloads(notices))],
+            )
+
+    def subscribe(self, user_id, subscription):
+        with self._lock:
+            if self._listener is None:
+                self._wakeup = os.pipe()
+                os.set_blocking(self._wakeup[1], False)
+                self._listener = threading.Thread(
+                    target=self.listen, name="task-events", daemon=True
+                )
+                self._listener.start()
+        super().subscribe(user_id, subscription)
+        self.wake()
+
+    def unsubscribe(self, user_id, subscription):
+        super().unsubscribe(user_id, subscription)
+        self.wake()
+
+    def wake(self):
+        """have the listener take or drop the lock as streams come and go"""
+        try:
+            os.write(self._wakeup[1], b"\0")
+        except BlockingIOError:
+            # it has wakeups pending already
+            pass
+
+    def listen(self):
+        wrapper = connections[self.alias]
+        while True:
+            try:
+                raw = wrapper.Database.connect(
+                    **wrapper.get_connection_params()
+                )
+            except wrapper.Database.Error:
+                logger.exception("cannot listen for task events")
+                time.sleep(5)
+                continue
+            try:
+                raw.autocommit = True
+                locked = False
+                with raw.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                while True:
+                    if locked != bool(self._subscribers):
+                        locked = not locked
+                        function = "lock" if locked else "unlock"
+                        with raw.cursor() as cursor:
+                            cursor.execute(
+                                f"SELECT pg_advisory_{function}_shared(%s)",
+                                [LISTENER_LOCK],
+                            )
+                    readable, _, _ = select.select(
+                        [raw, self._wakeup[0]], [], [], 60
+                    )
+                    if self._wakeup[0] in readable:
+                        os.read(self._wakeup[0], 4096)
+                    raw.poll()
+                    while raw.notifies:
+                        self.receive(raw.notifies.pop(0).payload)
+            except (OSError, wrapper.Database.Error):
+                logger.exception("lost the task events connection")
+                time.sleep(1)
+            finally:
+                raw.close()
+
+    def receive(self, payload):
+        try:
+            self.dispatch(json.loads(payload))
+        except DatabaseError:
+            logger.exception("cannot read the rows of task events")
+            connections[self.alias].close()
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """
+    The broker named by EVENTS_BROKER, or the one matching the default
+    database when it is not set.
+    """
+    path = getattr(settings, "EVENTS_BROKER", None)
+    if path:
+        return import_string(path)()
+    if connections[DEFAULT_DB_ALIAS].vendor == "postgresql":
+        return PostgresBroker()
+    return InProcessBroker()
+
+
+def task_rows(task_ids):
+    """{id: TASK_FIELDS values and deleted_at} of the given tasks"""
+    task_ids = list(task_ids)
+    rows = {}
+    for start in range(0, len(task_ids), BATCH_SIZE):
+        end = start + BATCH_SIZE
+        for row in Task.all_objects.filter(pk__in=task_ids[start:end]).values(
+            *TASK_FIELDS, "deleted_at"
+        ):
+            rows[row["id"]] = row
+    return rows
+
+
+def recipients(*states):
+    """ids of the users on a task in any of the given states"""
+    return {
+        user_id
+        for state in states
+        if state
+        for user_id in participant_roles(state)
+    }
+
+
+def tasks_changed(changes, created=False):
+    """
+    Once the transaction commits, and if any stream is open, publish one
+    batch of notices about the tasks of the (task, old tracked state)
+    changes, for their users before and after. The rows are read when the
+    events are made: the denormalized counters move with F() updates the
+    instances at hand do not see.
+    """
+    notices = [
+        {
+            "type": "task",
+            "id": task.pk,
+            "created": created,
+            "users": sorted(recipients(old)),
+        }
+        for task, old in changes
+    ]
+
+    def send():
+        broker = get_broker()
+        if broker.listening:
+            broker.publish(notices)
+
+    if notices:
+        transaction.on_commit(send)
+
+
+def child_changed(kind, pk, task_id, user_ids=(), **fields):
+    """
+    Once the transaction commits, and if any stream is open, publish a
+    notice about a subtask or comment of task_id for the users on the
+    task and user_ids
+    """
+    notice = {
+        "type": kind,
+        "id": pk,
+        "task_id": task_id,
+        "users": sorted(user_id for user_id in user_ids if user_id),
+        "fields": fields,
+    }
+
+    def send():
+        broker = get_broker()
+        if broker.listening:
+            broker.publish([notice])
+
+    transaction.on_commit(send)
+
+
+async def stream(user_id):
+    """
+    The text/event-stream of the events of user_id. A comment goes out
+    every EVENTS_HEARTBEAT_SECONDS so proxies keep the connection open,
+    and the stream ends after EVENTS_STREAM_SECONDS (the browser then
+    reconnects), so subscriptions of vanished clients do not linger.
+    """
+    loop = asyncio.get_running_loop()
+    heartbeat = getattr(settings, "EVENTS_HEARTBEAT_SECONDS", 15)
+    deadline = loop.time() + getattr(settings, "EVENTS_STREAM_SECONDS", 300)
+    subscription = Subscription(
+        loop,
+        getattr(settings, "EVENTS_QUEUE_SIZE", 100),
+        getattr(settings, "EVENTS_QUEUE_BYTES", 64 * 1024),
+    )
+    broker = get_broker()
+    broker.subscribe(user_id, subscription)
+    EVENT_STREAMS.inc(result="opened")
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                events = await subscription.get(min(heartbeat, remaining))
+            except Overflow:
+                EVENT_STREAMS.inc(result="overflow")
+                yield "event: reset\ndata: {}\n\n"
+                break
+            if not events:
+                yield ": ping\n\n"
+            for data in events:
+                yield f"data: {data}\n\n"
+    finally:
+        broker.unsubscribe(user_id, subscription)
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, time
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import ArchivedComment, ArchivedSubTask, Comment, SubTask
+from .visibility import visible_archived_tasks, visible_tasks
+
+COLUMNS = {
+    "tasks": [
+        "id",
+        "title",
+        "priority",
+        "status",
+        "start_date",
+        "end_date",
+        "assigned_to__email",
+        "assigned_by__email",
+        "description",
+        "created",
+        "modified",
+    ],
+    "comments": [
+        "id",
+        "task_reference_id",
+        "user_reference__email",
+        "comment_text",
+        "created",
+        "modified",
+    ],
+    "subtasks": [
+        "id",
+        "parent_task_id",
+        "title",
+        "status",
+        "assigned_to__email",
+        "created",
+        "modified",
+    ],
+}
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def parse_day(value):
+    """start of a YYYY-MM-DD day (or a full datetime) as an aware datetime"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"invalid date {value!r}")
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(
+    kind,
+    user,
+    status=None,
+    email=None,
+    since=None,
+    until=None,
+    include_archived=False,
+):
+    """
+    Rows of one kind visible to user, filtered by task status, by a user
+    on the task and by the creation date of the row. With
+    include_archived the matching archived rows are exported too.
+    """
+    if kind not in COLUMNS:
+        raise ValueError(f"unknown export kind {kind!r}")
+    filters = (status, email, since, until)
+    rows = _rows(kind, visible_tasks(user), Comment, SubTask, *filters)
+    if include_archived:
+        archived = _rows(
+            kind,
+            visible_archived_tasks(user),
+            ArchivedComment,
+            ArchivedSubTask,
+            *filters,
+        )
+        rows = rows.union(archived, all=True)
+    return rows.order_by("id")
+
+
+def _rows(
+    kind, tasks, comment_model, subtask_model, status, email, since, until
+):
+    if status:
+        tasks = tasks.filter(status=status)
+    if email:
+        tasks = tasks.filter(
+            Q(assigned_to__email=email) | Q(assigned_by__email=email)
+        )
+    if kind == "tasks":
+        rows = tasks
+    elif kind == "comments":
+        rows = comment_model.objects.filter(
+            task_reference__in=tasks.values("id")
+        )
+    else:
+        rows = subtask_model.objects.filter(parent_task__in=tasks.values("id"))
+    if since:
+        rows = rows.filter(created__gte=since)
+    if until:
+        rows = rows.filter(created__lt=until)
+    return rows.values_list(*COLUMNS[kind])
+
+
+def _lines(kind, rows, fmt):
+    columns = [column.replace("__", "_") for column in COLUMNS[kind]]
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            writer.writerow(row)
+            if buffer.tell() >= BUFFER_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == "jsonl":
+        lines = []
+        for row in rows.iterator(chunk_size=CHUNK_SIZE):
+            lines.append(json.dumps(dict(zip(columns, row)), default=str))
+            if len(lines) >= 500:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+    else:
+        raise ValueError(f"unknown export format {fmt!r}")
+
+
+@contextmanager
+def snapshot(using=DEFAULT_DB_ALIAS):
+    """
+    Transaction in which every export query sees the same data. On
+    PostgreSQL it is a read only REPEATABLE READ transaction.
+    """
+    connection = connections[using]
+    outermost = not connection.in_atomic_block
+    with transaction.atomic(using):
+        if outermost and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY"
+                )
+        yield
+
+
+def encode_export(kind, rows, fmt, compress=False):
+    """
+    Yield the encoded export a chunk at a time, gzip compressed on the fly
+    if asked. Rows are read through a server side cursor (on PostgreSQL)
+    so memory use does not depend on the table size.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    for text in _lines(kind, rows, fmt):
+        data = text.encode()
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def stream_export(kind, rows, fmt, compress=False):
+    """encode_export run inside its own snapshot transaction"""
+    with snapshot(rows.db):
+        yield from encode_export(kind, rows, fmt, compress)
+
+
+async def astream_export(kind, rows, fmt, compress=False):
+    """
+    stream_export for ASGI, where a sync iterator would be read whole
+    before anything is sent. Each chunk is made in the request's sync
+    thread, so the snapshot and its cursor stay on one connection.
+    """
+    chunks = stream_export(kind, rows, fmt, compress)
+    try:
+        while True:
+            chunk = await sync_to_async(next)(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
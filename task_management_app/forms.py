@@ -1,7 +1,44 @@
 from django import forms
+from django.urls import reverse
 from .models import User, Task, Comment, SubTask
 
 
+class AutocompleteSelect(forms.Widget):
+    """
+    A ModelChoiceField widget for large tables: a search box suggesting
+    choices from the url_name endpoint as the user types, and a hidden
+    input holding the picked id. Only the current choice is looked up
+    to render it, never the whole queryset, and the field validates the
+    submitted id with a single get().
+    """
+
+    template_name = "widgets/autocomplete.html"
+
+    class Media:
+        js = ("js/autocomplete.js",)
+
+    def __init__(self, url_name, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["url"] = reverse(self.url_name)
+        context["widget"]["label"] = self.label(value)
+        return context
+
+    def label(self, value):
+        if value in (None, ""):
+            return ""
+        try:
+            choice = self.choices.queryset.filter(pk=value).first()
+        except (TypeError, ValueError):
+            return ""
+        if choice is None:
+            return ""
+        return self.choices.field.label_from_instance(choice)
+
+
 class UserCreateForm(forms.ModelForm):
     class Meta:
         model = User
@@ -28,7 +65,10 @@ class TaskUpdateForm(forms.ModelForm):
 class TaskCreateForm(forms.ModelForm):
     assigned_to = forms.ModelChoiceField(
         queryset=User.objects.all(),
-        widget=forms.Select(attrs={"class": "form-select", "id": "assign_to"}),
+        widget=AutocompleteSelect(
+            "api_user_autocomplete",
+            attrs={"class": "form-control", "id": "assign_to"},
+        ),
     )
 
     class Meta:
@@ -178,7 +218,9 @@ class SubTaskCreateForm(forms.ModelForm):
                 }
             ),
             "status": forms.Select(attrs={"class": "form-select"}),
-            "assigned_to": forms.Select(attrs={"class": "form-select"}),
+            "assigned_to": AutocompleteSelect(
+                "api_user_autocomplete", attrs={"class": "form-control"}
+            ),
         }
 
 
@@ -193,3 +235,97 @@ class SubTaskForm(forms.ModelForm):
         ("pending", "pending"),
     ]
     status = forms.ChoiceField(choices=STATUS_CHOICES)
+
+
+class TaskImportForm(forms.Form):
+    FORMAT_CHOICES = [("csv", "CSV"), ("jsonl", "JSON lines")]
+    file = forms.FileField(
+        widget=forms.ClearableFileInput(attrs={"class": "form-control"})
+    )
+    format = forms.ChoiceField(
+        choices=FORMAT_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    dry_run = forms.BooleanField(required=False)
+
+
+class TaskIdsField(forms.Field):
+    """task ids sent as repeated ids=<id> parameters"""
+
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(task_id) for task_id in value or ()]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Enter a list of task ids.")
+
+
+class BulkTaskActionForm(forms.Form):
+    """
+    A bulk action and the tasks it applies to: the given ids, or every
+    task matching the where_* filters
+    """
+
+    ACTION_CHOICES = [
+        ("status", "Set status"),
+        ("priority", "Set priority"),
+        ("reassign", "Reassign"),
+        ("delete", "Delete"),
+    ]
+    # the field holding the new value of each action
+    VALUE_FIELDS = {
+        "status": "status",
+        "priority": "priority",
+        "reassign": "assigned_to",
+    }
+    # the Task field each filter matches
+    FILTER_FIELDS = {
+        "where_status": "status",
+        "where_priority": "priority",
+        "where_assigned_to": "assigned_to",
+    }
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    status = forms.ChoiceField(choices=Task.STATUS_CHOICES, required=False)
+    priority = forms.ChoiceField(choices=Task.PRIORITY_CHOICES, required=False)
+    assigned_to = forms.ModelChoiceField(
+        queryset=User.objects.all(), required=False
+    )
+    ids = TaskIdsField(required=False)
+    where_status = forms.ChoiceField(
+        choices=Task.STATUS_CHOICES, required=False
+    )
+    where_priority = forms.ChoiceField(
+        choices=Task.PRIORITY_CHOICES, required=False
+    )
+    where_assigned_to = forms.ModelChoiceField(
+        queryset=User.objects.all(), required=False
+    )
+
+    def filters(self):
+        return {
+            field: self.cleaned_data[name]
+            for name, field in self.FILTER_FIELDS.items()
+            if self.cleaned_data.get(name)
+        }
+
+    def clean(self):
+        cleaned_data = super().clean()
+        value_field = self.VALUE_FIELDS.get(cleaned_data.get("action"))
+        if value_field and not cleaned_data.get(value_field):
+            self.add_error(value_field, "This action needs a value.")
+        if not cleaned_data.get("ids") and not self.filters():
+            raise forms.ValidationError(
+                "Select tasks by id or by at least one filter."
+            )
+        return cleaned_data
+
+    def value(self):
+        value_field = self.VALUE_FIELDS.get(self.cleaned_data["action"])
+        return self.cleaned_data[value_field] if value_field else None
+
+    def select(self, tasks):
+        """the tasks of the queryset the action applies to"""
+        if self.cleaned_data["ids"]:
+            tasks = tasks.filter(pk__in=self.cleaned_data["ids"])
+        return tasks.filter(**self.filters())
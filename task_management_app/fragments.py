@@ -0,0 +1,111 @@
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+from .metrics import FRAGMENT_CACHE
+from .models import Task
+
+CACHE_ALIAS = getattr(settings, "TASK_FRAGMENT_CACHE", "default")
+TIMEOUT = getattr(settings, "TASK_FRAGMENT_TIMEOUT", 24 * 3600)
+# every template rendered per task through this module, so a task's
+# entries can all be dropped at once
+TASK_TEMPLATES = ("taskrow.html", "taskrowadmin.html", "taskdetailsbody.html")
+
+
+class FragmentStats:
+    """hit and miss counters of the fragment cache in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        FRAGMENT_CACHE.inc(hits, result="hit")
+        FRAGMENT_CACHE.inc(misses, result="miss")
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+stats = FragmentStats()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def fragment_key(template_name, task_id):
+    return f"task-fragment:{template_name}:{task_id}"
+
+
+def task_version(task):
+    """
+    what a task's fragments are cached against: the modified time, plus
+    the counters kept up to date with F() updates that leave it alone
+    """
+    return (task.modified,) + tuple(
+        getattr(task, name) for name in Task.DENORMALIZED_FIELDS
+    )
+
+
+def current_locale():
+    """what a fragment's rendering depends on besides the task itself"""
+    return (
+        f"{translation.get_language()}:"
+        f"{timezone.get_current_timezone_name()}"
+    )
+
+
+def render_tasks(template_name, tasks):
+    """
+    Render template_name once per task with the task as context, reusing
+    the markup cached for the same task version and locale. One cache
+    entry per task holds (task_version(task), {locale: html}); an entry
+    for another version counts as a miss and is replaced. All lookups and
+    writes of a call are batched into one get_many and one set_many.
+    """
+    cache = get_cache()
+    locale = current_locale()
+    keys = [fragment_key(template_name, task.pk) for task in tasks]
+    cached = cache.get_many(keys)
+    fragments, changed = [], {}
+    for key, task in zip(keys, tasks):
+        version, rendered = cached.get(key) or (None, {})
+        if version != task_version(task):
+            rendered = {}
+        html = rendered.get(locale)
+        if html is None:
+            html = render_to_string(template_name, {"task": task})
+            changed[key] = (task_version(task), {**rendered, locale: html})
+        fragments.append(mark_safe(html))
+    if changed:
+        cache.set_many(changed, TIMEOUT)
+    stats.record(len(keys) - len(changed), len(changed))
+    return fragments
+
+
+def render_task(template_name, task):
+    return render_tasks(template_name, [task])[0]
+
+
+def invalidate(task_ids):
+    """drop every cached fragment of the given tasks"""
+    get_cache().delete_many(
+        [
+            fragment_key(template_name, task_id)
+            for task_id in task_ids
+            for template_name in TASK_TEMPLATES
+        ]
+    )
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from task_management_app.archive import (
+    ARCHIVE_AFTER,
+    BATCH_SIZE,
+    TaskArchiver,
+    rebuild_indexes,
+)
+from task_management_app.benchmark import browsing, index_size, measure
+from task_management_app.models import Task, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed tasks older than a given age, with their comments "
+        "and subtasks, to the archive tables"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=ARCHIVE_AFTER.total_seconds() / 86400,
+            help="archive completed tasks unchanged for this many days",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--limit", type=int, help="archive at most this many tasks"
+        )
+        parser.add_argument(
+            "--reindex",
+            action="store_true",
+            help="rebuild the task indexes afterwards to reclaim their space",
+        )
+        parser.add_argument(
+            "--measure",
+            action="store_true",
+            help="report the task index size and HomePage latency "
+            "before and after",
+        )
+        parser.add_argument(
+            "--user",
+            help="email of the user to load HomePage as with --measure "
+            "(default: the first superuser)",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        archiver = TaskArchiver(
+            timedelta(days=options["days"]), options["batch_size"]
+        )
+        if not options["measure"]:
+            self.archive(archiver, options)
+            return
+        user = self.measuring_user(options["user"])
+        before = self.measure(user, options["repeat"])
+        self.archive(archiver, options)
+        after = self.measure(user, options["repeat"])
+        for name, unit in (
+            ("tasks", ""),
+            ("index_kib", " KiB"),
+            ("p50_ms", " ms"),
+            ("p95_ms", " ms"),
+        ):
+            self.stdout.write(
+                f"  {name:<10} {before[name]}{unit} -> {after[name]}{unit}"
+            )
+
+    def archive(self, archiver, options):
+        moved = archiver.run(options["limit"])
+        self.stdout.write(f"Archived {moved} tasks")
+        if options["reindex"] and moved:
+            rebuild_indexes(Task)
+
+    def measuring_user(self, email):
+        users = User.objects.filter(is_superuser=True)
+        if email:
+            users = User.objects.filter(email=email)
+        user = users.order_by("id").first()
+        if user is None:
+            raise CommandError("No user to load HomePage as, pass --user")
+        return user
+
+    def measure(self, user, repeat):
+        size = index_size(Task)
+        with browsing(user) as client:
+            timings = measure(client, reverse("home_page"), {}, repeat)
+        return {
+            "tasks": Task.all_objects.count(),
+            "index_kib": None if size is None else round(size / 1024, 1),
+            "p50_ms": timings["p50_ms"],
+            "p95_ms": timings["p95_ms"],
+        }
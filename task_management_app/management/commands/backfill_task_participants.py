@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from task_management_app.models import Task
+from task_management_app.visibility import add_participants
+
+
+class Command(BaseCommand):
+    help = "Create missing TaskParticipant rows for existing tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--since-id",
+            type=int,
+            default=0,
+            help="only backfill tasks with an id above this one",
+        )
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.filter(id__gt=options["since_id"])
+        add_participants(tasks, options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS("Task participants backfilled"))
@@ -0,0 +1,76 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection
+from task_management_app.benchmark import (
+    benchmark_database,
+    compare_deployments,
+    query_latency,
+    seed_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of the hot read views under concurrent "
+        "load between the WSGI (sync views) and ASGI (async views) "
+        "handlers, on a seeded throwaway test database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1000)
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32",
+            help="comma separated numbers of requests in flight",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="requests per handler and concurrency level",
+        )
+        parser.add_argument(
+            "--query-latency-ms",
+            type=float,
+            default=2,
+            help="delay added to every query, standing in for the network "
+            "round trip to a remote database",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--superuser", action="store_true")
+        parser.add_argument("--output", help="write the results as JSON")
+
+    def handle(self, *args, **options):
+        levels = [int(level) for level in options["concurrency"].split(",")]
+        results = {}
+        with benchmark_database():
+            user = seed_benchmark(
+                options["size"], options["seed"], options["superuser"]
+            )
+            with query_latency(options["query_latency_ms"] / 1000):
+                for level in levels:
+                    results[str(level)] = compare_deployments(
+                        user, level, options["requests"]
+                    )
+                    self.report(level, results[str(level)])
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "database": connection.vendor,
+                        "size": options["size"],
+                        "query_latency_ms": options["query_latency_ms"],
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                    sort_keys=True,
+                )
+
+    def report(self, level, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{level} in flight"))
+        for handler, row in results.items():
+            self.stdout.write(
+                f"  {handler}  {row['rps']:>8.1f} req/s  "
+                f"p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms"
+            )
@@ -0,0 +1,72 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from task_management_app.benchmark import (
+    benchmark_database,
+    compare_pooling,
+    pooled_aliases,
+    seed_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test the cheap read views with a new database connection "
+        "per request and with pooled connections, on a seeded throwaway "
+        "test database. Needs DATABASE_ENGINE set to the pooled backend "
+        "and a PostgreSQL server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=1000)
+        parser.add_argument(
+            "--concurrency",
+            default="1,8,32",
+            help="comma separated numbers of requests in flight",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="requests per mode and concurrency level",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="write the results as JSON")
+
+    def handle(self, *args, **options):
+        if not pooled_aliases():
+            raise CommandError(
+                "no database uses the pooled backend, set DATABASE_ENGINE="
+                "task_management_app.backends.postgresql_pool"
+            )
+        levels = [int(level) for level in options["concurrency"].split(",")]
+        results = {}
+        with benchmark_database():
+            user = seed_benchmark(options["size"], options["seed"])
+            for level in levels:
+                results[str(level)] = compare_pooling(
+                    user, level, options["requests"]
+                )
+                self.report(level, results[str(level)])
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "database": connection.vendor,
+                        "size": options["size"],
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                    sort_keys=True,
+                )
+
+    def report(self, level, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{level} in flight"))
+        for mode, row in results.items():
+            opened = sum(row["opened"].values()) if row["opened"] else "-"
+            self.stdout.write(
+                f"  {mode:<6}  {row['rps']:>8.1f} req/s  "
+                f"p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  "
+                f"connections opened {opened}"
+            )
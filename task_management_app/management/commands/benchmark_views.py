@@ -0,0 +1,67 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from task_management_app.benchmark import (
+    benchmark_database,
+    run_benchmark,
+    seed_benchmark,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database at several sizes and measure "
+        "every view: p50/p95 latency, query count and peak memory"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="100,1000,10000",
+            help="comma separated task counts",
+        )
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--superuser",
+            action="store_true",
+            help="browse as a superuser instead of the busiest user",
+        )
+        parser.add_argument("--output", help="write the results as JSON")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        results = {}
+        with benchmark_database():
+            for size in sizes:
+                user = seed_benchmark(
+                    size, options["seed"], options["superuser"]
+                )
+                results[str(size)] = run_benchmark(
+                    Client(), user, options["repeat"]
+                )
+                self.report(size, results[str(size)])
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(
+                    {
+                        "database": connection.vendor,
+                        "repeat": options["repeat"],
+                        "seed": options["seed"],
+                        "superuser": options["superuser"],
+                        "results": results,
+                    },
+                    f,
+                    indent=2,
+                    sort_keys=True,
+                )
+
+    def report(self, size, results):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{size} tasks"))
+        for name, row in results.items():
+            self.stdout.write(
+                f"  {name:<20} {row['status']} "
+                f"p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  "
+                f"{row['queries']:>4} queries  {row['peak_kb']:>9.1f} KiB"
+            )
@@ -0,0 +1,43 @@
+import os
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Collect the static files under content hashed names, minified and "
+        "precompressed, and report the bytes a page load now transfers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="delete the previously collected files first",
+        )
+
+    def handle(self, *args, **options):
+        call_command(
+            "collectstatic",
+            interactive=False,
+            clear=options["clear"],
+            verbosity=options["verbosity"],
+        )
+        source = os.fspath(settings.STATICFILES_DIRS[0])
+        for folder, _, files in sorted(os.walk(source)):
+            for filename in sorted(files):
+                original = os.path.join(folder, filename)
+                name = os.path.relpath(original, source).replace(os.sep, "/")
+                stored = staticfiles_storage.stored_name(name)
+                path = staticfiles_storage.path(stored)
+                sizes = [os.path.getsize(original), os.path.getsize(path)]
+                for suffix in (".gz", ".br"):
+                    if os.path.exists(path + suffix):
+                        sizes.append(os.path.getsize(path + suffix))
+                self.stdout.write(
+                    f"{stored}: "
+                    + " -> ".join(str(size) for size in sizes)
+                    + " bytes"
+                )
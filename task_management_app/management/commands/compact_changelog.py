@@ -0,0 +1,25 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from task_management_app.changelog import BATCH_SIZE, COMPACT_AFTER, compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the change log entries superseded by newer entries about "
+        "the same objects"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=float,
+            default=COMPACT_AFTER / timedelta(days=1),
+            help="only compact entries older than this many days",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        deleted = compact(
+            timedelta(days=options["days"]), options["batch_size"]
+        )
+        self.stdout.write(f"Deleted {deleted} superseded change log entries")
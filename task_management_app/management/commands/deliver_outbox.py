@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from task_management_app.outbox import MAX_ATTEMPTS, OutboxWorker
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbox emails over a reused SMTP connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep polling for new emails instead of exiting",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="seconds to sleep between polls with --loop",
+        )
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(options["batch_size"], options["max_attempts"])
+        try:
+            while True:
+                sent, failed = worker.drain()
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} emails, {failed} failed")
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        finally:
+            worker.close()
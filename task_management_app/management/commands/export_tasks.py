@@ -0,0 +1,70 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from task_management_app.exporter import (
+    encode_export,
+    export_queryset,
+    parse_day,
+    snapshot,
+)
+from task_management_app.models import User
+
+
+class Command(BaseCommand):
+    help = "Export tasks, comments and subtasks as CSV or JSONL files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=["tasks", "comments", "subtasks"],
+            action="append",
+            help="what to export, may be repeated (default: everything)",
+        )
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"], default="csv"
+        )
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--output-dir", default=".")
+        parser.add_argument("--status")
+        parser.add_argument("--user", help="only tasks this email is on")
+        parser.add_argument("--since", help="created on or after YYYY-MM-DD")
+        parser.add_argument("--until", help="created before YYYY-MM-DD")
+        parser.add_argument(
+            "--as-user",
+            help="export only what this user can see (default: everything)",
+        )
+
+    def handle(self, *args, **options):
+        if options["as_user"]:
+            try:
+                viewer = User.objects.get(email=options["as_user"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['as_user']}")
+        else:
+            viewer = User(is_superuser=True)
+        try:
+            since = parse_day(options["since"])
+            until = parse_day(options["until"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        kinds = options["kind"] or ["tasks", "comments", "subtasks"]
+        fmt = options["format"]
+        # one transaction so all files come from the same snapshot
+        with snapshot():
+            for kind in kinds:
+                rows = export_queryset(
+                    kind,
+                    viewer,
+                    status=options["status"],
+                    email=options["user"],
+                    since=since,
+                    until=until,
+                )
+                name = f"{kind}.{fmt}" + (".gz" if options["gzip"] else "")
+                path = os.path.join(options["output_dir"], name)
+                with open(path, "wb") as f:
+                    for data in encode_export(
+                        kind, rows, fmt, options["gzip"]
+                    ):
+                        f.write(data)
+                self.stdout.write(self.style.SUCCESS(f"Wrote {path}"))
@@ -0,0 +1,77 @@
+import csv
+import os
+from django.core.management.base import BaseCommand, CommandError
+from task_management_app.importer import TaskImporter
+from task_management_app.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import tasks from a CSV or JSONL file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "jsonl"],
+            help="defaults to the file extension",
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="validate the file without writing anything",
+        )
+        parser.add_argument(
+            "--assigned-by",
+            help="email of the assigner for rows that do not name one",
+        )
+        parser.add_argument(
+            "--errors", help="write rejected rows to this CSV file"
+        )
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="use bulk_create even on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        fmt = options["format"]
+        if fmt is None:
+            fmt = os.path.splitext(options["path"])[1].lstrip(".").lower()
+            if fmt not in ("csv", "jsonl"):
+                raise CommandError("Pass --format csv or --format jsonl")
+        assigned_by = None
+        if options["assigned_by"]:
+            try:
+                assigned_by = User.objects.get(email=options["assigned_by"]).pk
+            except User.DoesNotExist:
+                raise CommandError(f"No user {options['assigned_by']}")
+
+        error_file = writer = None
+        if options["errors"]:
+            error_file = open(options["errors"], "w", newline="")
+            writer = csv.writer(error_file)
+            writer.writerow(["line", "errors"])
+        importer = TaskImporter(
+            chunk_size=options["chunk_size"],
+            dry_run=options["dry_run"],
+            default_assigned_by=assigned_by,
+            use_copy=False if options["no_copy"] else None,
+            on_error=(
+                (
+                    lambda line, errors: writer.writerow(
+                        [line, "; ".join(errors)]
+                    )
+                )
+                if writer
+                else None
+            ),
+        )
+        try:
+            with open(options["path"], newline="", encoding="utf-8") as f:
+                stats = importer.run(f, fmt)
+        finally:
+            if error_file:
+                error_file.close()
+        prefix = "Dry run: " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{stats}"))
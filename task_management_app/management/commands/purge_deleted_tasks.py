@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from task_management_app.purge import CHUNK_SIZE, PURGE_AFTER, PurgeWorker
+
+
+class Command(BaseCommand):
+    help = "Hard delete soft deleted tasks and their rows in small chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--purge-after",
+            type=float,
+            default=PURGE_AFTER.total_seconds(),
+            help="seconds a deleted task is kept before it is purged",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="seconds to sleep after every chunk, to spare the database",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="keep polling for deleted tasks instead of exiting",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="seconds to sleep between polls with --loop",
+        )
+
+    def handle(self, *args, **options):
+        worker = PurgeWorker(
+            options["chunk_size"],
+            timedelta(seconds=options["purge_after"]),
+            options["pause"],
+        )
+        while True:
+            tasks, rows = worker.drain()
+            if tasks:
+                self.stdout.write(
+                    f"Purged {tasks} tasks and {rows} related rows"
+                )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
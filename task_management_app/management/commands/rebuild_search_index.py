@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from task_management_app.models import Task
+from task_management_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the task search index from tasks and their comments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since-id",
+            type=int,
+            default=0,
+            help="only reindex tasks with an id above this one",
+        )
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.filter(id__gt=options["since_id"]).order_by("id")
+        backend = get_search_backend()
+        backend.reindex(tasks)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reindexed tasks with {type(backend).__name__}"
+            )
+        )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from task_management_app.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = "Recount the dashboard task counters, correcting any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        wrong = reconcile_counters(options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Task counters reconciled, {wrong} corrected")
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from task_management_app.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate deterministic synthetic users, tasks, comments and "
+        "subtasks with a realistic skew"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--tasks", type=int, default=1000)
+        parser.add_argument("--comments", type=int, default=3000)
+        parser.add_argument("--subtasks", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="user emails are <prefix>-user-NNNNN@example.com",
+        )
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--password", default="password", help="password of every user"
+        )
+
+    def handle(self, *args, **options):
+        created = Seeder(
+            users=options["users"],
+            tasks=options["tasks"],
+            comments=options["comments"],
+            subtasks=options["subtasks"],
+            seed=options["seed"],
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+            password=options["password"],
+        ).run()
+        self.stdout.write(
+            self.style.SUCCESS(
+                ", ".join(f"{count} {kind}" for kind, count in created.items())
+            )
+        )
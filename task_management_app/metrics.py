@@ -0,0 +1,393 @@
+import atexit
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from .querybudget import QueryCounter
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6)
+WAIT_BUCKETS = (0.0001, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+POOL_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class Metric:
+    def __init__(self, registry, name, help, labels, buckets=None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets is not None else None
+
+    @property
+    def kind(self):
+        return "counter" if self.buckets is None else "histogram"
+
+    def _key(self, labels):
+        return self.name, tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        shard = self.registry.shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, value, **labels):
+        shard = self.registry.shard()
+        key = self._key(labels)
+        # bucket counts (not cumulative), then sum and count
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0] * (len(self.buckets) + 2)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                values[index] += 1
+                break
+        values[-2] += value
+        values[-1] += 1
+
+
+class Registry:
+    """
+    Counters and histograms kept in one shard per thread, so recording
+    takes no lock. Shards are merged when the metrics are read.
+
+    With METRICS_DIR set, every process writes its totals to its own
+    file there at most every METRICS_FLUSH_SECONDS and at exit, and the
+    exposition sums the files of all processes (WSGI workers, the outbox
+    worker). The directory should be emptied when the server restarts.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.reset()
+
+    def reset(self):
+        """start empty (also run in forked children)"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._last_flush = time.monotonic()
+
+    def counter(self, name, help, labels=()):
+        return self._add(Metric(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Metric(self, name, help, labels, buckets))
+
+    def _add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def shard(self):
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def collect(self):
+        """totals of this process as {(name, label values): value}"""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    # fold the shards of finished threads into one
+                    merge(self._retired, shard)
+            self._shards = live
+            totals = merge({}, self._retired)
+            for _, shard in live:
+                merge(totals, shard)
+        return totals
+
+    def flush(self):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        rows = [
+            [name, list(labels), value]
+            for (name, labels), value in self.collect().items()
+        ]
+        handle, path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(handle, "w") as f:
+            json.dump(rows, f)
+        os.replace(path, os.path.join(directory, f"{os.getpid()}.json"))
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        interval = getattr(settings, "METRICS_FLUSH_SECONDS", 5)
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def gather(self):
+        """totals of every process sharing METRICS_DIR, or just this one"""
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return self.collect()
+        self.flush()
+        totals = {}
+        for filename in os.listdir(directory):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            merge(
+                totals,
+                {(name, tuple(labels)): value for name, labels, value in rows},
+            )
+        return totals
+
+    def exposition(self):
+        """all metrics in the Prometheus text format"""
+        by_metric = defaultdict(list)
+        for (name, labels), value in sorted(self.gather().items()):
+            by_metric[name].append((labels, value))
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in by_metric.get(name, ()):
+                pairs = list(zip(metric.labels, labels))
+                if metric.kind == "counter":
+                    lines.append(sample(name, pairs, value))
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value):
+                    cumulative += count
+                    lines.append(
+                        sample(
+                            f"{name}_bucket",
+                            pairs + [("le", bound)],
+                            cumulative,
+                        )
+                    )
+                lines.append(
+                    sample(
+                        f"{name}_bucket", pairs + [("le", "+Inf")], value[-1]
+                    )
+                )
+                lines.append(sample(f"{name}_sum", pairs, value[-2]))
+                lines.append(sample(f"{name}_count", pairs, value[-1]))
+        return "\n".join(lines) + "\n"
+
+
+def merge(totals, values):
+    for key, value in list(values.items()):
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = (
+                [a + b for a, b in zip(current, value)]
+                if current
+                else list(value)
+            )
+        else:
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def escape(value):
+    return (
+        str(value)
+        .replace("\\", r"\\")
+        .replace('"', r"\"")
+        .replace("\n", r"\n")
+    )
+
+
+def sample(name, pairs, value):
+    """one exposition line: name{label="value",...} value"""
+    labels = ",".join(f'{label}="{escape(v)}"' for label, v in pairs)
+    return f"{name}{{{labels}}} {value}" if labels else f"{name} {value}"
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+atexit.register(registry.flush)
+
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds",
+    "Time until the view returned its response",
+    ("view", "method"),
+)
+REQUESTS = registry.counter(
+    "http_requests_total", "Responses by status", ("view", "method", "status")
+)
+REQUEST_QUERIES = registry.histogram(
+    "http_request_db_queries",
+    "Database queries run per request",
+    ("view",),
+    QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = registry.counter(
+    "http_request_db_seconds_total",
+    "Time spent in database queries",
+    ("view",),
+)
+RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes",
+    "Size of non-streaming response bodies",
+    ("view",),
+    SIZE_BUCKETS,
+)
+FRAGMENT_CACHE = registry.counter(
+    "task_fragment_cache_lookups_total",
+    "Rendered fragment cache lookups by result",
+    ("result",),
+)
+EMAILS_QUEUED = registry.counter(
+    "task_emails_queued_total",
+    "Emails put in the outbox (or skipped for lack of a recipient)",
+    ("kind", "result"),
+)
+EMAILS_DELIVERED = registry.counter(
+    "task_emails_delivered_total",
+    "Outbox delivery attempts by result",
+    ("result",),
+)
+POOL_WAIT = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time to check a connection out of the pool",
+    ("pool",),
+    WAIT_BUCKETS,
+)
+POOL_CHECKOUTS = registry.counter(
+    "db_pool_checkouts_total",
+    "Pool checkouts by result (idle, new or timeout)",
+    ("pool", "result"),
+)
+POOL_IN_USE = registry.histogram(
+    "db_pool_connections_in_use",
+    "Connections in use after each checkout, against the pool max size",
+    ("pool",),
+    POOL_BUCKETS,
+)
+POOL_EVICTIONS = registry.counter(
+    "db_pool_evictions_total",
+    "Pooled connections closed, by reason (idle or broken)",
+    ("pool", "reason"),
+)
+EVENTS_PUBLISHED = registry.counter(
+    "task_events_published_total",
+    "Live update events published, by broker",
+    ("broker",),
+)
+EVENT_STREAMS = registry.counter(
+    "task_event_streams_total",
+    "Event streams opened, and cut short as their client fell behind",
+    ("result",),
+)
+AUTOCOMPLETE_CACHE = registry.counter(
+    "user_autocomplete_lookups_total",
+    "Assignee autocomplete prefix lookups by cache result",
+    ("result",),
+)
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.url_name or match.view_name or "unnamed"
+
+
+# any other method a client makes up is counted as "other", so clients
+# cannot add label values (and shard entries) without limit
+HTTP_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "TRACE")
+)
+
+
+def method_name(request):
+    return request.method if request.method in HTTP_METHODS else "other"
+
+
+# QueryCounter of the request being handled. It follows the request into
+# the threads its async views run queries in, as contextvars are copied
+# there by sync_to_async.
+request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = request_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        # first, so the execute_wrapper() contexts stacked later pop cleanly
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, query count, database time, response size and status
+    of every request, labelled with the resolved URL name. Works in the
+    sync and async chains alike. Disabled with METRICS_ENABLED = False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        for connection in connections.all():
+            install_query_counter(None, connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        queries = QueryCounter()
+        token = request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        token = request_queries.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        view, method = view_name(request), method_name(request)
+        REQUEST_LATENCY.observe(elapsed, view=view, method=method)
+        REQUESTS.inc(view=view, method=method, status=response.status_code)
+        REQUEST_QUERIES.observe(queries.count, view=view)
+        REQUEST_DB_TIME.inc(queries.duration, view=view)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), view=view)
+        registry.maybe_flush()
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0003_subtask"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskCounter",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("is_global", models.BooleanField(default=False)),
+                ("total", models.IntegerField(default=0)),
+                ("pending", models.IntegerField(default=0)),
+                ("in_progress", models.IntegerField(default=0)),
+                ("completed", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_counter",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="taskcounter",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("is_global", True)),
+                fields=("is_global",),
+                name="unique_global_task_counter",
+            ),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SEARCH_VECTOR_SQL = """
+ALTER TABLE task_management_app_tasksearchdocument
+ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', task_text), 'A')
+    || setweight(to_tsvector('english', comment_text), 'B')
+) STORED;
+CREATE INDEX task_search_vector_gin
+ON task_management_app_tasksearchdocument USING GIN (search_vector);
+"""
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(SEARCH_VECTOR_SQL)
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "ALTER TABLE task_management_app_tasksearchdocument "
+            "DROP COLUMN search_vector"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0004_taskcounter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskSearchDocument",
+            fields=[
+                (
+                    "task",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="task_management_app.task",
+                    ),
+                ),
+                ("task_text", models.TextField(default="")),
+                ("comment_text", models.TextField(default="")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SearchPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=64)),
+                ("frequency", models.PositiveIntegerField(default=0)),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_postings",
+                        to="task_management_app.task",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="searchposting",
+            constraint=models.UniqueConstraint(
+                fields=("term", "task"), name="unique_search_posting"
+            ),
+        ),
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
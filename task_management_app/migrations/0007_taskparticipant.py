@@ -0,0 +1,99 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_participants(apps, schema_editor):
+    Task = apps.get_model("task_management_app", "Task")
+    TaskParticipant = apps.get_model("task_management_app", "TaskParticipant")
+    rows = Task.objects.order_by("id").values_list(
+        "id", "assigned_to_id", "assigned_by_id", "created"
+    )
+    batch = []
+    for task_id, assigned_to_id, assigned_by_id, created in rows.iterator(
+        5000
+    ):
+        roles = {assigned_to_id: "assigned_to"}
+        if assigned_by_id is not None:
+            roles[assigned_by_id] = (
+                "both" if assigned_by_id == assigned_to_id else "assigned_by"
+            )
+        batch.extend(
+            TaskParticipant(
+                task_id=task_id, user_id=user_id, role=role, created=created
+            )
+            for user_id, role in roles.items()
+        )
+        if len(batch) >= 5000:
+            TaskParticipant.objects.bulk_create(batch)
+            batch = []
+    TaskParticipant.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0006_outboxemail"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskParticipant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "role",
+                    models.CharField(
+                        choices=[
+                            ("assigned_to", "assigned_to"),
+                            ("assigned_by", "assigned_by"),
+                            ("both", "both"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("created", models.DateTimeField()),
+                (
+                    "task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="participants",
+                        to="task_management_app.task",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_participations",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "created", "task"],
+                        name="participant_user_created_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="taskparticipant",
+            constraint=models.UniqueConstraint(
+                fields=("task", "user"), name="unique_task_participant"
+            ),
+        ),
+        migrations.RunPython(backfill_participants, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:31
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+LEGACY_STATUSES = {
+    "Pending": "pending",
+    "In Progress": "in-progress",
+    "in_progress": "in-progress",
+    "Completed": "completed",
+}
+
+
+def fill_rollup(apps, schema_editor):
+    SubTask = apps.get_model("task_management_app", "SubTask")
+    Task = apps.get_model("task_management_app", "Task")
+    for legacy, status in LEGACY_STATUSES.items():
+        SubTask.objects.filter(status=legacy).update(status=status)
+        Task.objects.filter(status=legacy).update(status=status)
+    # counters may have been built over the legacy statuses
+    apps.get_model("task_management_app", "TaskCounter").objects.all().delete()
+    totals = (
+        SubTask.objects.order_by()
+        .values("parent_task_id")
+        .annotate(
+            total=Count("id"),
+            completed=Count("id", filter=Q(status="completed")),
+        )
+    )
+    for row in totals.iterator():
+        Task.objects.filter(pk=row["parent_task_id"]).update(
+            subtask_total=row["total"], subtask_completed=row["completed"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0007_taskparticipant"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="subtask_completed",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="subtask_total",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="subtask",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("in-progress", "in-progress"),
+                    ("completed", "completed"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
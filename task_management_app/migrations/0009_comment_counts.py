@@ -0,0 +1,46 @@
+# Generated by Django 4.2.17 on 2026-10-18 16:51
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def fill_comment_counts(apps, schema_editor):
+    Comment = apps.get_model("task_management_app", "Comment")
+    Task = apps.get_model("task_management_app", "Task")
+    totals = (
+        Comment.objects.order_by()
+        .values("task_reference_id")
+        .annotate(count=Count("id"), last=Max("created"))
+    )
+    for row in totals.iterator():
+        Task.objects.filter(pk=row["task_reference_id"]).update(
+            comment_count=row["count"], last_comment_at=row["last"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0008_subtask_rollup"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="task",
+            name="comment_count",
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="task",
+            name="last_comment_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="comment",
+            index=models.Index(
+                fields=["task_reference", "created"],
+                name="comment_task_created_idx",
+            ),
+        ),
+        migrations.RunPython(fill_comment_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.17 on 2026-10-18 17:28
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0011_task_archive"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeLogEntry",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("task", "task"),
+                            ("comment", "comment"),
+                            ("subtask", "subtask"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "created"),
+                            ("updated", "updated"),
+                            ("deleted", "deleted"),
+                            ("archived", "archived"),
+                            ("removed", "removed"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("task_id", models.BigIntegerField()),
+                ("assigned_to_id", models.BigIntegerField(null=True)),
+                ("assigned_by_id", models.BigIntegerField(null=True)),
+                (
+                    "created",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["assigned_to_id", "id"],
+                        name="changelog_to_idx",
+                    ),
+                    models.Index(
+                        fields=["assigned_by_id", "id"],
+                        name="changelog_by_idx",
+                    ),
+                    models.Index(
+                        fields=["kind", "object_id", "id"],
+                        name="changelog_object_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def add_email_prefix_index(apps, schema_editor):
+    # pattern ops let LIKE 'prefix%' use the index whatever the collation
+    opclass = (
+        " text_pattern_ops"
+        if schema_editor.connection.vendor == "postgresql"
+        else ""
+    )
+    schema_editor.execute(
+        "CREATE INDEX user_email_prefix_idx "
+        f"ON task_management_app_user (LOWER(email){opclass})"
+    )
+
+
+def remove_email_prefix_index(apps, schema_editor):
+    schema_editor.execute("DROP INDEX user_email_prefix_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0012_changelog"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            add_email_prefix_index, remove_email_prefix_index
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0013_user_email_prefix_index"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="changelogentry",
+            name="changelog_to_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="changelogentry",
+            name="changelog_by_idx",
+        ),
+        migrations.AddField(
+            model_name="changelogentry",
+            name="txid",
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="changelogentry",
+            index=models.Index(
+                fields=["assigned_to_id", "txid", "id"],
+                name="changelog_to_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="changelogentry",
+            index=models.Index(
+                fields=["assigned_by_id", "txid", "id"],
+                name="changelog_by_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0014_changelog_txid"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="outboxemail",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "pending"),
+                    ("sending", "sending"),
+                    ("sent", "sent"),
+                    ("dead", "dead"),
+                ],
+                default="pending",
+                max_length=10,
+            ),
+        ),
+    ]
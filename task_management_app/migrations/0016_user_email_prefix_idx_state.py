@@ -0,0 +1,30 @@
+# Generated by Django 4.2.17 on 2026-10-18 18:23
+
+from django.db import migrations, models
+import django.db.models.functions.text
+import task_management_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("task_management_app", "0015_outboxemail_sending"),
+    ]
+
+    operations = [
+        # 0013 made the index with SQL; this only records it in the state
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name="user",
+                    index=models.Index(
+                        task_management_app.models.PostgresOpClass(
+                            django.db.models.functions.text.Lower("email"),
+                            name="text_pattern_ops",
+                        ),
+                        name="user_email_prefix_idx",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -1,10 +1,23 @@
-from django.db import models
+from django.contrib.postgres.indexes import OpClass
+from django.db import models, router, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
-from .manager import CustomUserManager
+from .manager import CustomUserManager, TaskManager
 from django.utils.translation import gettext_lazy as _
 from model_utils.models import TimeStampedModel
 
 
+class PostgresOpClass(OpClass):
+    """an index operator class, left out on databases other than PostgreSQL"""
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if connection.vendor != "postgresql":
+            return compiler.compile(self.get_source_expressions()[0])
+        return super().as_sql(compiler, connection, **extra_context)
+
+
 class User(AbstractUser, TimeStampedModel):
     username = None
     email = models.EmailField(_("email address"), unique=True)
@@ -17,11 +30,39 @@ class User(AbstractUser, TimeStampedModel):
 
     objects = CustomUserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # pattern ops let LIKE 'prefix%' use the index whatever the
+            # collation; made by migration 0013 before it was declared
+            models.Index(
+                PostgresOpClass(Lower("email"), name="text_pattern_ops"),
+                name="user_email_prefix_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
 
-class Task(TimeStampedModel):
+class AtomicSaveModel(models.Model):
+    """
+    Saved in a transaction, so what the post_save signals write (the
+    change log, counters, participants) commits with the row or not at
+    all. Deletes already run the signals in the delete's transaction.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class Task(AtomicSaveModel, TimeStampedModel):
     PRIORITY_CHOICES = (
         ("high", "high"),
         ("medium", "medium"),
@@ -47,12 +88,125 @@ class Task(TimeStampedModel):
     status = models.CharField(max_length=50, choices=STATUS_CHOICES)
     priority = models.CharField(max_length=50, choices=PRIORITY_CHOICES)
     description = models.TextField(default="")
+    subtask_total = models.IntegerField(default=0, editable=False)
+    subtask_completed = models.IntegerField(default=0, editable=False)
+    comment_count = models.IntegerField(default=0, editable=False)
+    last_comment_at = models.DateTimeField(null=True, editable=False)
+    # set when the task is deleted; purge_deleted_tasks removes it later
+    deleted_at = models.DateTimeField(null=True, editable=False)
+
+    # tasks that are not deleted; all_objects includes the deleted ones
+    objects = TaskManager()
+    all_objects = models.Manager()
+
+    # maintained with F() updates, never written back by save()
+    DENORMALIZED_FIELDS = (
+        "subtask_total",
+        "subtask_completed",
+        "comment_count",
+        "last_comment_at",
+    )
+    # neither is deleted_at, so a stale instance cannot undelete its task
+    UPDATE_ONLY_FIELDS = DENORMALIZED_FIELDS + ("deleted_at",)
+    TRACKED_FIELDS = (
+        "status",
+        "assigned_to_id",
+        "assigned_by_id",
+        "title",
+        "description",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["deleted_at"],
+                name="task_deleted_idx",
+                condition=Q(deleted_at__isnull=False),
+            )
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.UPDATE_ONLY_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def tracked_state(self):
+        """current values of the fields other tables are derived from"""
+        return {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+    def previous_state(self):
+        """
+        Values of the tracked fields as last loaded from or saved to the
+        database, or None for a task that has not been saved yet.
+        """
+        if self._state.adding:
+            return None
+        loaded = getattr(self, "_loaded_values", {})
+        if all(
+            loaded.get(name, models.DEFERRED) is not models.DEFERRED
+            for name in self.TRACKED_FIELDS
+        ):
+            return {name: loaded[name] for name in self.TRACKED_FIELDS}
+        return (
+            Task.all_objects.filter(pk=self.pk)
+            .values(*self.TRACKED_FIELDS)
+            .first()
+        )
+
+
+class TaskParticipant(models.Model):
+    """
+    One row per user on a task, with a copy of the task's created time, so
+    the tasks visible to a user come from one index range scan instead of
+    an OR over assigned_to and assigned_by.
+    """
+
+    ROLE_CHOICES = (
+        ("assigned_to", "assigned_to"),
+        ("assigned_by", "assigned_by"),
+        ("both", "both"),
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="task_participations"
+    )
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="participants"
+    )
+    role = models.CharField(max_length=20, choices=ROLE_CHOICES)
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["task", "user"], name="unique_task_participant"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "created", "task"],
+                name="participant_user_created_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user} ({self.role}) on {self.task_id}"
+
 
-class Comment(TimeStampedModel):
+class Comment(AtomicSaveModel, TimeStampedModel):
     comment_text = models.CharField(max_length=400)
     task_reference = models.ForeignKey(
         Task, on_delete=models.CASCADE, related_name="comments"
@@ -61,19 +215,252 @@ class Comment(TimeStampedModel):
         User, on_delete=models.CASCADE, related_name="user_comments"
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["task_reference", "created"],
+                name="comment_task_created_idx",
+            )
+        ]
+
     def __str__(self):
         return self.comment_text
 
 
-class SubTask(TimeStampedModel):
+class SubTask(AtomicSaveModel, TimeStampedModel):
     parent_task = models.ForeignKey(
         Task, on_delete=models.CASCADE, related_name="subtasks"
     )
     title = models.CharField(max_length=200)
     status = models.CharField(
-        max_length=20, choices=Task.STATUS_CHOICES, default="Pending"
+        max_length=20, choices=Task.STATUS_CHOICES, default="pending"
     )
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE)
 
     def _str_(self):
         return f"{self.title} (SubTask of {self.parent_task.title})"
+
+
+class TaskCounter(models.Model):
+    """
+    Per-user task counts by status shown on the dashboard. The row with
+    is_global set holds the counts over every task for superusers.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="task_counter",
+    )
+    is_global = models.BooleanField(default=False)
+    total = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+    in_progress = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["is_global"],
+                condition=Q(is_global=True),
+                name="unique_global_task_counter",
+            )
+        ]
+
+    def __str__(self):
+        return "global" if self.is_global else str(self.user)
+
+
+class TaskSearchDocument(models.Model):
+    """
+    Text a task is found by. On PostgreSQL a generated tsvector column
+    with a GIN index is added on top of it by migration 0005.
+    """
+
+    task = models.OneToOneField(
+        Task,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    task_text = models.TextField(default="")
+    comment_text = models.TextField(default="")
+
+
+class SearchPosting(models.Model):
+    """inverted index entry: how often a term occurs in a task's text"""
+
+    term = models.CharField(max_length=64)
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="search_postings"
+    )
+    frequency = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["term", "task"], name="unique_search_posting"
+            )
+        ]
+
+
+class OutboxEmail(TimeStampedModel):
+    """
+    Email waiting to be delivered by the deliver_outbox command. Rows are
+    written in the same transaction as the change they announce. While a
+    worker sends it, an email is "sending" until next_attempt_at.
+    """
+
+    STATUS_CHOICES = (
+        ("pending", "pending"),
+        ("sending", "sending"),
+        ("sent", "sent"),
+        ("dead", "dead"),
+    )
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True, default="")
+    recipients = models.JSONField(default=list)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default="pending"
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default="")
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_attempt_at"],
+                name="outbox_due_idx",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class ArchivedTask(models.Model):
+    """
+    A completed task moved out of the hot Task table by archive_tasks,
+    keeping its id. The text of the task and its comments is kept in
+    search_text for searches that include archived tasks.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=100)
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_tasks"
+    )
+    assigned_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_assigned_tasks",
+        null=True,
+    )
+    start_date = models.DateTimeField()
+    end_date = models.DateTimeField()
+    status = models.CharField(max_length=50)
+    priority = models.CharField(max_length=50)
+    description = models.TextField(default="")
+    subtask_total = models.IntegerField(default=0)
+    subtask_completed = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    last_comment_at = models.DateTimeField(null=True)
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    search_text = models.TextField(default="")
+
+    is_archived = True
+
+    def __str__(self):
+        return self.title
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    task_reference = models.ForeignKey(
+        ArchivedTask, on_delete=models.CASCADE, related_name="comments"
+    )
+    user_reference = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_comments"
+    )
+    comment_text = models.CharField(max_length=400)
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return self.comment_text
+
+
+class ArchivedSubTask(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    parent_task = models.ForeignKey(
+        ArchivedTask, on_delete=models.CASCADE, related_name="subtasks"
+    )
+    title = models.CharField(max_length=200)
+    status = models.CharField(max_length=50)
+    assigned_to = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="archived_subtasks"
+    )
+    created = models.DateTimeField()
+    modified = models.DateTimeField()
+
+    def __str__(self):
+        return self.title
+
+
+class ChangeLogEntry(models.Model):
+    """
+    One create, update or delete of a task, comment or subtask, appended
+    in the transaction of the change and served in (txid, id) order by
+    the changes API. The users on the task at the time are copied, not
+    referenced, so entries outlive the rows they describe; a "removed"
+    entry tells a user a task was reassigned away from them.
+    """
+
+    KIND_CHOICES = (
+        ("task", "task"),
+        ("comment", "comment"),
+        ("subtask", "subtask"),
+    )
+    ACTION_CHOICES = (
+        ("created", "created"),
+        ("updated", "updated"),
+        ("deleted", "deleted"),
+        ("archived", "archived"),
+        ("removed", "removed"),
+    )
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    task_id = models.BigIntegerField()
+    assigned_to_id = models.BigIntegerField(null=True)
+    assigned_by_id = models.BigIntegerField(null=True)
+    created = models.DateTimeField(default=timezone.now)
+    # the id of the writing transaction on PostgreSQL, 0 elsewhere
+    txid = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["assigned_to_id", "txid", "id"],
+                name="changelog_to_idx",
+            ),
+            models.Index(
+                fields=["assigned_by_id", "txid", "id"],
+                name="changelog_by_idx",
+            ),
+            models.Index(
+                fields=["kind", "object_id", "id"],
+                name="changelog_object_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} {self.action}"
@@ -0,0 +1,135 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .metrics import EMAILS_DELIVERED, registry
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 5)
+BACKOFF_SECONDS = getattr(settings, "OUTBOX_BACKOFF_SECONDS", 30)
+MAX_BACKOFF_SECONDS = getattr(settings, "OUTBOX_MAX_BACKOFF_SECONDS", 3600)
+# how long a claimed batch may take to send before others may retry it
+LEASE_SECONDS = getattr(settings, "OUTBOX_LEASE_SECONDS", 600)
+
+
+def backoff(attempts):
+    """delay before retrying an email that failed attempts times"""
+    return timedelta(
+        seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    )
+
+
+class OutboxWorker:
+    """
+    Deliver due outbox emails in batches over one SMTP connection that
+    stays open between batches. Failed emails are retried with
+    exponential backoff and marked dead after max_attempts.
+    """
+
+    def __init__(
+        self,
+        batch_size=100,
+        max_attempts=MAX_ATTEMPTS,
+        lease_seconds=LEASE_SECONDS,
+    ):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = timedelta(seconds=lease_seconds)
+        self.connection = get_connection()
+
+    def close(self):
+        self.connection.close()
+
+    def _send(self, email):
+        message = EmailMessage(
+            email.subject,
+            email.body,
+            email.from_email or None,
+            email.recipients,
+            connection=self.connection,
+        )
+        try:
+            # no-op while the connection is up, reconnects after a failure
+            self.connection.open()
+            message.send()
+        except Exception:
+            # drop a connection the server may have closed on us
+            self.connection.close()
+            raise
+
+    def claim(self):
+        """
+        Take up to batch_size due emails: they are marked sending until
+        their lease runs out and the claim commits before any is sent, so
+        no row lock or transaction stays open over SMTP. An email left
+        sending by a worker that died is due again once its lease ends.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                OutboxEmail.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status__in=("pending", "sending"),
+                    next_attempt_at__lte=now,
+                )
+                .order_by("next_attempt_at", "id")[: self.batch_size]
+            )
+            for email in batch:
+                email.status = "sending"
+                email.attempts += 1
+                email.next_attempt_at = now + self.lease
+            OutboxEmail.objects.bulk_update(
+                batch, ["status", "attempts", "next_attempt_at"]
+            )
+        return batch
+
+    def deliver_batch(self):
+        """send one batch of due emails, returning (sent, failed)"""
+        sent = failed = 0
+        for email in self.claim():
+            lease = email.next_attempt_at
+            now = timezone.now()
+            if now >= lease:
+                # another worker may have claimed it again by now
+                continue
+            try:
+                self._send(email)
+            except Exception as e:
+                failed += 1
+                EMAILS_DELIVERED.inc(result="failed")
+                outcome = {"last_error": str(e)}
+                if email.attempts >= self.max_attempts:
+                    EMAILS_DELIVERED.inc(result="dead")
+                    outcome["status"] = "dead"
+                    logger.error("Outbox email %s is dead: %s", email.pk, e)
+                else:
+                    outcome["status"] = "pending"
+                    outcome["next_attempt_at"] = now + backoff(email.attempts)
+            else:
+                sent += 1
+                EMAILS_DELIVERED.inc(result="sent")
+                outcome = {
+                    "status": "sent",
+                    "sent_at": timezone.now(),
+                    "last_error": "",
+                }
+            # saved at once, so a crash later in the batch cannot resend it
+            OutboxEmail.objects.filter(
+                pk=email.pk, status="sending", next_attempt_at=lease
+            ).update(**outcome)
+        registry.maybe_flush()
+        return sent, failed
+
+    def drain(self):
+        """deliver batches until no email is due"""
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.deliver_batch()
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < self.batch_size:
+                return total_sent, total_failed
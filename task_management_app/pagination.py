@@ -0,0 +1,158 @@
+import base64
+import binascii
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+PAGE_SIZE = getattr(settings, "KEYSET_PAGE_SIZE", 50)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """one page of rows with the cursors of its neighbours"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, params):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _query(self, cursor):
+        params = self.params.copy()
+        params["cursor"] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor) if self.has_next else ""
+
+    @property
+    def previous_query(self):
+        if not self.has_previous:
+            return ""
+        return self._query(self.previous_cursor)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on a unique ordering (by default created, id)
+    by filtering on the last seen key instead of using OFFSET, so every
+    page costs the same index range scan and no COUNT(*) is needed.
+    """
+
+    def __init__(
+        self, queryset, keys=("created", "id"), descending=False, size=None
+    ):
+        self.queryset = queryset
+        self.keys = keys
+        self.descending = descending
+        self.size = size or PAGE_SIZE
+
+    def _ordering(self, backwards):
+        prefix = "-" if self.descending != backwards else ""
+        return [prefix + key for key in self.keys]
+
+    def _after(self, values, backwards):
+        """rows strictly after values in the (possibly reversed) ordering"""
+        lookup = "lt" if self.descending != backwards else "gt"
+        condition = Q(**{f"{self.keys[-1]}__{lookup}": values[-1]})
+        for index in reversed(range(len(self.keys) - 1)):
+            key, value = self.keys[index], values[index]
+            condition = Q(**{f"{key}__{lookup}": value}) | (
+                Q(**{key: value}) & condition
+            )
+        return condition
+
+    def _key(self, obj):
+        if isinstance(obj, dict):
+            return [obj[key] for key in self.keys]
+        return [getattr(obj, key) for key in self.keys]
+
+    def _field(self, key):
+        annotation = self.queryset.query.annotations.get(key)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(key)
+
+    def encode_cursor(self, obj, backwards):
+        values = [
+            value.isoformat() if hasattr(value, "isoformat") else value
+            for value in self._key(obj)
+        ]
+        raw = json.dumps(["p" if backwards else "n", values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ("n", "p") or len(values) != len(self.keys):
+                raise InvalidCursor(cursor)
+            values = [
+                self._field(key).to_python(value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (
+            binascii.Error,
+            UnicodeDecodeError,
+            TypeError,
+            ValueError,
+            ValidationError,
+        ):
+            raise InvalidCursor(cursor)
+        return direction == "p", values
+
+    def page(self, cursor=None, params=None):
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            backwards, values = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._after(values, backwards))
+        rows = list(
+            queryset.order_by(*self._ordering(backwards))[: self.size + 1]
+        )
+        more = len(rows) > self.size
+        rows = rows[: self.size]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, bool(cursor)
+        next_cursor = (
+            self.encode_cursor(rows[-1], False) if has_next and rows else None
+        )
+        previous_cursor = (
+            self.encode_cursor(rows[0], True)
+            if has_previous and rows
+            else None
+        )
+        if params is None:
+            params = QueryDict(mutable=True)
+        return KeysetPage(rows, next_cursor, previous_cursor, params)
+
+    def paginate(self, request):
+        """page selected by the cursor query parameter, first page if invalid"""
+        params = request.GET.copy()
+        try:
+            return self.page(params.get("cursor"), params)
+        except InvalidCursor:
+            return self.page(None, params)
@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from collections import deque
+from .metrics import POOL_CHECKOUTS, POOL_EVICTIONS, POOL_IN_USE, POOL_WAIT
+
+
+class PoolTimeout(Exception):
+    """no pooled connection was released in time"""
+
+
+def ping(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    finally:
+        cursor.close()
+
+
+def rollback(connection):
+    # a borrower may give its connection back inside a transaction, e.g.
+    # when Django closes a connection in an atomic block
+    connection.rollback()
+
+
+class ConnectionPool:
+    """
+    Thread safe pool of the DB-API connections made by connect().
+
+    At most max_size connections exist at once; a checkout waits up to
+    timeout seconds for a release when they are all in use, then raises
+    PoolTimeout. Idle connections beyond min_size are closed after
+    max_idle seconds. With pre_ping every reused connection is checked
+    first, so a connection the server dropped is replaced instead of
+    failing the request that got it. Released connections are rolled
+    back; the ones that cannot be are closed.
+    """
+
+    def __init__(
+        self,
+        connect,
+        name="default",
+        min_size=0,
+        max_size=10,
+        max_idle=300,
+        timeout=10,
+        pre_ping=True,
+        check=ping,
+        reset=rollback,
+    ):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("need 0 <= min_size <= max_size and max_size > 0")
+        self.connect = connect
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.pre_ping = pre_ping
+        self.check = check
+        self.reset = reset
+        self.size = 0
+        self.opened = 0
+        self.closed = False
+        # (connection, released at), least recently released first
+        self._idle = deque()
+        self._lock = threading.Condition()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def fill(self):
+        """open connections up to min_size"""
+        while True:
+            with self._lock:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            connection = self._open()
+            self.release(connection)
+
+    def acquire(self):
+        started = time.monotonic()
+        while True:
+            connection = self._take(started + self.timeout)
+            if connection is None:
+                connection, result = self._open(), "new"
+                break
+            if not self.pre_ping or self._usable(connection):
+                result = "idle"
+                break
+        POOL_WAIT.observe(time.monotonic() - started, pool=self.name)
+        POOL_CHECKOUTS.inc(pool=self.name, result=result)
+        POOL_IN_USE.observe(self.size - self.idle, pool=self.name)
+        return connection
+
+    def release(self, connection):
+        try:
+            self.reset(connection)
+        except Exception:
+            self._discard(connection, "broken")
+            return
+        if self.closed:
+            self._discard(connection, "closed")
+            return
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    def close(self):
+        """close the idle connections, and the others once released"""
+        with self._lock:
+            self.closed = True
+            idle, self._idle = self._idle, deque()
+            self.size -= len(idle)
+            self._lock.notify_all()
+        for connection, _ in idle:
+            self._close(connection, "closed")
+
+    def _take(self, deadline):
+        """
+        The most recently released idle connection, which is the likeliest
+        to be alive, or None after reserving a slot for a new connection.
+        """
+        with self._lock:
+            while True:
+                stale = self._stale()
+                if self._idle or self.size < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    POOL_CHECKOUTS.inc(pool=self.name, result="timeout")
+                    raise PoolTimeout(
+                        f"no connection of pool {self.name!r} was released "
+                        f"within {self.timeout}s ({self.max_size} in use)"
+                    )
+                self._lock.wait(remaining)
+            if self._idle:
+                connection, _ = self._idle.pop()
+            else:
+                connection = None
+                self.size += 1
+        for old in stale:
+            self._close(old, "idle")
+        return connection
+
+    def _stale(self):
+        """unlink the connections idle for longer than max_idle"""
+        stale = []
+        now = time.monotonic()
+        while (
+            self._idle
+            and self.size > self.min_size
+            and now - self._idle[0][1] >= self.max_idle
+        ):
+            stale.append(self._idle.popleft()[0])
+            self.size -= 1
+        return stale
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._lock:
+                self.size -= 1
+                self._lock.notify()
+            raise
+        self.opened += 1
+        return connection
+
+    def _usable(self, connection):
+        try:
+            self.check(connection)
+        except Exception:
+            self._discard(connection, "broken")
+            return False
+        return True
+
+    def _discard(self, connection, reason):
+        with self._lock:
+            self.size -= 1
+            self._lock.notify()
+        self._close(connection, reason)
+
+    def _close(self, connection, reason):
+        POOL_EVICTIONS.inc(pool=self.name, reason=reason)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+# {(alias, database name): ConnectionPool} of this process
+pools = {}
+pools_lock = threading.Lock()
+# a forked child must not use (or close) the connections of its parent
+os.register_at_fork(after_in_child=pools.clear)
+
+
+def get_pool(alias, database, connect, options):
+    """the pool of alias for database, created and filled on first use"""
+    key = (alias, database)
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None or pool.closed:
+            pool = pools[key] = ConnectionPool(connect, name=alias, **options)
+            created = True
+        else:
+            created = False
+    if created:
+        pool.fill()
+    return pool
+
+
+def close_pools(alias=None):
+    """close the pools of alias, or all of them"""
+    with pools_lock:
+        closing = [
+            pools.pop(key) for key in list(pools) if alias in (None, key[0])
+        ]
+    for pool in closing:
+        pool.close()
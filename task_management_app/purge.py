@@ -0,0 +1,102 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from .models import Task
+
+CHUNK_SIZE = getattr(settings, "TASK_PURGE_CHUNK_SIZE", 500)
+# how long deleted tasks are kept before they are purged
+PURGE_AFTER = timedelta(seconds=getattr(settings, "TASK_PURGE_AFTER", 0))
+
+
+def cascaded_relations():
+    """the relations whose rows go with a purged task"""
+    return [
+        relation
+        for relation in Task._meta.related_objects
+        if relation.on_delete is models.CASCADE
+    ]
+
+
+def delete_tasks(task_ids):
+    """
+    Delete tasks and the rows pointing at them at once, with one DELETE
+    per table and no signals, for callers that settle the counters and
+    search index themselves
+    """
+    for relation in cascaded_relations():
+        relation.related_model._base_manager.filter(
+            **{f"{relation.field.name}__in": task_ids}
+        )._raw_delete(Task.objects.db)
+    Task._base_manager.filter(pk__in=task_ids)._raw_delete(Task.objects.db)
+
+
+class PurgeWorker:
+    """
+    Hard delete soft deleted tasks and the rows pointing at them. Every
+    DELETE takes at most chunk_size rows in its own short transaction,
+    so a task with a huge comment thread never holds locks for long, and
+    an interrupted purge resumes where it stopped. Rows are deleted
+    without signals: the counters and search index were settled when
+    the tasks were soft deleted.
+    """
+
+    def __init__(
+        self, chunk_size=CHUNK_SIZE, purge_after=PURGE_AFTER, pause=0
+    ):
+        self.chunk_size = chunk_size
+        self.purge_after = purge_after
+        self.pause = pause
+        self.relations = cascaded_relations()
+
+    def due(self):
+        """ids of the next chunk of tasks due for purging"""
+        return list(
+            Task.all_objects.filter(
+                deleted_at__lte=timezone.now() - self.purge_after
+            )
+            .order_by("deleted_at", "id")
+            .values_list("id", flat=True)[: self.chunk_size]
+        )
+
+    def _delete_chunk(self, queryset):
+        with transaction.atomic():
+            ids = list(
+                queryset.values_list("pk", flat=True)[: self.chunk_size]
+            )
+            if not ids:
+                return 0
+            deleted = queryset.model._base_manager.filter(
+                pk__in=ids
+            )._raw_delete(queryset.db)
+        if self.pause:
+            time.sleep(self.pause)
+        return deleted
+
+    def purge(self, task_ids):
+        """delete the given deleted tasks; returns the number of rows"""
+        rows = 0
+        for relation in self.relations:
+            related = relation.related_model._base_manager.filter(
+                **{f"{relation.field.name}__in": task_ids}
+            )
+            while True:
+                deleted = self._delete_chunk(related)
+                if not deleted:
+                    break
+                rows += deleted
+        return rows + self._delete_chunk(
+            Task.all_objects.filter(pk__in=task_ids, deleted_at__isnull=False)
+        )
+
+    def drain(self):
+        """purge every due task; returns (tasks, related rows) deleted"""
+        tasks = rows = 0
+        while True:
+            task_ids = self.due()
+            if not task_ids:
+                return tasks, rows
+            deleted = self.purge(task_ids)
+            tasks += len(task_ids)
+            rows += deleted - len(task_ids)
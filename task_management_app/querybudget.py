@@ -0,0 +1,94 @@
+import logging
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """
+    count the queries run on every database connection while active, and
+    the seconds spent in them
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+def query_budget(max_queries):
+    """declare the most queries a view (function or class) may run"""
+
+    def decorator(view):
+        view.max_queries = max_queries
+        return view
+
+    return decorator
+
+
+class QueryBudgetMixin:
+    """class based view counterpart of @query_budget"""
+
+    max_queries = None
+
+
+def get_query_budget(view_func):
+    budget = getattr(view_func, "max_queries", None)
+    if budget is None:
+        view_class = getattr(view_func, "view_class", None)
+        budget = getattr(view_class, "max_queries", None)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    """
+    In DEBUG, count the queries of each request and log (or raise, with
+    QUERY_BUDGET_RAISE) when a view goes over its declared budget.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        budget = getattr(request, "query_budget", None)
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.path} ran {counter.count} queries, "
+                f"budget is {budget}"
+            )
+            if getattr(settings, "QUERY_BUDGET_RAISE", False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from . import changelog
+from .models import Comment, SubTask, Task
+
+
+def subtask_state(subtask):
+    return {"parent_task_id": subtask.parent_task_id, "status": subtask.status}
+
+
+def _adjust(task_id, state, sign):
+    Task.objects.filter(pk=task_id).update(
+        subtask_total=F("subtask_total") + sign,
+        subtask_completed=F("subtask_completed")
+        + (sign if state["status"] == "completed" else 0),
+    )
+
+
+def sync_parent_status(task_id):
+    """
+    Complete a task once all its subtasks are completed, and reopen a
+    completed task when one of its subtasks is reopened.
+    """
+    task = Task.objects.select_for_update().filter(pk=task_id).first()
+    if task is None or task.subtask_total == 0:
+        return
+    if task.subtask_completed == task.subtask_total:
+        status = "completed"
+    elif task.status == "completed":
+        status = "in-progress"
+    else:
+        return
+    if task.status != status:
+        task.status = status
+        task.save()
+
+
+def subtask_changed(old, new, sync_status=True):
+    """
+    Keep the subtask counters of the parent task(s) current. old is None
+    for a created subtask and new is None for a deleted one.
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            _adjust(old["parent_task_id"], old, -1)
+        if new is not None:
+            _adjust(new["parent_task_id"], new, 1)
+        if not sync_status:
+            return
+        for task_id in {
+            state["parent_task_id"] for state in (old, new) if state
+        }:
+            sync_parent_status(task_id)
+
+
+def complete_subtasks(task):
+    """cascade the completion of a task to its own subtasks in one UPDATE"""
+    with transaction.atomic():
+        subtasks = SubTask.objects.filter(parent_task=task).exclude(
+            status="completed"
+        )
+        done = list(subtasks.values_list("id", flat=True))
+        subtasks.update(status="completed", modified=timezone.now())
+        state = task.tracked_state()
+        changelog.record_children(
+            "subtask", "updated", ((pk, task.pk, state) for pk in done)
+        )
+        Task.objects.filter(pk=task.pk).update(
+            subtask_completed=F("subtask_total")
+        )
+    task.subtask_completed = task.subtask_total
+
+
+def comment_added(comment):
+    """count a new comment on its task in one UPDATE"""
+    created = Value(comment.created)
+    Task.objects.filter(pk=comment.task_reference_id).update(
+        comment_count=F("comment_count") + 1,
+        last_comment_at=Greatest(
+            Coalesce("last_comment_at", created), created
+        ),
+    )
+
+
+def _newest_comment():
+    return Comment.objects.filter(task_reference_id=OuterRef("pk")).order_by(
+        "-created"
+    )
+
+
+def comment_removed(comment):
+    """
+    Uncount a deleted comment; last_comment_at falls back to the newest
+    remaining comment, found through the (task_reference, created) index
+    """
+    Task.objects.filter(pk=comment.task_reference_id).update(
+        comment_count=F("comment_count") - 1,
+        last_comment_at=Subquery(_newest_comment().values("created")[:1]),
+    )
+
+
+def recount_comments(tasks):
+    """recompute the comment counters of tasks after bulk writes"""
+    totals = (
+        Comment.objects.filter(task_reference_id=OuterRef("pk"))
+        .order_by()
+        .values("task_reference_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    tasks.update(
+        comment_count=Coalesce(Subquery(totals), 0),
+        last_comment_at=Subquery(_newest_comment().values("created")[:1]),
+    )
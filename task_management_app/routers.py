@@ -0,0 +1,139 @@
+import contextvars
+import random
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = "primary_until"
+# always read from the primary: a session missing on a lagging replica
+# would log its user out
+PRIMARY_APPS = {"sessions"}
+
+
+def replica_aliases():
+    return list(getattr(settings, "REPLICA_DATABASES", ()))
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+
+
+class RoutingState:
+    """
+    Where the queries of one request go. Reads use the request's replica
+    only in views marked ReplicaReadMixin, and only until the request
+    writes, or at all when a recent write pinned its client to the
+    primary.
+    """
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+    def use_replica(self):
+        replicas = replica_aliases()
+        if replicas and not self.pinned:
+            self.replica = random.choice(replicas)
+
+    @property
+    def read_database(self):
+        if self.wrote or self.pinned:
+            return None
+        return self.replica
+
+
+# RoutingState of the request being handled; copied into the threads
+# its async views run queries in, like metrics.request_queries
+routing = contextvars.ContextVar("routing", default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Send all writes to the primary and the reads of read only views to
+    one of REPLICA_DATABASES. Outside of a request (commands, workers)
+    everything goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = routing.get()
+        if state is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return state.read_database
+
+    def db_for_write(self, model, **hints):
+        state = routing.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+
+class ReplicaReadMixin:
+    """mark a class based view as safe to serve from a replica"""
+
+    read_from_replica = True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Set up the RoutingState of each request. A client that wrote is
+    pinned to the primary for REPLICA_STICKY_SECONDS with a cookie, so
+    its next pages show its own changes despite replication lag.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.finish(state, response)
+
+    def start(self, request):
+        try:
+            pinned = float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        state = request.routing = RoutingState(pinned)
+        return state, routing.set(state)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if getattr(view_class, "read_from_replica", False):
+            request.routing.use_replica()
+
+    def finish(self, state, response):
+        if state.wrote:
+            seconds = sticky_seconds()
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(time.time() + seconds),
+                max_age=seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
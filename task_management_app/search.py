@@ -0,0 +1,367 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Concat
+from django.utils.module_loading import import_string
+from .visibility import visible_archived_tasks, visible_tasks
+from .models import (
+    Comment,
+    SearchPosting,
+    Task,
+    TaskCounter,
+    TaskSearchDocument,
+)
+
+TOKEN_RE = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split()
+)
+
+
+def tokenize(text):
+    """lower-cased words of a text, without stop words"""
+    return [
+        token[:64]
+        for token in TOKEN_RE.findall((text or "").lower())
+        if token not in STOP_WORDS
+    ]
+
+
+TITLE_WEIGHT = 2
+
+
+def task_text(title, description):
+    return f"{title or ''} {description or ''}".strip()
+
+
+def task_terms(title, description):
+    """term frequencies of a task, title words counting TITLE_WEIGHT times"""
+    terms = Counter()
+    for token in tokenize(title):
+        terms[token] += TITLE_WEIGHT
+    terms.update(tokenize(description))
+    return terms
+
+
+class SearchBackend:
+    """
+    Keeps the search index of tasks current and answers ranked queries.
+    Tasks are indexed by title, description and the text of their
+    comments.
+    """
+
+    def task_saved(self, task, previous):
+        """previous holds the old title and description, None if created"""
+        raise NotImplementedError
+
+    def comment_added(self, comment):
+        raise NotImplementedError
+
+    def comment_changed(self, comment, previous_text):
+        """the text of comment was edited from previous_text"""
+        raise NotImplementedError
+
+    def comment_removed(self, comment):
+        raise NotImplementedError
+
+    def reindex(self, tasks):
+        """rebuild the index entries of the given tasks from scratch"""
+        raise NotImplementedError
+
+    def tasks_removed(self, task_ids):
+        """drop the index entries of deleted tasks"""
+        raise NotImplementedError
+
+    def index_new(self, tasks):
+        """index freshly bulk inserted tasks, which have no comments yet"""
+        raise NotImplementedError
+
+    def search(self, query, limit, tasks=None):
+        """
+        ids of the best matching tasks, best first, limited to the tasks
+        queryset when one is given
+        """
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    """ranked search over the generated tsvector column of the documents"""
+
+    def task_saved(self, task, previous):
+        text = task_text(task.title, task.description)
+        if previous and text == task_text(
+            previous["title"], previous["description"]
+        ):
+            return
+        TaskSearchDocument.objects.update_or_create(
+            task=task, defaults={"task_text": text}
+        )
+
+    def comment_added(self, comment):
+        TaskSearchDocument.objects.filter(
+            task_id=comment.task_reference_id
+        ).update(
+            comment_text=Concat(
+                F("comment_text"), Value(" "), Value(comment.comment_text)
+            )
+        )
+
+    def __init__(self):
+        self._pending = threading.local()
+
+    def comment_changed(self, comment, previous_text):
+        self._rebuild_comments(comment.task_reference_id)
+
+    def comment_removed(self, comment):
+        self._rebuild_comments(comment.task_reference_id)
+
+    def _rebuild_comments(self, task_id):
+        """
+        Rebuild the comment text of task_id once the transaction commits:
+        a text cannot be cut out of the concatenation reliably, and this
+        way deleting all the comments of a task rebuilds it only once.
+        Ids left by a transaction that rolled back go with the next one.
+        """
+        if not hasattr(self._pending, "task_ids"):
+            self._pending.task_ids = set()
+        self._pending.task_ids.add(task_id)
+        transaction.on_commit(self._flush_comments)
+
+    def _flush_comments(self):
+        task_ids = getattr(self._pending, "task_ids", set())
+        self._pending.task_ids = set()
+        if not task_ids:
+            # an earlier callback of the same commit did them all
+            return
+        texts = defaultdict(list)
+        comments = (
+            Comment.objects.filter(task_reference_id__in=task_ids)
+            .order_by("id")
+            .values_list("task_reference_id", "comment_text")
+        )
+        for task_id, text in comments:
+            texts[task_id].append(text)
+        for task_id in task_ids:
+            TaskSearchDocument.objects.filter(task_id=task_id).update(
+                comment_text=" ".join(texts[task_id])
+            )
+
+    def reindex(self, tasks):
+        for task in tasks.iterator(chunk_size=2000):
+            texts = task.comments.values_list("comment_text", flat=True)
+            TaskSearchDocument.objects.update_or_create(
+                task=task,
+                defaults={
+                    "task_text": task_text(task.title, task.description),
+                    "comment_text": " ".join(texts),
+                },
+            )
+
+    def tasks_removed(self, task_ids):
+        TaskSearchDocument.objects.filter(task_id__in=task_ids).delete()
+
+    def index_new(self, tasks):
+        query, params = (
+            tasks.annotate(
+                text=Concat(F("title"), Value(" "), F("description"))
+            )
+            .values_list("id", "text")
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {TaskSearchDocument._meta.db_table}
+                    (task_id, task_text, comment_text)
+                SELECT new.id, new.text, '' FROM ({query}) new
+                ON CONFLICT (task_id) DO UPDATE
+                SET task_text = EXCLUDED.task_text
+                """,
+                params,
+            )
+
+    def search(self, query, limit, tasks=None):
+        restrict, params = "", []
+        if tasks is not None:
+            subquery, params = tasks.values("id").query.sql_with_params()
+            restrict = f"AND task_id IN ({subquery})"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT task_id
+                FROM {TaskSearchDocument._meta.db_table},
+                     plainto_tsquery('english', %s) query
+                WHERE search_vector @@ query {restrict}
+                ORDER BY ts_rank(search_vector, query) DESC, task_id DESC
+                LIMIT %s
+                """,
+                [query, *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class InvertedIndexSearchBackend(SearchBackend):
+    """
+    Search over an inverted index of term frequencies kept in the
+    SearchPosting table. Results must contain every query term and are
+    ranked by tf-idf. Works on any database, SQLite included.
+    """
+
+    def _apply(self, task_id, deltas):
+        deltas = {term: delta for term, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        with transaction.atomic():
+            existing = set(
+                SearchPosting.objects.filter(
+                    task_id=task_id, term__in=deltas
+                ).values_list("term", flat=True)
+            )
+            for term in existing:
+                SearchPosting.objects.filter(
+                    task_id=task_id, term=term
+                ).update(frequency=F("frequency") + deltas[term])
+            SearchPosting.objects.bulk_create(
+                SearchPosting(task_id=task_id, term=term, frequency=delta)
+                for term, delta in deltas.items()
+                if term not in existing and delta > 0
+            )
+            SearchPosting.objects.filter(
+                task_id=task_id, term__in=existing, frequency__lte=0
+            ).delete()
+
+    def task_saved(self, task, previous):
+        deltas = task_terms(task.title, task.description)
+        if previous:
+            deltas.subtract(
+                task_terms(previous["title"], previous["description"])
+            )
+        self._apply(task.pk, deltas)
+
+    def comment_added(self, comment):
+        self._apply(
+            comment.task_reference_id, Counter(tokenize(comment.comment_text))
+        )
+
+    def comment_changed(self, comment, previous_text):
+        deltas = Counter(tokenize(comment.comment_text))
+        deltas.subtract(tokenize(previous_text))
+        self._apply(comment.task_reference_id, deltas)
+
+    def comment_removed(self, comment):
+        deltas = Counter()
+        deltas.subtract(tokenize(comment.comment_text))
+        self._apply(comment.task_reference_id, deltas)
+
+    def reindex(self, tasks):
+        for task in tasks.iterator(chunk_size=2000):
+            terms = task_terms(task.title, task.description)
+            for text in task.comments.values_list("comment_text", flat=True):
+                terms.update(tokenize(text))
+            with transaction.atomic():
+                SearchPosting.objects.filter(task=task).delete()
+                SearchPosting.objects.bulk_create(
+                    SearchPosting(task=task, term=term, frequency=frequency)
+                    for term, frequency in terms.items()
+                )
+
+    def tasks_removed(self, task_ids):
+        SearchPosting.objects.filter(task_id__in=task_ids).delete()
+
+    def index_new(self, tasks, chunk_size=2000):
+        postings = []
+        rows = tasks.values_list("id", "title", "description")
+        for task_id, title, description in rows.iterator(chunk_size):
+            postings.extend(
+                SearchPosting(task_id=task_id, term=term, frequency=frequency)
+                for term, frequency in task_terms(title, description).items()
+            )
+            if len(postings) >= chunk_size:
+                SearchPosting.objects.bulk_create(postings)
+                postings = []
+        SearchPosting.objects.bulk_create(postings)
+
+    def search(self, query, limit, tasks=None):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        postings = SearchPosting.objects.filter(term__in=terms)
+        if tasks is not None:
+            postings = postings.filter(task__in=tasks.values("id"))
+        document_frequency = dict(
+            postings.values_list("term").annotate(Count("id"))
+        )
+        if len(document_frequency) < len(terms):
+            return []
+        total = (
+            TaskCounter.objects.filter(is_global=True)
+            .values_list("total", flat=True)
+            .first()
+        ) or Task.objects.count()
+        weights = [
+            When(
+                term=term,
+                then=F("frequency") * Value(math.log(1 + total / frequency)),
+            )
+            for term, frequency in document_frequency.items()
+        ]
+        return list(
+            postings.values("task_id")
+            .annotate(
+                matched=Count("term"),
+                score=Sum(Case(*weights, output_field=FloatField())),
+            )
+            .filter(matched=len(terms))
+            .order_by("-score", "-task_id")
+            .values_list("task_id", flat=True)[:limit]
+        )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """
+    The backend named by TASK_SEARCH_BACKEND, or the one matching the
+    default database when it is not set.
+    """
+    path = getattr(settings, "TASK_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == "postgresql":
+        return PostgresSearchBackend()
+    return InvertedIndexSearchBackend()
+
+
+def search_tasks(query, user, limit=None):
+    """tasks visible to user matching query, best match first"""
+    limit = limit or getattr(settings, "TASK_SEARCH_LIMIT", 50)
+    tasks = None if user.is_superuser else visible_tasks(user)
+    ids = get_search_backend().search(query, limit, tasks)
+    tasks = Task.objects.select_related("assigned_by", "assigned_to").in_bulk(
+        ids
+    )
+    return [tasks[pk] for pk in ids if pk in tasks]
+
+
+def search_archived_tasks(query, user, limit=None):
+    """
+    Archived tasks visible to user whose text or comments contain every
+    query word, most recently changed first. The archive has no index,
+    so this scans it and only runs when archived tasks are asked for.
+    """
+    terms = set(tokenize(query))
+    if not terms:
+        return []
+    limit = limit or getattr(settings, "TASK_SEARCH_LIMIT", 50)
+    tasks = visible_archived_tasks(user)
+    for term in terms:
+        tasks = tasks.filter(search_text__icontains=term)
+    return list(
+        tasks.select_related("assigned_by", "assigned_to").order_by(
+            "-modified", "-id"
+        )[:limit]
+    )
@@ -0,0 +1,195 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from . import counters, rollup
+from .models import Comment, SubTask, Task, User
+from .search import get_search_backend
+from .visibility import add_participants
+
+WORDS = (
+    "report budget release design review client invoice sprint backlog "
+    "deploy server database migration meeting roadmap hiring audit "
+    "customer feedback onboarding training dashboard export import "
+    "security patch bug feature test docs launch campaign contract"
+).split()
+VERBS = "fix write plan update prepare send check draft finish".split()
+BASE_TIME = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def skewed_weights(count, exponent=1.1):
+    """zipf-like weights: the first few items get most of the picks"""
+    return [1 / (rank + 1) ** exponent for rank in range(count)]
+
+
+def _chunks(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Seeder:
+    """
+    Deterministic synthetic data for load tests and benchmarks. The same
+    seed and sizes always give the same users, tasks, comments and
+    subtasks. Assignments follow a zipf-like skew so a few users carry
+    most tasks, and comments pile up on a few long threads.
+
+    Everything is written with bulk_create, so the participant rows,
+    search index, comment counts and dashboard counters are brought up
+    to date afterwards, as TaskImporter does.
+    """
+
+    def __init__(
+        self,
+        users=50,
+        tasks=1000,
+        comments=3000,
+        subtasks=2000,
+        seed=0,
+        prefix="seed",
+        batch_size=2000,
+        password="password",
+    ):
+        self.users = users
+        self.tasks = tasks
+        self.comments = comments
+        self.subtasks = subtasks
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.password = password
+
+    def words(self, count):
+        return " ".join(self.rng.choices(WORDS, k=count))
+
+    def run(self):
+        with transaction.atomic():
+            user_ids = self._create_users()
+            first_id = Task.all_objects.aggregate(last=Max("id"))["last"] or 0
+            comment_plan = Counter(
+                self.rng.choices(
+                    range(self.tasks),
+                    skewed_weights(self.tasks, 1.3),
+                    k=self.comments,
+                )
+            )
+            subtask_plan = self._plan_subtasks()
+            self._create_tasks(user_ids, subtask_plan)
+            new_tasks = Task.objects.filter(id__gt=first_id)
+            task_ids = list(
+                new_tasks.order_by("id").values_list("id", flat=True)
+            )
+            self._create_subtasks(task_ids, user_ids, subtask_plan)
+            self._create_comments(task_ids, user_ids, comment_plan)
+            rollup.recount_comments(new_tasks)
+            add_participants(new_tasks)
+            get_search_backend().reindex(new_tasks)
+            counters.invalidate(user_ids)
+        return {
+            "users": len(user_ids),
+            "tasks": len(task_ids),
+            "comments": self.comments,
+            "subtasks": sum(len(s) for s in subtask_plan.values()),
+        }
+
+    def _create_users(self):
+        password = make_password(self.password)
+        emails = [
+            f"{self.prefix}-user-{number:05d}@example.com"
+            for number in range(self.users)
+        ]
+        for batch in _chunks(emails, self.batch_size):
+            User.objects.bulk_create(
+                User(email=email, password=password, first_name="Seed")
+                for email in batch
+            )
+        ids = dict(
+            User.objects.filter(email__in=emails).values_list("email", "id")
+        )
+        # heaviest users first, in a stable order
+        return [ids[email] for email in emails]
+
+    def _plan_subtasks(self):
+        """{task index: [subtask statuses]} honouring the rollup rules"""
+        picks = Counter(
+            self.rng.choices(
+                range(self.tasks),
+                skewed_weights(self.tasks, 0.8),
+                k=self.subtasks,
+            )
+        )
+        return {
+            index: self.rng.choices(
+                ("pending", "in-progress", "completed"), (3, 2, 5), k=count
+            )
+            for index, count in sorted(picks.items())
+        }
+
+    def _create_tasks(self, user_ids, subtask_plan):
+        weights = skewed_weights(len(user_ids))
+
+        def tasks():
+            for index in range(self.tasks):
+                statuses = subtask_plan.get(index, [])
+                status = self.rng.choices(
+                    ("pending", "in-progress", "completed"), (4, 3, 3)
+                )[0]
+                if status == "completed":
+                    statuses[:] = ["completed"] * len(statuses)
+                elif statuses and all(s == "completed" for s in statuses):
+                    statuses[0] = "in-progress"
+                created = BASE_TIME + timedelta(minutes=index)
+                yield Task(
+                    title=(
+                        f"{self.rng.choice(VERBS).capitalize()} "
+                        f"{self.words(2)} #{index}"
+                    ),
+                    description=self.words(self.rng.randint(5, 40)),
+                    priority=self.rng.choice(("high", "medium", "low")),
+                    status=status,
+                    assigned_to_id=self.rng.choices(user_ids, weights)[0],
+                    assigned_by_id=self.rng.choices(user_ids, weights)[0],
+                    end_date=created + timedelta(days=self.rng.randint(1, 60)),
+                    created=created,
+                    modified=created,
+                    subtask_total=len(statuses),
+                    subtask_completed=statuses.count("completed"),
+                )
+
+        for batch in _chunks(tasks(), self.batch_size):
+            Task.objects.bulk_create(batch)
+
+    def _create_subtasks(self, task_ids, user_ids, subtask_plan):
+        def subtasks():
+            for index, statuses in subtask_plan.items():
+                for number, status in enumerate(statuses):
+                    yield SubTask(
+                        parent_task_id=task_ids[index],
+                        title=f"Step {number + 1}: {self.words(3)}",
+                        status=status,
+                        assigned_to_id=self.rng.choice(user_ids),
+                    )
+
+        for batch in _chunks(subtasks(), self.batch_size):
+            SubTask.objects.bulk_create(batch)
+
+    def _create_comments(self, task_ids, user_ids, comment_plan):
+        def comments():
+            for index, count in sorted(comment_plan.items()):
+                for _ in range(count):
+                    yield Comment(
+                        task_reference_id=task_ids[index],
+                        user_reference_id=self.rng.choice(user_ids),
+                        comment_text=self.words(self.rng.randint(3, 30)),
+                    )
+
+        for batch in _chunks(comments(), self.batch_size):
+            Comment.objects.bulk_create(batch)
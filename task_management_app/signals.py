@@ -0,0 +1,222 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.db.models import Q
+from django.dispatch import receiver
+from django.utils import timezone
+from . import (
+    autocomplete,
+    changelog,
+    counters,
+    events,
+    fragments,
+    rollup,
+    visibility,
+)
+from .models import Comment, SubTask, Task, User
+from .search import get_search_backend
+
+
+def log_child(kind, action, instance):
+    """log a change to a comment or subtask for the users on its task"""
+    field = instance._meta.get_field(
+        "parent_task" if kind == "subtask" else "task_reference"
+    )
+    task_id = getattr(instance, field.attname)
+    if field.is_cached(instance):
+        state = getattr(instance, field.name).tracked_state()
+    else:
+        state = (
+            Task.all_objects.filter(pk=task_id)
+            .values("assigned_to_id", "assigned_by_id")
+            .first()
+        )
+    if state is not None:
+        changelog.record_children(
+            kind, action, [(instance.pk, task_id, state)]
+        )
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_state(sender, instance, raw=False, **kwargs):
+    """keep the stored values so post_save can tell what changed"""
+    instance._previous_state = None if raw else instance.previous_state()
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    old, new = instance._previous_state, instance.tracked_state()
+    visibility.sync_participants(instance, old)
+    counters.task_changed(old, new)
+    if old and old["status"] != "completed" and new["status"] == "completed":
+        rollup.complete_subtasks(instance)
+    get_search_backend().task_saved(instance, old)
+    fragments.invalidate([instance.pk])
+    changelog.record_tasks(
+        "created" if old is None else "updated", [(instance.pk, old, new)]
+    )
+    events.tasks_changed([(instance, old)], created=old is None)
+    instance._loaded_values = {
+        **getattr(instance, "_loaded_values", {}),
+        **new,
+    }
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    old = instance.previous_state() or instance.tracked_state()
+    counters.task_changed(old, None)
+    fragments.invalidate([instance.pk])
+    changelog.record_tasks("deleted", [(instance.pk, old, None)])
+    events.tasks_changed([(instance, old)])
+
+
+@receiver(pre_save, sender=User)
+def remember_user_email(
+    sender, instance, raw=False, update_fields=None, **kwargs
+):
+    instance._previous_email = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and "email" not in update_fields:
+        return
+    instance._previous_email = (
+        User.objects.filter(pk=instance.pk)
+        .values_list("email", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """
+    Rows showing a user's email are touched when it changes, so that the
+    fragments and ETags keyed on their modified time move on as well.
+    """
+    previous = getattr(instance, "_previous_email", None)
+    if raw:
+        return
+    if created or previous not in (None, instance.email):
+        autocomplete.cache.clear()
+    if previous is None or previous == instance.email:
+        return
+    now = timezone.now()
+    Task.objects.filter(
+        Q(assigned_to=instance) | Q(assigned_by=instance)
+    ).update(modified=now)
+    Comment.objects.filter(user_reference=instance).update(modified=now)
+    SubTask.objects.filter(assigned_to=instance).update(modified=now)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    autocomplete.cache.clear()
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_text(sender, instance, raw=False, **kwargs):
+    instance._previous_text = None
+    if not raw and not instance._state.adding:
+        instance._previous_text = (
+            Comment.objects.filter(pk=instance.pk)
+            .values_list("comment_text", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        rollup.comment_added(instance)
+    log_child("comment", "created" if created else "updated", instance)
+    events.child_changed(
+        "comment",
+        instance.pk,
+        instance.task_reference_id,
+        created=created,
+        deleted=False,
+    )
+    if instance._previous_text == instance.comment_text:
+        return
+    backend = get_search_backend()
+    if instance._previous_text is None:
+        backend.comment_added(instance)
+    else:
+        backend.comment_changed(instance, instance._previous_text)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    get_search_backend().comment_removed(instance)
+    # a task's own counters go with it when the delete cascades from it
+    if not (
+        isinstance(origin, Task) or getattr(origin, "model", None) is Task
+    ):
+        rollup.comment_removed(instance)
+        log_child("comment", "deleted", instance)
+        events.child_changed(
+            "comment",
+            instance.pk,
+            instance.task_reference_id,
+            created=False,
+            deleted=True,
+        )
+
+
+@receiver(pre_save, sender=SubTask)
+def remember_subtask_state(sender, instance, raw=False, **kwargs):
+    instance._previous_state = None
+    if not raw and not instance._state.adding:
+        instance._previous_state = (
+            SubTask.objects.filter(pk=instance.pk)
+            .values("parent_task_id", "status")
+            .first()
+        )
+
+
+@receiver(post_save, sender=SubTask)
+def subtask_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollup.subtask_changed(
+        instance._previous_state, rollup.subtask_state(instance)
+    )
+    log_child(
+        "subtask",
+        "created" if instance._previous_state is None else "updated",
+        instance,
+    )
+    events.child_changed(
+        "subtask",
+        instance.pk,
+        instance.parent_task_id,
+        [instance.assigned_to_id],
+        status=instance.status,
+        created=instance._previous_state is None,
+        deleted=False,
+    )
+
+
+@receiver(post_delete, sender=SubTask)
+def subtask_deleted(sender, instance, origin=None, **kwargs):
+    # when the delete cascades from a task or user, the parent may be on
+    # its way out too, so only its counters are touched, not its status
+    direct = isinstance(origin, SubTask) or getattr(origin, "model", None) is (
+        SubTask
+    )
+    rollup.subtask_changed(
+        rollup.subtask_state(instance), None, sync_status=direct
+    )
+    if direct:
+        log_child("subtask", "deleted", instance)
+        events.child_changed(
+            "subtask",
+            instance.pk,
+            instance.parent_task_id,
+            [instance.assigned_to_id],
+            status=instance.status,
+            created=False,
+            deleted=True,
+        )
@@ -1,6 +1,80 @@
-from django.test import TestCase, Client
-from django.urls import reverse
-from .models import User, Task
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.sessions.models import Session
+from django.conf import settings
+from django.core import mail
+from django.db import DatabaseError, connection
+from django.db.models import Q
+from django.test import (
+    AsyncClient,
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.urls import resolve, reverse
+from django.utils import timezone
+from .models import (
+    User,
+    Task,
+    TaskCounter,
+    Comment,
+    SubTask,
+    OutboxEmail,
+    TaskParticipant,
+    ArchivedTask,
+    ChangeLogEntry,
+    SearchPosting,
+    TaskSearchDocument,
+)
+from .outbox import OutboxWorker
+from .importer import COPY_COLUMNS, TaskImporter
+from .visibility import visible_tasks
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .counters import count_tasks, get_dashboard_counts
+from .pagination import KeysetPaginator
+from .search import get_search_backend, search_archived_tasks, search_tasks
+from .querybudget import QueryBudgetExceeded, get_query_budget
+from .views import HomePage
+from . import fragments
+from .benchmark import async_views, run_benchmark
+from .metrics import registry
+from .events import (
+    PAYLOAD_BYTES,
+    Broker,
+    InProcessBroker,
+    payloads,
+    stream,
+)
+from .bulk import bulk_update_tasks
+from . import autocomplete, changelog
+from .forms import TaskCreateForm
+from .pool import ConnectionPool, PoolTimeout
+from .assets import IMMUTABLE, minify_css
+from .utils import send_update_mail
+from .seed import Seeder
+from .purge import PurgeWorker
+from .archive import TaskArchiver
+from .routers import (
+    STICKY_COOKIE,
+    PrimaryReplicaRouter,
+    RoutingState,
+    routing,
+)
 
 
 class TaskCreateViewTests(TestCase):
@@ -212,3 +286,2340 @@ class TestAllTaskView(TestCase):
     def test_all_task_unauthenticated(self):
         response = self.client.get(self.url)
         self.assertRedirects(response, reverse("loginform"))
+
+
+class DashboardCounterTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="owner@gmail.com", password="owner123"
+        )
+        self.user2 = User.objects.create_user(
+            email="worker@gmail.com", password="worker123"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpass"
+        )
+        self.task = Task.objects.create(
+            title="Counted task",
+            assigned_to=self.user2,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+
+    def counts(self, user):
+        counter = get_dashboard_counts(user)
+        return (
+            counter.total,
+            counter.pending,
+            counter.in_progress,
+            counter.completed,
+        )
+
+    def test_counter_built_from_aggregate(self):
+        self.assertFalse(TaskCounter.objects.exists())
+        self.assertEqual(self.counts(self.user), (1, 1, 0, 0))
+        self.assertEqual(self.counts(self.admin), (1, 1, 0, 0))
+        self.assertEqual(TaskCounter.objects.count(), 2)
+
+    def test_reconcile_corrects_drifted_counters(self):
+        self.counts(self.user)
+        self.counts(self.admin)
+        TaskCounter.objects.filter(user=self.user).update(total=5, pending=0)
+        TaskCounter.objects.filter(is_global=True).update(completed=2)
+        out = io.StringIO()
+        call_command("reconcile_task_counters", stdout=out)
+        self.assertIn("2 corrected", out.getvalue())
+        self.assertEqual(self.counts(self.user), (1, 1, 0, 0))
+        self.assertEqual(self.counts(self.admin), (1, 1, 0, 0))
+        self.assertEqual(TaskCounter.objects.count(), 2)
+
+    def test_counter_follows_task_changes(self):
+        self.counts(self.user)
+        self.counts(self.user2)
+        self.counts(self.admin)
+
+        Task.objects.create(
+            title="Second task",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="in-progress",
+            priority="low",
+        )
+        self.assertEqual(self.counts(self.user), (2, 1, 1, 0))
+        self.assertEqual(self.counts(self.admin), (2, 1, 1, 0))
+
+        self.task.status = "completed"
+        self.task.save()
+        self.assertEqual(self.counts(self.user), (2, 0, 1, 1))
+        self.assertEqual(self.counts(self.user2), (1, 0, 0, 1))
+
+        self.task.assigned_to = self.user
+        self.task.save()
+        self.assertEqual(self.counts(self.user2), (0, 0, 0, 0))
+
+        self.task.delete()
+        self.assertEqual(self.counts(self.user), (1, 0, 1, 0))
+        self.assertEqual(self.counts(self.admin), (1, 0, 1, 0))
+
+    def test_home_page_uses_counter(self):
+        self.client.login(email="worker@gmail.com", password="worker123")
+        self.client.get(reverse("home_page"))
+        self.assertTrue(TaskCounter.objects.filter(user=self.user2).exists())
+        response = self.client.get(reverse("home_page"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["total"], 1)
+        self.assertEqual(response.context["pending_count"], 1)
+
+
+class KeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="pager@gmail.com", password="pager123"
+        )
+        self.tasks = [
+            Task.objects.create(
+                title=f"Paged task {number}",
+                assigned_to=self.user,
+                assigned_by=self.user,
+                end_date="2024-12-24",
+                status="pending",
+                priority="low",
+            )
+            for number in range(7)
+        ]
+        # equal timestamps must still page in a stable order
+        Task.objects.filter(id__in=[t.id for t in self.tasks[2:5]]).update(
+            created=self.tasks[2].created
+        )
+
+    def walk(self, paginator):
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(task.id for task in page)
+            if not page.has_next:
+                return seen, page
+            cursor = page.next_cursor
+
+    def test_forward_pages_cover_all_rows_once(self):
+        ids = [task.id for task in self.tasks]
+        seen, _ = self.walk(KeysetPaginator(Task.objects.all(), size=3))
+        self.assertEqual(seen, ids)
+        seen, _ = self.walk(
+            KeysetPaginator(Task.objects.all(), descending=True, size=3)
+        )
+        self.assertEqual(seen, ids[::-1])
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = KeysetPaginator(Task.objects.all(), size=3)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertFalse(first.has_previous)
+        self.assertTrue(second.has_previous)
+        back = paginator.page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertTrue(back.has_next)
+
+    def test_view_pages_and_ignores_bad_cursor(self):
+        self.client.login(email="pager@gmail.com", password="pager123")
+        response = self.client.get(reverse("task_view"), {"cursor": "bogus"})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Paged task 6")
+        response = self.client.get(reverse("home_page"))
+        self.assertEqual(len(response.context["tasks"]), 7)
+
+
+class QueryBudgetTestMixin:
+    """helpers asserting that a view's query count does not grow with data"""
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, add_rows, rounds=2):
+        # the first request may build lazily maintained data
+        self.count_queries(url)
+        expected = self.count_queries(url)
+        for _ in range(rounds):
+            add_rows()
+            self.assertEqual(self.count_queries(url), expected, url)
+        budget = get_query_budget(resolve(url).func)
+        if budget is not None:
+            self.assertLessEqual(expected, budget, url)
+        return expected
+
+
+class QueryCountTestCase(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="counted@gmail.com", password="counted123"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpass"
+        )
+        self.task = self.add_task()
+        self.client.login(email="counted@gmail.com", password="counted123")
+
+    def add_task(self):
+        assignee = User.objects.create_user(
+            email=f"assignee{User.objects.count()}@gmail.com",
+            password="assignee123",
+        )
+        task = Task.objects.create(
+            title="Query counted task",
+            assigned_to=assignee,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        Comment.objects.create(
+            comment_text="A comment",
+            task_reference=task,
+            user_reference=assignee,
+        )
+        SubTask.objects.create(
+            parent_task=task,
+            title="A subtask",
+            status="pending",
+            assigned_to=assignee,
+        )
+        return task
+
+    def add_comment(self):
+        Comment.objects.create(
+            comment_text="Another comment",
+            task_reference=self.task,
+            user_reference=User.objects.create_user(
+                email=f"commenter{User.objects.count()}@gmail.com",
+                password="commenter123",
+            ),
+        )
+
+    def test_list_views_are_constant(self):
+        for name in ("home_page", "task_view", "task_search", "user_list"):
+            self.assertConstantQueries(reverse(name), self.add_task)
+
+    def test_superuser_home_is_constant(self):
+        self.client.login(email="admin@example.com", password="adminpass")
+        self.assertConstantQueries(reverse("home_page"), self.add_task)
+
+    def test_comment_view_is_constant(self):
+        url = reverse("comment_show", args=[self.task.id])
+        self.assertConstantQueries(url, self.add_comment)
+
+    @override_settings(DEBUG=True, QUERY_BUDGET_RAISE=True)
+    def test_middleware_raises_over_budget(self):
+        client = Client()
+        client.login(email="counted@gmail.com", password="counted123")
+        with mock.patch.object(HomePage, "max_queries", 1):
+            with self.assertRaises(QueryBudgetExceeded):
+                client.get(reverse("home_page"))
+        self.assertEqual(client.get(reverse("home_page")).status_code, 200)
+
+
+class SearchIndexTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="searcher@gmail.com", password="search123"
+        )
+        self.django = self.add_task("Complete Django Project", "deploy")
+        self.report = self.add_task("Quarterly report", "django numbers")
+        self.other = self.add_task("Plan holidays", "beach")
+
+    def add_task(self, title, description):
+        return Task.objects.create(
+            title=title,
+            description=description,
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+
+    def titles(self, query):
+        return [task.title for task in search_tasks(query, self.user)]
+
+    def test_ranks_and_requires_every_term(self):
+        self.assertEqual(
+            self.titles("django"),
+            ["Complete Django Project", "Quarterly report"],
+        )
+        self.assertEqual(self.titles("DJANGO deploy"), [self.django.title])
+        self.assertEqual(self.titles("django beach"), [])
+        self.assertEqual(self.titles("the"), [])
+
+    def test_index_follows_task_edits(self):
+        self.other.title = "Plan Django meetup"
+        self.other.save()
+        self.assertIn(self.other.title, self.titles("meetup"))
+        self.assertEqual(self.titles("holidays"), [])
+
+    def test_index_follows_comments(self):
+        comment = Comment.objects.create(
+            comment_text="waiting on the sandcastle permit",
+            task_reference=self.other,
+            user_reference=self.user,
+        )
+        self.assertEqual(self.titles("sandcastle"), [self.other.title])
+        comment.comment_text = "permit granted"
+        comment.save()
+        self.assertEqual(self.titles("sandcastle"), [])
+        comment.delete()
+        self.assertEqual(self.titles("permit"), [])
+
+    @override_settings(
+        TASK_SEARCH_BACKEND="task_management_app.search.PostgresSearchBackend"
+    )
+    def test_comment_edits_replace_the_indexed_text(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        get_search_backend().reindex(Task.objects.filter(pk=self.other.pk))
+        kept = Comment.objects.create(
+            comment_text="bring towels",
+            task_reference=self.other,
+            user_reference=self.user,
+        )
+        comment = Comment.objects.create(
+            comment_text="first draft",
+            task_reference=self.other,
+            user_reference=self.user,
+        )
+        for text in ("second draft", "final text"):
+            with self.captureOnCommitCallbacks(execute=True):
+                comment.comment_text = text
+                comment.save()
+        document = TaskSearchDocument.objects.get(task=self.other)
+        self.assertEqual(
+            sorted(document.comment_text.split()),
+            sorted(f"{kept.comment_text} final text".split()),
+        )
+        for number in range(5):
+            Comment.objects.create(
+                comment_text=f"note {number}",
+                task_reference=self.other,
+                user_reference=self.user,
+            )
+        # one rebuild for the task, however many comments went
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.exclude(pk=kept.pk).delete()
+        rebuilds = [
+            query
+            for query in queries
+            if query["sql"].startswith("UPDATE")
+            and TaskSearchDocument._meta.db_table in query["sql"]
+        ]
+        self.assertEqual(len(rebuilds), 1)
+        document.refresh_from_db()
+        self.assertEqual(document.comment_text, kept.comment_text)
+
+    def test_comment_edits_replace_the_postings(self):
+        comment = Comment.objects.create(
+            comment_text="first draft",
+            task_reference=self.other,
+            user_reference=self.user,
+        )
+        for text in ("second draft", "final draft"):
+            comment.comment_text = text
+            comment.save()
+        self.assertEqual(
+            dict(
+                SearchPosting.objects.filter(
+                    task=self.other,
+                    term__in=["first", "second", "final", "draft"],
+                ).values_list("term", "frequency")
+            ),
+            {"final": 1, "draft": 1},
+        )
+
+    def test_search_view(self):
+        self.client.login(email="searcher@gmail.com", password="search123")
+        response = self.client.get(reverse("task_search"), {"q": "beach"})
+        self.assertContains(response, "Plan holidays")
+        self.assertNotContains(response, "Quarterly report")
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="boss@gmail.com", password="boss1234"
+        )
+        self.user2 = User.objects.create_user(
+            email="staff@gmail.com", password="staff1234"
+        )
+        self.client.login(email="boss@gmail.com", password="boss1234")
+
+    def create_task(self):
+        return self.client.post(
+            reverse("task_create"),
+            {
+                "title": "Mailed task",
+                "priority": "high",
+                "status": "pending",
+                "end_date": "2024-12-31",
+                "assigned_to": self.user2.id,
+                "description": "Sent through the outbox",
+            },
+        )
+
+    def test_task_create_queues_mail_without_sending(self):
+        response = self.create_task()
+        self.assertRedirects(response, reverse("home_page"))
+        self.assertEqual(len(mail.outbox), 0)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ["staff@gmail.com"])
+        self.assertEqual(email.status, "pending")
+
+    def test_worker_delivers_batch(self):
+        self.create_task()
+        self.create_task()
+        worker = OutboxWorker(batch_size=1)
+        self.assertEqual(worker.drain(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].subject, "Task Assigned")
+        self.assertFalse(OutboxEmail.objects.exclude(status="sent").exists())
+        self.assertEqual(worker.drain(), (0, 0))
+
+    def test_worker_retries_then_dead_letters(self):
+        self.create_task()
+        worker = OutboxWorker(max_attempts=2)
+        with mock.patch.object(
+            worker.connection, "send_messages", side_effect=OSError("down")
+        ):
+            self.assertEqual(worker.drain(), (0, 1))
+            email = OutboxEmail.objects.get()
+            self.assertEqual(email.status, "pending")
+            self.assertGreater(email.next_attempt_at, email.created)
+            # not due yet
+            self.assertEqual(worker.drain(), (0, 0))
+            OutboxEmail.objects.update(next_attempt_at=email.created)
+            self.assertEqual(worker.drain(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, "dead")
+        self.assertEqual(email.last_error, "down")
+
+    def test_each_email_is_saved_as_soon_as_it_is_sent(self):
+        self.create_task()
+        self.create_task()
+        first, second = OutboxEmail.objects.order_by("id")
+        seen = []
+
+        def send(messages):
+            seen.append(dict(OutboxEmail.objects.values_list("id", "status")))
+            if len(seen) == 2:
+                raise OSError("down")
+            return len(messages)
+
+        worker = OutboxWorker()
+        with mock.patch.object(
+            worker.connection, "send_messages", side_effect=send
+        ):
+            self.assertEqual(worker.deliver_batch(), (1, 1))
+        # both claimed before sending, the first saved before the second
+        self.assertEqual(seen[0], {first.pk: "sending", second.pk: "sending"})
+        self.assertEqual(seen[1], {first.pk: "sent", second.pk: "sending"})
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.attempts), ("pending", 1))
+
+    def test_emails_of_a_dead_worker_are_sent_after_the_lease(self):
+        self.create_task()
+        OutboxWorker(lease_seconds=60).claim()
+        self.assertEqual(OutboxWorker().drain(), (0, 0))
+        OutboxEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(OutboxWorker().drain(), (1, 0))
+        email = OutboxEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ("sent", 2))
+
+
+class TaskImportTestCase(TestCase):
+    CSV = (
+        "title,priority,status,end_date,assigned_to,assigned_by,description\n"
+        "Imported one,high,pending,2024-12-31,worker@gmail.com,,First\n"
+        "Imported two,low,completed,2024-12-31,worker@gmail.com,"
+        "admin@example.com,\n"
+        ",urgent,pending,someday,nobody@gmail.com,,Broken\n"
+    )
+
+    def setUp(self):
+        self.client = Client()
+        self.worker = User.objects.create_user(
+            email="worker@gmail.com", password="worker123"
+        )
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", password="adminpass"
+        )
+        get_dashboard_counts(self.worker)
+
+    def test_csv_import(self):
+        importer = TaskImporter(chunk_size=2)
+        stats = importer.run(io.StringIO(self.CSV), "csv")
+        self.assertEqual((stats.rows, stats.imported, stats.failed), (3, 2, 1))
+        line, errors = stats.errors[0]
+        self.assertEqual(line, 4)
+        self.assertEqual(len(errors), 4)
+        task = Task.objects.get(title="Imported two")
+        self.assertEqual(task.assigned_by, self.admin)
+        self.assertEqual(task.description, "")
+        self.assertIsNone(Task.objects.get(title="Imported one").assigned_by)
+        # bulk writes still reach the counters and the search index
+        self.assertEqual(get_dashboard_counts(self.worker).total, 2)
+        self.assertEqual(
+            [t.title for t in search_tasks("imported first", self.admin)],
+            ["Imported one"],
+        )
+
+    def test_copy_writes_every_required_column(self):
+        required = {
+            field.column
+            for field in Task._meta.concrete_fields
+            if not field.null and not field.primary_key
+        }
+        self.assertLessEqual(required, set(COPY_COLUMNS))
+        task = {
+            "title": "Copied",
+            "priority": "low",
+            "status": "pending",
+            "end_date": timezone.now(),
+            "assigned_to_id": self.worker.pk,
+            "assigned_by_id": None,
+            "description": "",
+        }
+        with mock.patch("task_management_app.importer.connection") as db:
+            cursor = db.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [(41,)]
+            self.assertEqual(TaskImporter(use_copy=True)._copy([task]), [41])
+        sql, buffer = cursor.cursor.copy_expert.call_args.args
+        self.assertIn(f"(id, {', '.join(COPY_COLUMNS)})", sql)
+        (row,) = csv.reader(io.StringIO(buffer.getvalue()))
+        values = dict(zip(("id", *COPY_COLUMNS), row, strict=True))
+        self.assertEqual(values["id"], "41")
+        self.assertEqual(values["comment_count"], "0")
+        self.assertEqual(values["assigned_by_id"], r"\N")
+
+    def test_each_chunk_is_complete_when_it_commits(self):
+        data = self.CSV + (
+            "Imported three,low,pending,2024-12-31,worker@gmail.com,,Third\n"
+        )
+        web_tasks = []
+
+        def create_web_task(line, errors):
+            # a task saved through the site while the import runs
+            web_tasks.append(
+                Task.objects.create(
+                    title="Imported on the web",
+                    assigned_to=self.worker,
+                    end_date="2024-12-31",
+                    status="pending",
+                    priority="low",
+                )
+            )
+
+        importer = TaskImporter(chunk_size=2, on_error=create_web_task)
+        self.assertEqual(importer.run(io.StringIO(data), "csv").imported, 3)
+        (web_task,) = web_tasks
+        self.assertEqual(
+            ChangeLogEntry.objects.filter(
+                kind="task", object_id=web_task.pk
+            ).count(),
+            1,
+        )
+        self.assertEqual(visible_tasks(self.worker).count(), 4)
+
+        # a failing chunk leaves the ones before it whole
+        Task.all_objects.all().delete()
+        bulk_create = Task.objects.bulk_create
+
+        def fail_second_chunk(tasks):
+            if Task.objects.exists():
+                raise DatabaseError("connection lost")
+            return bulk_create(tasks)
+
+        with mock.patch.object(
+            Task.objects, "bulk_create", side_effect=fail_second_chunk
+        ):
+            with self.assertRaises(DatabaseError):
+                TaskImporter(chunk_size=2).run(io.StringIO(data), "csv")
+        self.assertEqual(
+            sorted(task.title for task in visible_tasks(self.worker)),
+            ["Imported one", "Imported two"],
+        )
+        self.assertEqual(
+            [t.title for t in search_tasks("imported first", self.admin)],
+            ["Imported one"],
+        )
+
+    def test_jsonl_dry_run_writes_nothing(self):
+        data = (
+            '{"title": "Json task", "priority": "medium", '
+            '"status": "in-progress", "end_date": "2024-12-31", '
+            '"assigned_to": "worker@gmail.com"}\n'
+            "not json\n"
+        )
+        stats = TaskImporter(dry_run=True).run(io.StringIO(data), "jsonl")
+        self.assertEqual((stats.imported, stats.failed), (1, 1))
+        self.assertFalse(Task.objects.exists())
+
+    def test_upload_endpoint(self):
+        self.client.login(email="admin@example.com", password="adminpass")
+        upload = SimpleUploadedFile("tasks.csv", self.CSV.encode())
+        response = self.client.post(
+            reverse("task_import"), {"file": upload, "format": "csv"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["stats"].imported, 2)
+        self.assertEqual(
+            Task.objects.get(title="Imported one").assigned_by, self.admin
+        )
+        self.client.login(email="worker@gmail.com", password="worker123")
+        self.assertEqual(
+            self.client.get(reverse("task_import")).status_code, 403
+        )
+
+
+class TaskExportTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="exporter@gmail.com", password="export123"
+        )
+        self.other = User.objects.create_user(
+            email="other@gmail.com", password="other123"
+        )
+        self.mine = Task.objects.create(
+            title="My task",
+            assigned_to=self.user,
+            assigned_by=self.other,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        Task.objects.create(
+            title="Someone else's task",
+            assigned_to=self.other,
+            assigned_by=self.other,
+            end_date="2024-12-24",
+            status="completed",
+            priority="low",
+        )
+        Comment.objects.create(
+            comment_text="Exported comment",
+            task_reference=self.mine,
+            user_reference=self.other,
+        )
+        self.client.login(email="exporter@gmail.com", password="export123")
+
+    def export(self, **params):
+        response = self.client.get(reverse("task_export"), params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_csv_export_only_visible_tasks(self):
+        lines = self.export().decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("id,title,"))
+        self.assertIn("My task", lines[1])
+
+    def test_gzip_jsonl_comments(self):
+        data = gzip.decompress(
+            self.export(kind="comments", format="jsonl", gzip="1")
+        )
+        rows = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["comment_text"], "Exported comment")
+        self.assertEqual(rows[0]["user_reference_email"], "other@gmail.com")
+
+    def test_export_streams_under_asgi(self):
+        client = AsyncClient()
+        client.force_login(self.user)
+
+        async def export():
+            response = await client.get(reverse("task_export"))
+            # a sync iterator would be read whole before the first byte
+            self.assertTrue(response.is_async)
+            return b"".join(
+                [part async for part in response.streaming_content]
+            )
+
+        lines = async_to_sync(export)().decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("My task", lines[1])
+
+    def test_filters(self):
+        self.assertEqual(len(self.export(status="completed").splitlines()), 1)
+        self.assertEqual(len(self.export(since="2000-01-01").splitlines()), 2)
+        response = self.client.get(reverse("task_export"), {"since": "soon"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskParticipantTestCase(TestCase):
+    def setUp(self):
+        self.boss = User.objects.create_user(
+            email="boss@gmail.com", password="boss1234"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@gmail.com", password="worker123"
+        )
+        self.outsider = User.objects.create_user(
+            email="outsider@gmail.com", password="outsider123"
+        )
+        self.task = Task.objects.create(
+            title="Shared task",
+            assigned_to=self.worker,
+            assigned_by=self.boss,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+
+    def roles(self):
+        return dict(
+            TaskParticipant.objects.filter(task=self.task).values_list(
+                "user__email", "role"
+            )
+        )
+
+    def test_participants_follow_assignment(self):
+        self.assertEqual(
+            self.roles(),
+            {
+                "boss@gmail.com": "assigned_by",
+                "worker@gmail.com": "assigned_to",
+            },
+        )
+        self.task.assigned_to = self.boss
+        self.task.save()
+        self.assertEqual(self.roles(), {"boss@gmail.com": "both"})
+        self.assertFalse(visible_tasks(self.worker).exists())
+        self.task.delete()
+        self.assertFalse(TaskParticipant.objects.exists())
+
+    def test_visibility_and_search_use_participants(self):
+        self.assertEqual(list(visible_tasks(self.boss)), [self.task])
+        self.assertEqual(list(visible_tasks(self.worker)), [self.task])
+        self.assertFalse(visible_tasks(self.outsider).exists())
+        self.assertEqual(search_tasks("shared", self.outsider), [])
+        self.assertEqual(search_tasks("shared", self.worker), [self.task])
+
+    def test_backfill_command(self):
+        TaskParticipant.objects.all().delete()
+        call_command("backfill_task_participants", stdout=io.StringIO())
+        self.assertEqual(len(self.roles()), 2)
+        call_command("backfill_task_participants", stdout=io.StringIO())
+        self.assertEqual(TaskParticipant.objects.count(), 2)
+
+
+class SubTaskRollupTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="lead@gmail.com", password="lead1234"
+        )
+        self.task = Task.objects.create(
+            title="Parent task",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.other = Task.objects.create(
+            title="Unrelated task",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.unrelated = self.add_subtask(self.other)
+
+    def add_subtask(self, task, status="pending"):
+        return SubTask.objects.create(
+            parent_task=task,
+            title="Child",
+            status=status,
+            assigned_to=self.user,
+        )
+
+    def rollup(self):
+        self.task.refresh_from_db()
+        return (
+            self.task.subtask_total,
+            self.task.subtask_completed,
+            self.task.status,
+        )
+
+    def test_counters_and_parent_status(self):
+        first = self.add_subtask(self.task)
+        second = self.add_subtask(self.task, "completed")
+        self.assertEqual(self.rollup(), (2, 1, "pending"))
+        first.status = "completed"
+        first.save()
+        self.assertEqual(self.rollup(), (2, 2, "completed"))
+        second.status = "pending"
+        second.save()
+        self.assertEqual(self.rollup(), (2, 1, "in-progress"))
+        second.delete()
+        self.assertEqual(self.rollup(), (1, 1, "completed"))
+        self.assertEqual(get_dashboard_counts(self.user).completed, 1)
+
+    def test_completing_task_completes_only_its_subtasks(self):
+        self.add_subtask(self.task)
+        self.add_subtask(self.task, "in-progress")
+        self.task.status = "completed"
+        self.task.save()
+        self.assertEqual(self.rollup(), (2, 2, "completed"))
+        self.assertFalse(
+            self.task.subtasks.exclude(status="completed").exists()
+        )
+        self.unrelated.refresh_from_db()
+        self.assertEqual(self.unrelated.status, "pending")
+
+    def test_form_save_keeps_concurrent_counters(self):
+        stale = Task.objects.get(pk=self.task.pk)
+        self.add_subtask(self.task)
+        stale.title = "Renamed parent"
+        stale.save()
+        self.assertEqual(self.rollup(), (1, 0, "pending"))
+
+    def test_subtask_list_never_writes(self):
+        self.add_subtask(self.task, "completed")
+        self.task.status = "pending"
+        Task.objects.filter(pk=self.task.pk).update(status="pending")
+        self.client.login(email="lead@gmail.com", password="lead1234")
+        url = reverse("subtask_showview", args=[self.task.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q for q in queries if q["sql"].startswith(("UPDATE", "INSERT"))]
+        )
+        self.assertEqual(self.rollup()[2], "pending")
+
+    def test_deleting_parent_cascades(self):
+        self.add_subtask(self.task)
+        self.add_subtask(self.task, "completed")
+        get_dashboard_counts(self.user)
+        self.task.delete()
+        counts = get_dashboard_counts(self.user)
+        self.assertEqual((counts.total, counts.pending), (1, 1))
+
+
+class FragmentCacheTestCase(TestCase):
+    def setUp(self):
+        fragments.get_cache().clear()
+        fragments.stats.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="rows@gmail.com", password="rows1234"
+        )
+        self.tasks = [
+            Task.objects.create(
+                title=f"Row task {i}",
+                assigned_to=self.user,
+                assigned_by=self.user,
+                end_date="2024-12-24",
+                status="pending",
+                priority="low",
+            )
+            for i in range(3)
+        ]
+        self.client.login(email="rows@gmail.com", password="rows1234")
+
+    def test_rows_rendered_once_until_task_changes(self):
+        first = self.client.get(reverse("home_page"))
+        self.assertContains(first, "Row task 2")
+        self.assertEqual(
+            (fragments.stats.hits, fragments.stats.misses), (0, 3)
+        )
+        second = self.client.get(reverse("home_page"))
+        self.assertEqual(first.context["rows"], second.context["rows"])
+        self.assertEqual(fragments.stats.hits, 3)
+        task = self.tasks[0]
+        task.title = "Renamed row"
+        task.save()
+        response = self.client.get(reverse("home_page"))
+        self.assertContains(response, "Renamed row")
+        self.assertEqual(
+            (fragments.stats.hits, fragments.stats.misses), (5, 4)
+        )
+
+    def test_details_show_assigner_and_follow_email_change(self):
+        url = reverse("task_details", args=[self.tasks[0].id])
+        self.assertContains(self.client.get(url), "rows@gmail.com")
+        self.user.email = "renamed@gmail.com"
+        self.user.save()
+        response = self.client.get(url)
+        self.assertContains(response, "renamed@gmail.com")
+        self.assertNotContains(response, "rows@gmail.com")
+
+    def test_locale_is_part_of_the_entry(self):
+        task = self.tasks[0]
+        with mock.patch.object(
+            fragments, "current_locale", return_value="fr:UTC"
+        ):
+            fragments.render_task("taskrow.html", task)
+        fragments.render_task("taskrow.html", task)
+        self.assertEqual(fragments.stats.misses, 2)
+        fragments.invalidate([task.pk])
+        self.assertIsNone(
+            fragments.get_cache().get(
+                fragments.fragment_key("taskrow.html", task.pk)
+            )
+        )
+
+
+class TaskApiTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="api@gmail.com", password="api12345"
+        )
+        self.stranger = User.objects.create_user(
+            email="stranger@gmail.com", password="stranger123"
+        )
+        self.tasks = [
+            Task.objects.create(
+                title=f"Api task {i}",
+                assigned_to=self.user,
+                assigned_by=self.user,
+                end_date="2024-12-24",
+                status="pending",
+                priority="low",
+            )
+            for i in range(3)
+        ]
+        Task.objects.create(
+            title="Hidden task",
+            assigned_to=self.stranger,
+            assigned_by=self.stranger,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.comment = Comment.objects.create(
+            comment_text="First comment",
+            task_reference=self.tasks[0],
+            user_reference=self.user,
+        )
+        self.client.login(email="api@gmail.com", password="api12345")
+
+    def test_list_is_visible_tasks_newest_first(self):
+        response = self.client.get(reverse("api_task_list"))
+        self.assertEqual(response.status_code, 200)
+        titles = [row["title"] for row in response.json()["results"]]
+        self.assertEqual(titles, ["Api task 2", "Api task 1", "Api task 0"])
+        self.assertEqual(
+            response.json()["results"][0]["assigned_by_email"],
+            "api@gmail.com",
+        )
+
+    def test_collection_etag_follows_edits_and_deletes(self):
+        url = reverse("api_task_list")
+        etag = self.client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # session, user and the aggregate; the page itself is never read
+        self.assertEqual(len(queries), 3)
+        self.tasks[1].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        task = self.tasks[0]
+        task.status = "completed"
+        task.save()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_detail_etag_and_last_modified(self):
+        url = reverse("api_task_detail", args=[self.tasks[0].id])
+        response = self.client.get(url)
+        self.assertEqual(response.json()["title"], "Api task 0")
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_NONE_MATCH=response["ETag"]
+            ).status_code,
+            304,
+        )
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            ).status_code,
+            304,
+        )
+        self.user.email = "api-renamed@gmail.com"
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["assigned_to_email"], "api-renamed@gmail.com"
+        )
+
+    def test_comments_subtasks_and_visibility(self):
+        task = self.tasks[0]
+        SubTask.objects.create(
+            parent_task=task, title="Api child", assigned_to=self.user
+        )
+        comments = self.client.get(
+            reverse("api_task_comments", args=[task.id])
+        )
+        self.assertEqual(
+            [row["comment_text"] for row in comments.json()["results"]],
+            ["First comment"],
+        )
+        subtasks = self.client.get(
+            reverse("api_task_subtasks", args=[task.id])
+        )
+        self.assertEqual(subtasks.json()["results"][0]["title"], "Api child")
+        hidden = Task.objects.get(title="Hidden task")
+        self.assertEqual(
+            self.client.get(
+                reverse("api_task_detail", args=[hidden.id])
+            ).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse("api_task_list"), {"cursor": "bogus"}
+            ).status_code,
+            400,
+        )
+        self.client.logout()
+        self.assertEqual(
+            self.client.get(reverse("api_task_list")).status_code, 403
+        )
+
+
+class SeedDataTestCase(TestCase):
+    def seed(self, **options):
+        return Seeder(users=8, tasks=60, comments=150, subtasks=90, **options)
+
+    def test_seed_is_deterministic_and_consistent(self):
+        created = self.seed(seed=7, prefix="one").run()
+        self.assertEqual(
+            created, {"users": 8, "tasks": 60, "comments": 150, "subtasks": 90}
+        )
+        first = list(Task.objects.values_list("title", "status", "priority"))
+        Task.all_objects.all().delete()
+        self.seed(seed=7, prefix="two").run()
+        self.assertEqual(
+            list(Task.objects.values_list("title", "status", "priority")),
+            first,
+        )
+        for task in Task.objects.all():
+            subtasks = task.subtasks.all()
+            self.assertEqual(task.subtask_total, subtasks.count())
+            self.assertEqual(
+                task.subtask_completed,
+                subtasks.filter(status="completed").count(),
+            )
+            if task.status == "completed":
+                self.assertEqual(task.subtask_completed, task.subtask_total)
+
+    def test_skew_and_derived_tables(self):
+        self.seed(seed=1).run()
+        busiest = User.objects.get(email="seed-user-00000@example.com")
+        quietest = User.objects.get(email="seed-user-00007@example.com")
+        self.assertGreater(busiest.tasks.count(), quietest.tasks.count())
+        self.assertEqual(
+            get_dashboard_counts(busiest).total,
+            Task.objects.filter(
+                Q(assigned_to=busiest) | Q(assigned_by=busiest)
+            ).count(),
+        )
+        self.assertTrue(search_tasks("report", busiest))
+
+    def test_benchmark_measures_every_view(self):
+        self.seed(seed=2).run()
+        user = User.objects.get(email="seed-user-00000@example.com")
+        results = run_benchmark(Client(), user, repeat=2)
+        self.assertIn("home_page", results)
+        self.assertNotIn("delete_task", results)
+        self.assertTrue(
+            all(row["status"] < 500 for row in results.values()), results
+        )
+        self.assertEqual(Task.objects.count(), 60)
+        row = results["api_task_list"]
+        self.assertLessEqual(row["p50_ms"], row["p95_ms"])
+        self.assertGreater(row["queries"], 0)
+
+
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="metrics@gmail.com", password="metrics123"
+        )
+        self.client.login(email="metrics@gmail.com", password="metrics123")
+
+    def value(self, line_start):
+        for line in registry.exposition().splitlines():
+            if line.startswith(line_start + " "):
+                return float(line.rsplit(" ", 1)[1])
+        return 0.0
+
+    def test_requests_recorded_per_view(self):
+        requests = (
+            'http_requests_total{view="home_page",method="GET",status="200"}'
+        )
+        queries = 'http_request_db_queries_count{view="home_page"}'
+        before = self.value(requests), self.value(queries)
+        self.client.get(reverse("home_page"))
+        self.client.get(reverse("home_page"))
+        self.assertEqual(self.value(requests), before[0] + 2)
+        self.assertEqual(self.value(queries), before[1] + 2)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="home_page",'
+            'method="GET",le="+Inf"}',
+            text,
+        )
+
+    def test_email_counters(self):
+        queued = 'task_emails_queued_total{kind="assignment",result="queued"}'
+        before = self.value(queued)
+        task = Task.objects.create(
+            title="Mail metrics",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        send_update_mail(task)
+        self.assertEqual(self.value(queued), before + 1)
+
+    def test_processes_are_summed_from_metrics_dir(self):
+        other = 'task_emails_delivered_total{result="dead"}'
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "999999.json"), "w") as f:
+                json.dump([["task_emails_delivered_total", ["dead"], 3]], f)
+            with override_settings(METRICS_DIR=directory):
+                before = self.value(other)
+                self.client.get(reverse("home_page"))
+                self.assertTrue(
+                    os.path.exists(
+                        os.path.join(directory, f"{os.getpid()}.json")
+                    )
+                )
+            self.assertEqual(before, self.value(other) + 3)
+
+    def test_unknown_methods_share_one_label(self):
+        for method in ("FOO1", "FOO2"):
+            self.client.generic(method, reverse("home_page"))
+        text = registry.exposition()
+        self.assertNotIn('method="FOO', text)
+        self.assertIn('view="home_page",method="other"', text)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_set(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 401)
+        response = self.client.get(
+            reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class AsyncViewsTestMixin:
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="async@gmail.com", password="async1234"
+        )
+        self.task = Task.objects.create(
+            title="Async task",
+            description="budget report",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        Comment.objects.create(
+            comment_text="Async comment",
+            task_reference=self.task,
+            user_reference=self.user,
+        )
+        self.client.login(email="async@gmail.com", password="async1234")
+
+    def pages(self):
+        return {
+            "home_page": self.client.get(reverse("home_page")),
+            "task_details": self.client.get(
+                reverse("task_details", args=[self.task.id])
+            ),
+            "comment_show": self.client.get(
+                reverse("comment_show", args=[self.task.id])
+            ),
+            "task_search": self.client.get(
+                reverse("task_search"), {"q": "budget"}
+            ),
+        }
+
+    def assertPagesMatch(self):
+        sync_pages = self.pages()
+        with async_views(True):
+            async_pages = self.pages()
+            for name, response in async_pages.items():
+                view_class = response.resolver_match.func.view_class
+                self.assertTrue(view_class.__name__.startswith("Async"))
+        for name, response in async_pages.items():
+            self.assertEqual(response.status_code, 200, name)
+            for text in ("Async task", "Async comment"):
+                self.assertEqual(
+                    text in response.content.decode(),
+                    text in sync_pages[name].content.decode(),
+                    (name, text),
+                )
+
+
+@override_settings(ASYNC_PARALLEL_QUERIES=False)
+class AsyncViewsTestCase(AsyncViewsTestMixin, TestCase):
+    def test_async_views_render_like_sync_views(self):
+        self.assertPagesMatch()
+
+    def test_async_views_login_and_missing_task(self):
+        with async_views(True):
+            response = self.client.get(reverse("comment_show", args=[999]))
+            self.assertEqual(response.status_code, 404)
+            self.client.logout()
+            response = self.client.get(reverse("home_page"))
+            self.assertEqual(response.status_code, 302)
+
+    def test_metrics_count_async_queries(self):
+        line = 'http_request_db_queries_sum{view="comment_show"}'
+        before = next(
+            (
+                float(row.rsplit(" ", 1)[1])
+                for row in registry.exposition().splitlines()
+                if row.startswith(line + " ")
+            ),
+            0.0,
+        )
+        with async_views(True):
+            self.client.get(reverse("comment_show", args=[self.task.id]))
+        after = next(
+            float(row.rsplit(" ", 1)[1])
+            for row in registry.exposition().splitlines()
+            if row.startswith(line + " ")
+        )
+        self.assertGreaterEqual(after - before, 3)
+
+
+@override_settings(ASYNC_PARALLEL_QUERIES=True)
+class ParallelQueriesTestCase(AsyncViewsTestMixin, TransactionTestCase):
+    def test_parallel_queries_on_separate_connections(self):
+        self.assertPagesMatch()
+
+
+class CommentThreadTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="thread@gmail.com", password="thread1234"
+        )
+        self.task = Task.objects.create(
+            title="Long thread",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.client.login(email="thread@gmail.com", password="thread1234")
+
+    def add_comment(self, text):
+        return Comment.objects.create(
+            task_reference=self.task,
+            user_reference=self.user,
+            comment_text=text,
+        )
+
+    def counters(self):
+        self.task.refresh_from_db()
+        return self.task.comment_count, self.task.last_comment_at
+
+    def test_counters_follow_inserts_and_deletes(self):
+        self.assertEqual(self.counters(), (0, None))
+        first = self.add_comment("first")
+        second = self.add_comment("second")
+        self.assertEqual(self.counters(), (2, second.created))
+        second.comment_text = "edited"
+        second.save()
+        self.assertEqual(self.counters(), (2, second.created))
+        second.delete()
+        self.assertEqual(self.counters(), (1, first.created))
+        first.delete()
+        self.assertEqual(self.counters(), (0, None))
+
+    def test_deleting_task_or_author_cascades(self):
+        self.add_comment("by the author")
+        other = User.objects.create_user(
+            email="other@gmail.com", password="other1234"
+        )
+        Comment.objects.create(
+            task_reference=self.task, user_reference=other, comment_text="x"
+        )
+        other.delete()
+        self.assertEqual(self.counters()[0], 1)
+        self.task.delete()
+        self.assertFalse(Comment.objects.exists())
+
+    def test_row_shows_current_count(self):
+        fragments.get_cache().clear()
+        self.client.get(reverse("home_page"))
+        self.add_comment("new")
+        response = self.client.get(reverse("home_page"))
+        self.assertContains(
+            response, '<td data-field="comment_count">1</td>', html=True
+        )
+
+    @mock.patch("task_management_app.pagination.PAGE_SIZE", 2)
+    def test_load_more_pages_newest_first(self):
+        comments = [self.add_comment(f"comment {i}") for i in range(5)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("comment_show", args=[self.task.id])
+            )
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+        self.assertContains(response, "All Comments (5)")
+        self.assertEqual(list(response.context["comments"]), comments[:2:-1])
+        url = reverse("comment_more", args=[self.task.id])
+        seen, cursor = [], response.context["page"].next_cursor
+        while cursor:
+            data = self.client.get(url, {"cursor": cursor}).json()
+            seen.append(data["html"])
+            cursor = data["next"]
+        html = "".join(seen)
+        self.assertLess(html.index("comment 2"), html.index("comment 0"))
+        self.assertNotIn("comment 4", html)
+        bad = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_seeded_counts(self):
+        Seeder(users=3, tasks=5, comments=12, subtasks=0).run()
+        for task in Task.objects.exclude(pk=self.task.pk):
+            self.assertEqual(task.comment_count, task.comments.count())
+
+
+class BulkTaskActionTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.lead = User.objects.create_user(
+            email="bulklead@gmail.com", password="lead1234"
+        )
+        self.member = User.objects.create_user(
+            email="bulkmember@gmail.com", password="member1234"
+        )
+        self.outsider = User.objects.create_user(
+            email="outsider@gmail.com", password="outsider1234"
+        )
+        self.tasks = [
+            Task.objects.create(
+                title=f"Bulk task {i}",
+                assigned_to=self.lead,
+                assigned_by=self.lead,
+                end_date="2024-12-24",
+                status="pending",
+                priority="low" if i % 2 else "high",
+            )
+            for i in range(6)
+        ]
+        self.foreign = Task.objects.create(
+            title="Not mine",
+            assigned_to=self.outsider,
+            assigned_by=self.outsider,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        for user in (self.lead, self.member, self.outsider):
+            get_dashboard_counts(user)
+        self.client.login(email="bulklead@gmail.com", password="lead1234")
+        self.url = reverse("api_task_bulk")
+
+    def assertCountersConsistent(self):
+        for user in (self.lead, self.member, self.outsider):
+            counter = get_dashboard_counts(user)
+            expected = count_tasks(visible_tasks(user))
+            self.assertEqual(
+                {field: getattr(counter, field) for field in expected},
+                expected,
+            )
+
+    def test_status_by_ids_is_one_update(self):
+        subtask = SubTask.objects.create(
+            parent_task=self.tasks[0],
+            title="Step",
+            status="pending",
+            assigned_to=self.lead,
+        )
+        ids = [task.pk for task in self.tasks[:4]] + [self.foreign.pk]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url,
+                {"action": "status", "status": "completed", "ids": ids},
+            )
+        self.assertEqual(
+            response.json(),
+            {"action": "status", "matched": 4, "updated": 4, "emails": 4},
+        )
+        task_updates = [
+            q
+            for q in queries
+            if q["sql"].startswith('UPDATE "task_management_app_task"')
+        ]
+        self.assertEqual(len(task_updates), 1)
+        self.assertEqual(Task.objects.filter(status="completed").count(), 4)
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, "pending")
+        subtask.refresh_from_db()
+        self.assertEqual(subtask.status, "completed")
+        self.tasks[0].refresh_from_db()
+        self.assertEqual(self.tasks[0].subtask_completed, 1)
+        self.assertEqual(OutboxEmail.objects.count(), 4)
+        self.assertCountersConsistent()
+
+    def test_reassign_by_filter_moves_participants(self):
+        response = self.client.post(
+            self.url,
+            {
+                "action": "reassign",
+                "assigned_to": self.member.pk,
+                "where_priority": "low",
+            },
+        )
+        self.assertEqual(response.json()["updated"], 3)
+        self.assertEqual(visible_tasks(self.member).count(), 3)
+        self.assertEqual(visible_tasks(self.lead).count(), 6)
+        self.assertEqual(
+            TaskParticipant.objects.filter(
+                user=self.lead, role="assigned_by"
+            ).count(),
+            3,
+        )
+        mails = OutboxEmail.objects.filter(subject="Task Assigned")
+        self.assertEqual(mails.count(), 3)
+        self.assertCountersConsistent()
+        again = self.client.post(
+            self.url,
+            {
+                "action": "reassign",
+                "assigned_to": self.member.pk,
+                "where_priority": "low",
+            },
+        )
+        self.assertEqual(again.json()["updated"], 0)
+
+    def test_delete_cascades(self):
+        Comment.objects.create(
+            task_reference=self.tasks[0],
+            user_reference=self.member,
+            comment_text="gone soon",
+        )
+        SubTask.objects.create(
+            parent_task=self.tasks[0],
+            title="Step",
+            status="pending",
+            assigned_to=self.member,
+        )
+        response = self.client.post(
+            self.url, {"action": "delete", "where_status": "pending"}
+        )
+        self.assertEqual(response.json()["updated"], 6)
+        self.assertEqual(list(Task.objects.all()), [self.foreign])
+        self.assertCountersConsistent()
+        self.assertEqual(search_tasks("bulk", self.lead), [])
+        self.assertEqual(PurgeWorker().drain(), (6, 8))
+        self.assertEqual(list(Task.all_objects.all()), [self.foreign])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(SubTask.objects.exists())
+
+    def test_invalid_requests(self):
+        missing_value = self.client.post(self.url, {"action": "status"})
+        self.assertEqual(missing_value.status_code, 400)
+        no_selection = self.client.post(
+            self.url, {"action": "priority", "priority": "high"}
+        )
+        self.assertEqual(no_selection.status_code, 400)
+        self.client.logout()
+        anonymous = self.client.post(
+            self.url, {"action": "delete", "where_status": "pending"}
+        )
+        self.assertEqual(anonymous.status_code, 403)
+        self.assertEqual(Task.objects.count(), 7)
+
+    def test_admin_action(self):
+        User.objects.create_superuser(
+            email="boss@gmail.com", password="boss1234"
+        )
+        self.client.login(email="boss@gmail.com", password="boss1234")
+        response = self.client.post(
+            reverse("admin:task_management_app_task_changelist"),
+            {
+                "action": "bulk_priority_medium",
+                "_selected_action": [self.tasks[0].pk, self.foreign.pk],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Task.objects.filter(priority="medium").count(), 2)
+
+
+class SoftDeleteTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="deleter@gmail.com", password="deleter1234"
+        )
+        self.task = Task.objects.create(
+            title="Huge thread",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.kept = Task.objects.create(
+            title="Kept task",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        for task in (self.task, self.kept):
+            Comment.objects.bulk_create(
+                Comment(
+                    task_reference=task,
+                    user_reference=self.user,
+                    comment_text=f"comment {i}",
+                )
+                for i in range(7)
+            )
+            SubTask.objects.create(
+                parent_task=task,
+                title="Step",
+                status="pending",
+                assigned_to=self.user,
+            )
+        get_dashboard_counts(self.user)
+        self.client.login(email="deleter@gmail.com", password="deleter1234")
+
+    def test_delete_view_hides_task_without_deleting_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("delete_task", args=[self.task.id])
+            )
+        self.assertRedirects(response, reverse("home_page"))
+        hard_deletes = tuple(
+            f'DELETE FROM "task_management_app_{table}"'
+            for table in ("task", "comment", "subtask")
+        )
+        self.assertFalse(
+            [q for q in queries if q["sql"].startswith(hard_deletes)]
+        )
+        self.assertEqual(list(Task.objects.all()), [self.kept])
+        deleted = Task.all_objects.get(pk=self.task.pk)
+        self.assertIsNotNone(deleted.deleted_at)
+        self.assertEqual(Comment.objects.count(), 14)
+        self.assertEqual(get_dashboard_counts(self.user).total, 1)
+        self.assertEqual(search_tasks("huge", self.user), [])
+        for name in ("task_details", "comment_show", "api_task_detail"):
+            url = reverse(name, args=[self.task.id])
+            self.assertEqual(self.client.get(url).status_code, 404)
+        more = self.client.get(reverse("comment_more", args=[self.task.id]))
+        self.assertEqual(more.json()["html"].strip(), "")
+
+    def test_stale_instance_does_not_undelete(self):
+        stale = Task.objects.get(pk=self.task.pk)
+        self.client.get(reverse("delete_task", args=[self.task.id]))
+        stale.title = "Renamed"
+        stale.save()
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertEqual(get_dashboard_counts(self.user).total, 1)
+
+    def test_purge_in_chunks(self):
+        self.client.get(reverse("delete_task", args=[self.task.id]))
+        worker = PurgeWorker(chunk_size=3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(worker.drain(), (1, 9))
+        comment_deletes = [
+            q
+            for q in queries
+            if q["sql"].startswith('DELETE FROM "task_management_app_comment"')
+        ]
+        self.assertEqual(len(comment_deletes), 3)
+        self.assertFalse(Task.all_objects.filter(pk=self.task.pk).exists())
+        self.assertEqual(self.kept.comments.count(), 7)
+        self.assertEqual(self.kept.subtasks.count(), 1)
+        self.assertEqual(worker.drain(), (0, 0))
+
+    def test_purge_waits_for_grace_period(self):
+        self.client.get(reverse("delete_task", args=[self.task.id]))
+        out = io.StringIO()
+        call_command("purge_deleted_tasks", purge_after=3600, stdout=out)
+        self.assertTrue(Task.all_objects.filter(pk=self.task.pk).exists())
+        call_command("purge_deleted_tasks", stdout=out)
+        self.assertIn("Purged 1 tasks", out.getvalue())
+        self.assertFalse(Task.all_objects.filter(pk=self.task.pk).exists())
+
+
+class TaskArchiveTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="archivist@gmail.com", password="archive1234"
+        )
+        self.old, self.recent, self.open = [
+            Task.objects.create(
+                title=title,
+                description="quarterly ledger",
+                assigned_to=self.user,
+                assigned_by=self.user,
+                end_date="2024-12-24",
+                status=status,
+                priority="low",
+            )
+            for title, status in (
+                ("Old report", "completed"),
+                ("Recent report", "completed"),
+                ("Open report", "pending"),
+            )
+        ]
+        Comment.objects.create(
+            task_reference=self.old,
+            user_reference=self.user,
+            comment_text="signed by the auditor",
+        )
+        SubTask.objects.create(
+            parent_task=self.old,
+            title="Collect receipts",
+            status="completed",
+            assigned_to=self.user,
+        )
+        Task.objects.filter(pk__in=[self.old.pk, self.open.pk]).update(
+            modified="2020-01-01T00:00:00Z"
+        )
+        get_dashboard_counts(self.user)
+        self.client.login(email="archivist@gmail.com", password="archive1234")
+
+    def test_moves_old_completed_tasks_with_their_rows(self):
+        self.assertEqual(TaskArchiver(timedelta(days=30)).run(), 1)
+        self.assertEqual(set(Task.all_objects.all()), {self.recent, self.open})
+        archived = ArchivedTask.objects.get()
+        self.assertEqual(archived.pk, self.old.pk)
+        self.assertEqual(archived.comment_count, 1)
+        self.assertEqual(
+            archived.comments.get().comment_text, "signed by the auditor"
+        )
+        self.assertEqual(archived.subtasks.get().title, "Collect receipts")
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(SubTask.objects.exists())
+        counts = get_dashboard_counts(self.user)
+        self.assertEqual((counts.total, counts.completed), (2, 1))
+        self.assertEqual(TaskArchiver(timedelta(days=30)).run(), 0)
+
+    def test_archived_tasks_only_on_request(self):
+        TaskArchiver(timedelta(days=30)).run()
+        self.assertNotContains(
+            self.client.get(reverse("home_page")), "Old report"
+        )
+        url = reverse("task_search")
+        self.assertNotContains(
+            self.client.get(url, {"q": "auditor"}), "Old report"
+        )
+        response = self.client.get(url, {"q": "auditor", "archived": "1"})
+        self.assertContains(response, "Old report")
+        self.assertEqual(
+            search_archived_tasks("ledger report", self.user),
+            [ArchivedTask.objects.get()],
+        )
+        export = reverse("task_export")
+        live = b"".join(self.client.get(export).streaming_content)
+        self.assertNotIn(b"Old report", live)
+        everything = b"".join(
+            self.client.get(export, {"archived": "1"}).streaming_content
+        ).decode()
+        self.assertEqual(len(everything.splitlines()), 4)
+        self.assertIn("Old report", everything)
+        comments = b"".join(
+            self.client.get(
+                export, {"kind": "comments", "archived": "1"}
+            ).streaming_content
+        )
+        self.assertIn(b"signed by the auditor", comments)
+
+    def test_command_measures(self):
+        User.objects.create_superuser(
+            email="dba@gmail.com", password="dba12345"
+        )
+        out = io.StringIO()
+        call_command("archive_tasks", days=30, measure=True, stdout=out)
+        self.assertIn("Archived 1 tasks", out.getvalue())
+        self.assertIn("tasks      3 -> 2", out.getvalue())
+
+
+# the test database stands in for the replica: the routing decisions
+# are checked on request.routing, the queries all work
+@override_settings(REPLICA_DATABASES=["default"])
+class ReplicaRoutingTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            email="reader@gmail.com", password="reader1234"
+        )
+        self.task = Task.objects.create(
+            title="Replicated task",
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.client.force_login(self.user)
+        self.client.cookies.pop(STICKY_COOKIE, None)
+
+    def routing(self, response):
+        return response.wsgi_request.routing
+
+    def test_only_read_only_views_use_the_replica(self):
+        for name, args in (
+            ("task_view", []),
+            ("task_details", [self.task.id]),
+            ("comment_show", [self.task.id]),
+            ("api_task_list", []),
+        ):
+            response = self.client.get(reverse(name, args=args))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.routing(response).read_database, "default")
+            self.assertNotIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(reverse("home_page"))
+        self.assertIsNone(self.routing(response).read_database)
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        response = self.client.post(
+            reverse("comment_data", args=[self.task.id]),
+            {"comment_text": "fresh comment"},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = self.client.get(
+            reverse("comment_show", args=[self.task.id])
+        )
+        self.assertTrue(self.routing(response).pinned)
+        self.assertIsNone(self.routing(response).read_database)
+        self.assertContains(response, "fresh comment")
+        self.client.cookies[STICKY_COOKIE] = "0"
+        response = self.client.get(
+            reverse("comment_show", args=[self.task.id])
+        )
+        self.assertEqual(self.routing(response).read_database, "default")
+
+    def test_outside_requests_everything_goes_to_the_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(Task))
+        self.assertEqual(router.db_for_write(Task), "default")
+        state = RoutingState()
+        token = routing.set(state)
+        try:
+            state.use_replica()
+            self.assertEqual(router.db_for_read(Task), "default")
+            self.assertIsNone(router.db_for_read(Session))
+            router.db_for_write(Task)
+            self.assertIsNone(router.db_for_read(Task))
+        finally:
+            routing.reset(token)
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+    def pool(self, **options):
+        def connect():
+            return sqlite3.connect(":memory:", check_same_thread=False)
+
+        return ConnectionPool(connect, name="test", **options)
+
+    def checkouts(self, result):
+        totals = registry.collect()
+        return totals.get(("db_pool_checkouts_total", ("test", result)), 0)
+
+    def test_connections_are_reused_up_to_max_size(self):
+        pool = self.pool(max_size=1, timeout=0.05)
+        first = pool.acquire()
+        timeouts = self.checkouts("timeout")
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(self.checkouts("timeout"), timeouts + 1)
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual((pool.size, pool.opened), (1, 1))
+
+    def test_checkout_waits_for_a_release(self):
+        pool = self.pool(max_size=1, timeout=5)
+        first = pool.acquire()
+        threading.Timer(0.05, pool.release, [first]).start()
+        self.assertIs(pool.acquire(), first)
+
+    def test_broken_connections_are_replaced(self):
+        pool = self.pool(max_size=1)
+        first = pool.acquire()
+        pool.release(first)
+        first.close()
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertEqual((pool.size, pool.opened), (1, 2))
+
+    def test_idle_connections_beyond_min_size_are_closed(self):
+        pool = self.pool(min_size=1, max_size=3, max_idle=0)
+        pool.fill()
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+        borrowed = [pool.acquire() for _ in range(3)]
+        for each in borrowed:
+            pool.release(each)
+        pool.acquire()
+        self.assertEqual((pool.size, pool.idle), (1, 0))
+        pool.close()
+
+
+class RecordingBroker(Broker):
+    listening = True
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+        self.published = []
+
+    def publish(self, notices):
+        self.batches.append(notices)
+        self.published.extend(self.events(notices))
+
+
+class TaskEventsTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="owner@gmail.com", password="owner1234"
+        )
+        self.worker = User.objects.create_user(
+            email="worker@gmail.com", password="worker1234"
+        )
+        self.other = User.objects.create_user(
+            email="other@gmail.com", password="other1234"
+        )
+        self.task = Task.objects.create(
+            title="Live task",
+            assigned_to=self.worker,
+            assigned_by=self.owner,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.broker = RecordingBroker()
+        patcher = mock.patch(
+            "task_management_app.events.get_broker", return_value=self.broker
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def published(self, work):
+        self.broker.batches, self.broker.published = [], []
+        with self.captureOnCommitCallbacks(execute=True):
+            work()
+        return self.broker.published
+
+    def test_changes_are_published_to_the_users_on_the_task(self):
+        def complete():
+            self.task.status = "completed"
+            self.task.save()
+
+        [(users, event)] = self.published(complete)
+        self.assertEqual(users, {self.owner.pk, self.worker.pk})
+        self.assertEqual(event["type"], "task")
+        self.assertEqual(event["task"]["status"], "completed")
+
+        [(users, event)] = self.published(
+            lambda: Comment.objects.create(
+                task_reference=self.task,
+                user_reference=self.owner,
+                comment_text="done?",
+            )
+        )
+        self.assertEqual(event["type"], "comment")
+        self.assertEqual(event["task"]["comment_count"], 1)
+
+    def test_bulk_reassignment_reaches_the_previous_assignee(self):
+        [(users, event)] = self.published(
+            lambda: bulk_update_tasks(
+                Task.objects.filter(pk=self.task.pk), "reassign", self.other
+            )
+        )
+        self.assertEqual(users, {self.owner.pk, self.worker.pk, self.other.pk})
+        self.assertEqual(event["task"]["assigned_to_id"], self.other.pk)
+        [(users, event)] = self.published(
+            lambda: bulk_update_tasks(
+                Task.objects.filter(pk=self.task.pk), "delete"
+            )
+        )
+        self.assertTrue(event["deleted"])
+
+    def test_bulk_changes_go_out_in_one_batch_of_small_payloads(self):
+        Task.objects.bulk_create(
+            Task(
+                title=f"Bulk {number}",
+                assigned_to=self.worker,
+                assigned_by=self.owner,
+                end_date="2024-12-24",
+                status="pending",
+                priority="low",
+            )
+            for number in range(400)
+        )
+        published = self.published(
+            lambda: bulk_update_tasks(Task.objects.all(), "status", "ongoing")
+        )
+        self.assertEqual(len(published), 401)
+        [notices] = self.broker.batches
+        self.assertEqual(len(notices), 401)
+        chunks = list(payloads(notices))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= PAYLOAD_BYTES for chunk in chunks))
+        self.assertEqual(
+            [notice for chunk in chunks for notice in json.loads(chunk)],
+            notices,
+        )
+
+    def test_nothing_is_read_or_sent_without_streams(self):
+        broker = InProcessBroker()
+        with mock.patch(
+            "task_management_app.events.get_broker", return_value=broker
+        ), mock.patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.task.status = "completed"
+                self.task.save()
+            with self.assertNumQueries(0):
+                for callback in callbacks:
+                    callback()
+        publish.assert_not_called()
+
+    @override_settings(
+        EVENTS_HEARTBEAT_SECONDS=0.01, EVENTS_QUEUE_SIZE=2, ASYNC_VIEWS=False
+    )
+    def test_stream_sends_events_heartbeats_and_resets(self):
+        broker = InProcessBroker()
+
+        async def read():
+            chunks = stream(self.worker.pk)
+            self.assertEqual(await anext(chunks), "retry: 3000\n\n")
+            self.assertTrue(broker.listening)
+            broker.deliver({self.worker.pk}, '{"type": "task", "id": 1}')
+            broker.deliver({self.other.pk}, '{"type": "task", "id": 2}')
+            self.assertEqual(
+                await anext(chunks), 'data: {"type": "task", "id": 1}\n\n'
+            )
+            self.assertEqual(await anext(chunks), ": ping\n\n")
+            for number in range(3):
+                broker.deliver({self.worker.pk}, f'{{"id": {number}}}')
+            self.assertEqual(await anext(chunks), "event: reset\ndata: {}\n\n")
+            with self.assertRaises(StopAsyncIteration):
+                await anext(chunks)
+
+        with mock.patch(
+            "task_management_app.events.get_broker", return_value=broker
+        ):
+            asyncio.run(read())
+        self.assertFalse(broker.listening)
+
+        self.client.force_login(self.worker)
+        self.assertEqual(
+            self.client.get(reverse("task_events")).status_code, 204
+        )
+        self.client.logout()
+        self.assertEqual(
+            self.client.get(reverse("task_events")).status_code, 403
+        )
+
+
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            email="feed-owner@gmail.com", password="owner1234"
+        )
+        self.worker = User.objects.create_user(
+            email="feed-worker@gmail.com", password="worker1234"
+        )
+        self.other = User.objects.create_user(
+            email="feed-other@gmail.com", password="other1234"
+        )
+        self.task = Task.objects.create(
+            title="Synced task",
+            assigned_to=self.worker,
+            assigned_by=self.owner,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+
+    def changes(self, user, since=0, **params):
+        self.client.force_login(user)
+        response = self.client.get(
+            reverse("api_changes"), {"since": since, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def actions(self, feed):
+        return [(row["kind"], row["action"]) for row in feed["results"]]
+
+    def test_changes_come_in_order_with_current_data(self):
+        self.client.force_login(self.worker)
+        head = self.client.get(reverse("api_changes")).json()["next"]
+        comment = Comment.objects.create(
+            task_reference=self.task,
+            user_reference=self.owner,
+            comment_text="first",
+        )
+        self.task.status = "in-progress"
+        self.task.save()
+        SubTask.objects.create(
+            parent_task=self.task, title="step", assigned_to=self.worker
+        )
+        feed = self.changes(self.worker, head)
+        self.assertEqual(
+            self.actions(feed),
+            [
+                ("comment", "created"),
+                ("task", "updated"),
+                ("subtask", "created"),
+            ],
+        )
+        self.assertEqual(feed["results"][0]["data"]["id"], comment.id)
+        self.assertEqual(feed["results"][1]["data"]["status"], "in-progress")
+        self.assertFalse(feed["more"])
+        self.assertEqual(
+            self.changes(self.worker, feed["next"])["results"], []
+        )
+        self.assertEqual(self.changes(self.other)["results"], [])
+
+    def test_pages_are_bounded(self):
+        for number in range(4):
+            self.task.title = f"title {number}"
+            self.task.save()
+        first = self.changes(self.owner, limit=3)
+        self.assertEqual(len(first["results"]), 3)
+        self.assertTrue(first["more"])
+        rest = self.changes(self.owner, first["next"], limit=3)
+        self.assertEqual(len(rest["results"]), 2)
+        self.assertFalse(rest["more"])
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse("api_changes"), {"since": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_entries_of_open_transactions_are_held_back(self):
+        def entry(txid):
+            return ChangeLogEntry.objects.create(
+                kind="task",
+                action="updated",
+                object_id=self.task.pk,
+                task_id=self.task.pk,
+                assigned_to_id=self.worker.pk,
+                txid=txid,
+            )
+
+        # the transaction that took the lower id is still running
+        slow, quick = entry(7), entry(5)
+        self.client.force_login(self.worker)
+        with mock.patch.object(changelog, "horizon", return_value=6):
+            feed = self.changes(self.worker)
+            head = self.client.get(reverse("api_changes")).json()["next"]
+        self.assertEqual(
+            [row["cursor"] for row in feed["results"][1:]],
+            [f"5.{quick.pk}"],
+        )
+        self.assertEqual(feed["next"], head)
+        with mock.patch.object(changelog, "horizon", return_value=8):
+            feed = self.changes(self.worker, head)
+        self.assertEqual(
+            [row["cursor"] for row in feed["results"]], [f"7.{slow.pk}"]
+        )
+        self.assertEqual(
+            self.changes(self.worker, feed["next"])["results"], []
+        )
+
+    def test_reassigned_and_bulk_deleted_tasks(self):
+        bulk_update_tasks(
+            Task.objects.filter(pk=self.task.pk), "reassign", self.other
+        )
+        feed = self.changes(self.worker)
+        self.assertEqual(
+            self.actions(feed), [("task", "created"), ("task", "removed")]
+        )
+        self.assertIsNone(feed["results"][1]["data"])
+        bulk_update_tasks(Task.objects.filter(pk=self.task.pk), "delete")
+        self.assertEqual(
+            self.actions(self.changes(self.other)),
+            [("task", "updated"), ("task", "deleted")],
+        )
+
+    def test_compaction_keeps_the_newest_entry_per_object(self):
+        for status in ("in-progress", "completed", "pending"):
+            self.task.status = status
+            self.task.save()
+        self.task.assigned_to = self.other
+        self.task.save()
+        self.assertEqual(ChangeLogEntry.objects.count(), 6)
+        self.assertEqual(changelog.compact(timedelta(0)), 3)
+        # one entry left for each pair of users the task had
+        self.assertEqual(
+            self.actions(self.changes(self.owner)),
+            [("task", "updated"), ("task", "updated")],
+        )
+        self.assertEqual(
+            self.actions(self.changes(self.worker)),
+            [("task", "updated"), ("task", "removed")],
+        )
+
+
+class StaticAssetTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(STATIC_ROOT=directory))
+        call_command("build_assets", verbosity=0, stdout=io.StringIO())
+
+    def test_css_is_minified_under_a_hashed_name(self):
+        self.assertEqual(
+            minify_css('a  b { content: "x  ;  y" ; /* note */ color: red; }'),
+            'a b{content:"x  ;  y";color:red}',
+        )
+        url = static("css/homestyle.css")
+        self.assertRegex(url, r"^/static/css/homestyle\.[0-9a-f]{12}\.css$")
+        response = self.client.get(url)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE)
+        content = b"".join(response.streaming_content)
+        self.assertNotIn(b"/*", content)
+        self.assertIn(b".sidebar.active{", content)
+
+    def test_precompressed_variant_follows_accept_encoding(self):
+        url = static("js/events.js")
+        with open(os.path.join(settings.BASE_DIR, "static/js/events.js")) as f:
+            source = f.read().encode()
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Content-Type"], "text/javascript")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(content), source)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), source)
+
+    def test_unhashed_names_are_revalidated(self):
+        response = self.client.get("/static/js/events.js")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        response = self.client.get(
+            "/static/js/events.js",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            self.client.get("/static/../manage.py").status_code, 404
+        )
+
+
+@override_settings(ASYNC_PARALLEL_QUERIES=False)
+class ConditionalPageTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="pages@gmail.com", password="pages1234"
+        )
+        self.task = Task.objects.create(
+            title="Cached page task",
+            description="x" * 2000,
+            assigned_to=self.user,
+            assigned_by=self.user,
+            end_date="2024-12-24",
+            status="pending",
+            priority="low",
+        )
+        self.client.force_login(self.user)
+
+    def revalidate(self, url):
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_home_page_is_not_rendered_again_while_current(self):
+        url = reverse("home_page")
+        # the first visit sets the CSRF cookie, which the ETag includes
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIn("no-cache", response["Cache-Control"])
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        # session, user, the page's rows and the counter row; nothing
+        # aggregates over every task and no templates are rendered
+        self.assertEqual(len(queries), 4)
+        self.assertFalse(
+            any("SUM(" in query["sql"].upper() for query in queries)
+        )
+        with async_views(True):
+            self.assertEqual(self.revalidate(url).status_code, 304)
+        # comment counts move without touching the task's modified time
+        Comment.objects.create(
+            task_reference=self.task,
+            user_reference=self.user,
+            comment_text="new",
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(
+            self.client.get(url + "?cursor=x")["ETag"], response["ETag"]
+        )
+
+    def test_comment_edits_and_messages_are_not_served_stale(self):
+        url = reverse("comment_show", args=[self.task.id])
+        comment = Comment.objects.create(
+            task_reference=self.task,
+            user_reference=self.user,
+            comment_text="first",
+        )
+        self.assertEqual(self.revalidate(url).status_code, 304)
+        with async_views(True):
+            self.assertEqual(self.revalidate(url).status_code, 304)
+        etag = self.client.get(url)["ETag"]
+        comment.comment_text = "edited"
+        comment.save()
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+        # a page showing a message has no validators
+        self.client.post(
+            reverse("comment_data", args=[self.task.id]),
+            {"comment_text": "second"},
+        )
+        response = self.client.get(reverse("home_page"))
+        self.assertFalse(response.has_header("ETag"))
+        details = reverse("task_details", args=[self.task.id])
+        self.assertEqual(self.revalidate(details).status_code, 304)
+        missing = reverse("task_details", args=[self.task.id + 1])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_large_pages_are_compressed(self):
+        url = reverse("task_details", args=[self.task.id])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn(b"x" * 2000, gzip.decompress(response.content))
+        cached = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING="gzip",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(cached.status_code, 304)
+        response = self.client.get(
+            reverse("api_changes"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class UserAutocompleteTestCase(TestCase):
+    def setUp(self):
+        autocomplete.cache.clear()
+        self.user = User.objects.create_user(
+            email="Picker@gmail.com", password="picker1234"
+        )
+        for name in ("pia", "Pam", "peter", "p%x", "quinn"):
+            User.objects.create_user(
+                email=f"{name}@gmail.com", password="x1234567"
+            )
+        self.client.force_login(self.user)
+
+    def suggest(self, q, **params):
+        response = self.client.get(
+            reverse("api_user_autocomplete"), {"q": q, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return [row["email"] for row in response.json()["results"]]
+
+    def test_email_prefix_index_is_in_the_schema_and_the_model(self):
+        self.assertIn(
+            "user_email_prefix_idx",
+            [index.name for index in User._meta.indexes],
+        )
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, User._meta.db_table
+            )
+        self.assertTrue(constraints["user_email_prefix_idx"]["index"])
+
+    def test_prefix_lookup_is_case_insensitive_and_limited(self):
+        self.assertEqual(
+            self.suggest("P"),
+            [
+                "p%x@gmail.com",
+                "Pam@gmail.com",
+                "peter@gmail.com",
+                "pia@gmail.com",
+                "Picker@gmail.com",
+            ],
+        )
+        self.assertEqual(self.suggest("PI", limit=1), ["pia@gmail.com"])
+        self.assertEqual(self.suggest("p%"), ["p%x@gmail.com"])
+        self.assertEqual(self.suggest(""), [])
+        self.client.logout()
+        response = self.client.get(reverse("api_user_autocomplete"))
+        self.assertEqual(response.status_code, 403)
+
+    def test_hot_prefixes_are_cached_until_users_change(self):
+        self.assertEqual(len(autocomplete.suggest_users("qu")), 1)
+        with self.assertNumQueries(0):
+            autocomplete.suggest_users("QU ")
+        User.objects.create_user(email="quark@gmail.com", password="x1234567")
+        self.assertEqual(
+            [row["email"] for row in autocomplete.suggest_users("qu")],
+            ["quark@gmail.com", "quinn@gmail.com"],
+        )
+
+    def test_task_form_does_not_list_every_user(self):
+        response = self.client.get(reverse("task_create"))
+        content = response.content.decode()
+        self.assertNotIn("quinn@gmail.com", content)
+        self.assertIn(reverse("api_user_autocomplete"), content)
+        self.assertIn("js/autocomplete.js", content)
+        data = {
+            "title": "Picked",
+            "priority": "low",
+            "status": "pending",
+            "end_date": "2024-12-24",
+            "description": "picked from the suggestions",
+        }
+        response = self.client.post(
+            reverse("task_create"), {**data, "assigned_to": 999}
+        )
+        self.assertContains(response, "Select a valid choice")
+        quinn = User.objects.get(email="quinn@gmail.com")
+        form = TaskCreateForm({**data, "assigned_to": quinn.pk})
+        # the field's get() and the model's foreign key check
+        with self.assertNumQueries(2):
+            self.assertTrue(form.is_valid())
+        self.assertIn('value="quinn@gmail.com"', str(form["assigned_to"]))
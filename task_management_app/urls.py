@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     LoginView,
@@ -11,6 +12,7 @@ from .views import (
     CommentView,
     DeleteTask,
     TaskUpdateView,
+    CommentMore,
     CommentShow,
     UserCreate,
     UserList,
@@ -18,25 +20,63 @@ from .views import (
     SubTaskCreateView,
     ShowSubTasks,
     SubTaskEditView,
+    TaskImportView,
+    TaskExport,
+    TaskListApi,
+    TaskBulkAction,
+    ChangesApi,
+    UserAutocomplete,
+    TaskDetailApi,
+    TaskCommentsApi,
+    TaskSubTasksApi,
+    MetricsView,
+    TaskEvents,
+    AsyncHomePage,
+    AsyncTaskDetails,
+    AsyncCommentShow,
+    AsyncTaskSearch,
 )
 
+
+def hot_view(view, async_view):
+    """the async version of a hot read view in the ASGI deployment"""
+    return (async_view if settings.ASYNC_VIEWS else view).as_view()
+
+
 urlpatterns = [
     path("", LoginView.as_view(), name="login_form"),
     path("signup-form/", RegistrationView.as_view(), name="signup_form"),
-    path("home-page/", HomePage.as_view(), name="home_page"),
+    path("home-page/", hot_view(HomePage, AsyncHomePage), name="home_page"),
     # path('userhome/',userhome.as_view(),name="userhome"),
     path("logout-page/", LogoutPage.as_view(), name="logout_page"),
     path("profile-view/", ProfileView.as_view(), name="profile_view"),
     path("task-create/", TaskCreateView.as_view(), name="task_create"),
     path("task-view/", TaskView.as_view(), name="task_view"),
-    path("task-details/<int:id>", TaskDetails.as_view(), name="task_details"),
+    path(
+        "task-details/<int:id>",
+        hot_view(TaskDetails, AsyncTaskDetails),
+        name="task_details",
+    ),
     path("delete-task/<int:id>", DeleteTask.as_view(), name="delete_task"),
     path("comment-data/<int:id>", CommentView.as_view(), name="comment_data"),
-    path("comment-show/<int:id>", CommentShow.as_view(), name="comment_show"),
+    path(
+        "comment-show/<int:id>",
+        hot_view(CommentShow, AsyncCommentShow),
+        name="comment_show",
+    ),
+    path(
+        "comment-show/<int:id>/more",
+        CommentMore.as_view(),
+        name="comment_more",
+    ),
     path("update-task/<int:id>", TaskUpdateView.as_view(), name="update_task"),
     path("user-create/", UserCreate.as_view(), name="user_create"),
     path("user-List/", UserList.as_view(), name="user_list"),
-    path("task-search/", TaskSearch.as_view(), name="task_search"),
+    path(
+        "task-search/",
+        hot_view(TaskSearch, AsyncTaskSearch),
+        name="task_search",
+    ),
     path(
         "taskcreate-subtask/<int:id>/",
         SubTaskCreateView.as_view(),
@@ -46,4 +86,29 @@ urlpatterns = [
     path(
         "subtask/<int:id>/", SubTaskEditView.as_view(), name="subtask_editview"
     ),
+    path("task-import/", TaskImportView.as_view(), name="task_import"),
+    path("task-export/", TaskExport.as_view(), name="task_export"),
+    path("api/tasks/", TaskListApi.as_view(), name="api_task_list"),
+    path("api/tasks/bulk/", TaskBulkAction.as_view(), name="api_task_bulk"),
+    path("api/changes/", ChangesApi.as_view(), name="api_changes"),
+    path(
+        "api/users/autocomplete/",
+        UserAutocomplete.as_view(),
+        name="api_user_autocomplete",
+    ),
+    path(
+        "api/tasks/<int:id>/", TaskDetailApi.as_view(), name="api_task_detail"
+    ),
+    path(
+        "api/tasks/<int:id>/comments/",
+        TaskCommentsApi.as_view(),
+        name="api_task_comments",
+    ),
+    path(
+        "api/tasks/<int:id>/subtasks/",
+        TaskSubTasksApi.as_view(),
+        name="api_task_subtasks",
+    ),
+    path("events/", TaskEvents.as_view(), name="task_events"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
 ]
@@ -1,11 +1,44 @@
 from django.conf import settings
-from django.core.mail import send_mail
+from .metrics import EMAILS_QUEUED
+from .models import OutboxEmail
 
 
-def send_update_mail(task):
-    try:
-        subject = "Task Assigned"
-        message = f"""Task : {task.title},
+def queue_mail(subject, message, recipient_list, kind="other"):
+    """
+    Store an email in the outbox for the deliver_outbox command. Call it
+    inside the transaction that makes the change the email is about.
+    """
+    return queue_mails([(subject, message, recipient_list)], kind) == 1
+
+
+def queue_mails(mails, kind="other", batch_size=1000):
+    """
+    queue_mail for many (subject, message, recipient_list) at once, with
+    bulk inserts; returns how many were queued
+    """
+    rows = []
+    for subject, message, recipient_list in mails:
+        recipients = [email for email in recipient_list if email]
+        if not recipients:
+            EMAILS_QUEUED.inc(kind=kind, result="skipped")
+            continue
+        rows.append(
+            OutboxEmail(
+                subject=subject,
+                body=message,
+                from_email=settings.EMAIL_HOST_USER or "",
+                recipients=recipients,
+            )
+        )
+    if rows:
+        OutboxEmail.objects.bulk_create(rows, batch_size)
+        EMAILS_QUEUED.inc(len(rows), kind=kind, result="queued")
+    return len(rows)
+
+
+def assignment_mail(task):
+    subject = "Task Assigned"
+    message = f"""Task : {task.title},
                     Description: {task.description},
                     Assigned By: {task.assigned_by},
                     Priority: {task.priority}
@@ -13,18 +46,16 @@ def send_update_mail(task):
                     End Date: {task.end_date},
                     Current Status:{task.status}
         """
-        email_from = settings.EMAIL_HOST_USER
-        recipient_list = [task.assigned_to.email]
-        send_mail(subject, message, email_from, recipient_list)
-        return True
-    except Exception:
-        return False
+    return subject, message, [task.assigned_to.email]
 
 
-def send_update_status(task):
-    try:
-        subject = "Task Status Update"
-        message = f"""
+def send_update_mail(task):
+    return queue_mail(*assignment_mail(task), kind="assignment")
+
+
+def status_mail(task):
+    subject = "Task Status Update"
+    message = f"""
         Task: {task.title},
         Description: {task.description},
         Assigned By: {task.assigned_by},
@@ -33,16 +64,9 @@ def send_update_status(task):
         End Date: {task.end_date},
         Current Status: {task.status}
         """
-        email_from = settings.EMAIL_HOST_USER
-        recipient_list = [task.assigned_by]
-
-        if not recipient_list:
-            print("Recipient list is empty. Email not sent.")
-            return False
-
-        send_mail(subject, message, email_from, recipient_list)
-        print("Email sent successfully.")
-        return True
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return False
+    assigned_by = task.assigned_by
+    return subject, message, [assigned_by.email if assigned_by else None]
+
+
+def send_update_status(task):
+    return queue_mail(*status_mail(task), kind="status")
@@ -1,12 +1,49 @@
+import io
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.views import View
 from django.contrib.auth import authenticate, login, logout
 from .models import Task, User, Comment, SubTask
 from django.contrib import messages
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Max
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import patch_cache_control
 from .utils import send_update_mail, send_update_status
+from .counters import get_dashboard_counts
+from .concurrency import run_queries
+from .conditional import ConditionalPageMixin, Validators
+from .pagination import InvalidCursor, KeysetPaginator
+from .querybudget import QueryBudgetMixin
+from .routers import ReplicaReadMixin
+from .search import search_archived_tasks, search_tasks
+from .importer import TaskImporter
+from .bulk import bulk_update_tasks
+from . import changelog
+from .autocomplete import MAX_RESULTS, suggest_users
+from .visibility import (
+    VISIBLE_KEYS,
+    visible_tasks,
+    visible_tasks_by_created,
+)
+from .events import stream
+from .exporter import (
+    astream_export,
+    export_queryset,
+    parse_day,
+    stream_export,
+)
+from .fragments import render_task, render_tasks
+from .metrics import registry
 from .forms import (
     UserCreateForm,
     TaskUpdateForm,
@@ -16,6 +53,8 @@ from .forms import (
     CommentForm,
     SubTaskCreateForm,
     SubTaskForm,
+    TaskImportForm,
+    BulkTaskActionForm,
 )
 
 
@@ -66,38 +105,82 @@ class RegistrationView(View):
         return render(request, "registration.html", {"form": form})
 
 
-class HomePage(LoginRequiredMixin, View):
+class HomePage(
+    LoginRequiredMixin, ConditionalPageMixin, QueryBudgetMixin, View
+):
     """show data on homepage"""
 
+    max_queries = 7
+    # the page rows and counts, once validators() has loaded them
+    loaded = None
+
+    def validators(self, request):
+        """
+        From what the page shows: the keys, modified times and counters
+        of its rows, its neighbours' cursors and the user's dashboard
+        counts. Working them out
+        loads the same rows the page is rendered from, so a 304 costs no
+        more than the queries a full page would run anyway.
+        """
+        page, counts = self.load(request)
+        return Validators(
+            None,
+            *(
+                (
+                    task.pk,
+                    task.modified,
+                    task.assigned_to_id,
+                    task.assigned_by_id,
+                    *(
+                        getattr(task, name)
+                        for name in Task.DENORMALIZED_FIELDS
+                    ),
+                )
+                for task in page.object_list
+            ),
+            page.next_cursor,
+            page.previous_cursor,
+            counts.total,
+            counts.pending,
+            counts.in_progress,
+            counts.completed,
+        )
+
     def get(self, request):
+        return self.respond(request, *self.load(request))
+
+    def load(self, request):
+        if self.loaded is None:
+            self.loaded = (
+                self.task_page(request),
+                get_dashboard_counts(request.user),
+            )
+        return self.loaded
+
+    def task_page(self, request):
+        tasks = visible_tasks_by_created(request.user).select_related(
+            "assigned_by", "assigned_to"
+        )
+        return KeysetPaginator(tasks, keys=VISIBLE_KEYS).paginate(request)
+
+    def respond(self, request, page, counts):
         user = request.user
-        if user.is_superuser:
-            tasks = Task.objects.all().order_by("created")
-        else:
-            tasks = Task.objects.filter(
-                Q(assigned_by=user) | Q(assigned_to=user)
-            ).order_by("created")
-
-        total = tasks.count()
-        completed_tasks = tasks.filter(status="completed")
-        completed_count = completed_tasks.count()
-        in_progress_tasks = tasks.filter(status="in_progress")
-        in_progress_count = in_progress_tasks.count()
-        pending_tasks = tasks.filter(status="pending")
-        pending_count = pending_tasks.count()
+        rows = render_tasks(
+            "taskrowadmin.html" if user.is_superuser else "taskrow.html",
+            page.object_list,
+        )
 
         return render(
             request,
             "home.html" if user.is_superuser else "homepage.html",
             {
-                "tasks": tasks,
-                "total": total,
-                "completed_count": completed_count,
-                "in_progress_count": in_progress_count,
-                "pending_count": pending_count,
-                "completed_tasks": completed_tasks,
-                "in_progress_tasks": in_progress_tasks,
-                "pending_tasks": pending_tasks,
+                "tasks": page.object_list,
+                "rows": rows,
+                "page": page,
+                "total": counts.total,
+                "completed_count": counts.completed,
+                "in_progress_count": counts.in_progress,
+                "pending_count": counts.pending,
             },
         )
 
@@ -138,8 +221,9 @@ class TaskCreateView(LoginRequiredMixin, View):
         if form.is_valid():
             task = form.save(commit=False)
             task.assigned_by = request.user
-            task.save()
-            send_update_mail(task)
+            with transaction.atomic():
+                task.save()
+                send_update_mail(task)
             messages.success(request, "Task created successfully")
             return redirect("home_page")
         else:
@@ -147,26 +231,63 @@ class TaskCreateView(LoginRequiredMixin, View):
         return render(request, "taskcreateform.html", {"form": form})
 
 
-class TaskView(LoginRequiredMixin, View):
+class TaskView(LoginRequiredMixin, ReplicaReadMixin, QueryBudgetMixin, View):
     """show task list"""
 
+    max_queries = 4
+
     def get(self, request):
-        Tasks = Task.objects.all().order_by("-created")
+        tasks = Task.objects.select_related("assigned_to")
+        page = KeysetPaginator(tasks, descending=True).paginate(request)
         return render(
             request,
             "tasklist.html",
             {
-                "tasks": Tasks,
+                "tasks": page.object_list,
+                "page": page,
             },
         )
 
 
-class TaskDetails(LoginRequiredMixin, View):
+def task_validators(id, comments=False):
+    """
+    Validators of a task's page from its modified time and denormalized
+    counters, and with comments from the newest comment edit as well;
+    None when there is no such task
+    """
+    tasks = Task.objects.filter(pk=id)
+    fields = ["modified", *Task.DENORMALIZED_FIELDS]
+    if comments:
+        tasks = tasks.annotate(comments_modified=Max("comments__modified"))
+        fields.append("comments_modified")
+    row = tasks.values(*fields).first()
+    return None if row is None else Validators(None, *row.values())
+
+
+class TaskDetails(
+    LoginRequiredMixin, ReplicaReadMixin, ConditionalPageMixin, View
+):
     """show details of perticular view"""
 
+    def validators(self, request, id):
+        return task_validators(id)
+
     def get(self, request, id):
-        task = get_object_or_404(Task, id=id)
-        return render(request, "taskdetails.html", {"task": task})
+        task = get_object_or_404(self.tasks(), id=id)
+        return self.respond(request, task)
+
+    def tasks(self):
+        return Task.objects.select_related("assigned_by", "assigned_to")
+
+    def respond(self, request, task):
+        return render(
+            request,
+            "taskdetails.html",
+            {
+                "task": task,
+                "details": render_task("taskdetailsbody.html", task),
+            },
+        )
 
 
 class CommentView(View):
@@ -197,11 +318,10 @@ class CommentView(View):
 
 
 class DeleteTask(LoginRequiredMixin, View):
-    """dalete Task"""
+    """dalete Task (soft, purge_deleted_tasks removes it later)"""
 
     def get(self, request, id):
-        task = Task.objects.filter(id=id)
-        task.delete()
+        bulk_update_tasks(visible_tasks(request.user).filter(id=id), "delete")
         return redirect("home_page")
 
 
@@ -226,9 +346,9 @@ class TaskUpdateView(LoginRequiredMixin, View):
         task = get_object_or_404(Task, pk=id)
         form = TaskUpdateForm(request.POST, instance=task)
         if form.is_valid():
-            task = form.save()
-            task.save()
-            send_update_status(task)
+            with transaction.atomic():
+                task = form.save()
+                send_update_status(task)
             messages.success(request, "Task updated successfully")
             return redirect("home_page")
         else:
@@ -236,20 +356,60 @@ class TaskUpdateView(LoginRequiredMixin, View):
         return render(request, "updateform.html", {"form": form, "task": task})
 
 
-class CommentShow(LoginRequiredMixin, View):
+class CommentShow(
+    LoginRequiredMixin,
+    ReplicaReadMixin,
+    ConditionalPageMixin,
+    QueryBudgetMixin,
+    View,
+):
     """show comment for perticular Task"""
 
+    max_queries = 6
+
+    def validators(self, request, id):
+        return task_validators(id, comments=True)
+
     def get(self, request, id):
         task = get_object_or_404(Task, id=id)
-        comments = Comment.objects.filter(task_reference=task).order_by(
-            "-created"
+        return self.respond(request, task, self.comment_page(request, id))
+
+    def comment_page(self, request, id):
+        comments = Comment.objects.filter(task_reference_id=id).select_related(
+            "user_reference"
         )
-        num = comments.count()
-        if num == 1:
-            comment = comments.first()
-            return render(request, "commentshow.html", {"comment": comment})
-        else:
-            return render(request, "commentshow.html", {"comments": comments})
+        return KeysetPaginator(comments, descending=True).paginate(request)
+
+    def respond(self, request, task, page):
+        return render(
+            request,
+            "commentshow.html",
+            {"task": task, "comments": page.object_list, "page": page},
+        )
+
+
+class CommentMore(
+    LoginRequiredMixin, ReplicaReadMixin, QueryBudgetMixin, View
+):
+    """next page of a task's comments for the "load more" button"""
+
+    max_queries = 3
+
+    def get(self, request, id):
+        comments = Comment.objects.filter(
+            task_reference_id=id, task_reference__deleted_at__isnull=True
+        ).select_related("user_reference")
+        params = request.GET.copy()
+        try:
+            page = KeysetPaginator(comments, descending=True).page(
+                params.get("cursor"), params
+            )
+        except InvalidCursor:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+        html = render_to_string(
+            "commentitems.html", {"comments": page.object_list}, request
+        )
+        return JsonResponse({"html": html, "next": page.next_cursor})
 
 
 class UserCreate(LoginRequiredMixin, View):
@@ -270,32 +430,47 @@ class UserCreate(LoginRequiredMixin, View):
         return render(request, "usercreate.html", {"form": form})
 
 
-class UserList(LoginRequiredMixin, View):
+class UserList(LoginRequiredMixin, ReplicaReadMixin, QueryBudgetMixin, View):
     """show user List"""
 
+    max_queries = 4
+
     def get(self, request):
-        users = User.objects.all()
-        return render(request, "userlist.html", {"users": users})
+        page = KeysetPaginator(User.objects.all()).paginate(request)
+        return render(
+            request,
+            "userlist.html",
+            {"users": page.object_list, "page": page},
+        )
 
 
-class TaskSearch(LoginRequiredMixin, View):
-    """Search task with title,enddate,status"""
+class TaskSearch(LoginRequiredMixin, ReplicaReadMixin, QueryBudgetMixin, View):
+    """Search task by title, description and comments"""
+
+    max_queries = 6
 
     def get(self, request):
+        return render(request, "search.html", self.results(request))
+
+    def results(self, request):
         query = request.GET.get("q", "").strip()
         if query:
-            try:
-                tasks = Task.objects.filter(
-                    Q(title__icontains=query)
-                    | Q(end_date__icontains=query)
-                    | Q(status__icontains=query)
+            context = {
+                "tasks": search_tasks(query, request.user),
+                "query": query,
+            }
+            if request.GET.get("archived") == "1":
+                context["archived_tasks"] = search_archived_tasks(
+                    query, request.user
                 )
-            except Exception:
-                tasks = Task.objects.all()
-        else:
-            tasks = Task.objects.all()
-
-        return render(request, "search.html", {"tasks": tasks, "query": query})
+            return context
+        tasks = visible_tasks_by_created(request.user).select_related(
+            "assigned_by", "assigned_to"
+        )
+        page = KeysetPaginator(
+            tasks, keys=VISIBLE_KEYS, descending=True
+        ).paginate(request)
+        return {"tasks": page.object_list, "page": page, "query": query}
 
 
 class SubTaskCreateView(View):
@@ -317,14 +492,6 @@ class SubTaskCreateView(View):
             subtask = form.save(commit=False)
             subtask.parent_task = parent_task
             subtask.save()
-            if (
-                parent_task.subtasks.filter(
-                    status__in=["Pending", "In Progress"]
-                ).count()
-                == 0
-            ):
-                parent_task.status = "Completed"
-                parent_task.save()
             return redirect("home_page")
         return render(
             request,
@@ -334,40 +501,469 @@ class SubTaskCreateView(View):
 
 
 class ShowSubTasks(View):
+    """list the subtasks of a task; the rollup is kept by signals"""
+
     def get(self, request, id):
-        subtasks = SubTask.objects.filter(parent_task__id=id)
-        all_completed = all(
-            subtask.status == "completed" for subtask in subtasks
-        )
         parent_task = get_object_or_404(Task, id=id)
-        if parent_task.status == "completed":
-            all_subtasks = SubTask.objects.all()
-            for subtask in all_subtasks:
-                subtask.status = "completed"
-                subtask.save()
-        elif all_completed:
-            parent_task = get_object_or_404(Task, id=id)
-            parent_task.status = "completed"
-            parent_task.save()
-        else:
-            parent_task = get_object_or_404(Task, id=id)
-            parent_task.status = "in_progress"
-            parent_task.save()
-        return render(request, "subtasklist.html", {"subtasks": subtasks})
+        subtasks = parent_task.subtasks.select_related("assigned_to").order_by(
+            "created", "id"
+        )
+        return render(
+            request,
+            "subtasklist.html",
+            {"subtasks": subtasks, "parent_task": parent_task},
+        )
 
 
 class SubTaskEditView(View):
     def get(self, request, id):
-        subtask = get_object_or_404(SubTask, id=id)
+        subtask = get_object_or_404(
+            SubTask, id=id, parent_task__deleted_at__isnull=True
+        )
         form = SubTaskForm(instance=subtask)
         return render(request, "updatesubtask.html", {"form": form})
 
     def post(self, request, id):
-        subtask = get_object_or_404(SubTask, id=id)
-        parent_id = subtask.parent_task.id
+        subtask = get_object_or_404(
+            SubTask, id=id, parent_task__deleted_at__isnull=True
+        )
+        parent_id = subtask.parent_task_id
 
         form = SubTaskForm(request.POST, instance=subtask)
         if form.is_valid():
             form.save()
             return redirect(f"/task/{parent_id}/")
         return render(request, "updatesubtask.html", {"form": form})
+
+
+class TaskImportView(LoginRequiredMixin, View):
+    """bulk import tasks from an uploaded CSV or JSONL file (admin only)"""
+
+    def get(self, request):
+        if not request.user.is_superuser:
+            return HttpResponse("Only admins can import tasks", status=403)
+        form = TaskImportForm()
+        return render(request, "taskimport.html", {"form": form})
+
+    def post(self, request):
+        if not request.user.is_superuser:
+            return HttpResponse("Only admins can import tasks", status=403)
+        form = TaskImportForm(request.POST, request.FILES)
+        stats = None
+        if form.is_valid():
+            importer = TaskImporter(
+                dry_run=form.cleaned_data["dry_run"],
+                default_assigned_by=request.user.pk,
+            )
+            upload = io.TextIOWrapper(
+                request.FILES["file"].file, encoding="utf-8", newline=""
+            )
+            stats = importer.run(upload, form.cleaned_data["format"])
+            messages.success(request, f"Import finished: {stats}")
+        else:
+            messages.error(request, "Please correct the errors below.")
+        return render(
+            request, "taskimport.html", {"form": form, "stats": stats}
+        )
+
+
+class TaskExport(LoginRequiredMixin, ReplicaReadMixin, View):
+    """stream tasks, comments or subtasks the user can see as CSV or JSONL"""
+
+    def get(self, request):
+        kind = request.GET.get("kind", "tasks")
+        fmt = request.GET.get("format", "csv")
+        compress = request.GET.get("gzip") == "1"
+        if kind not in ("tasks", "comments", "subtasks") or fmt not in (
+            "csv",
+            "jsonl",
+        ):
+            return HttpResponse("Unknown export kind or format", status=400)
+        try:
+            rows = export_queryset(
+                kind,
+                request.user,
+                status=request.GET.get("status"),
+                email=request.GET.get("user"),
+                since=parse_day(request.GET.get("since")),
+                until=parse_day(request.GET.get("until")),
+                include_archived=request.GET.get("archived") == "1",
+            )
+        except ValueError as e:
+            return HttpResponse(str(e), status=400)
+        # the rows stream after the middleware is done routing, so they
+        # are bound to the database picked for this request now
+        rows = rows.using(rows.db)
+        filename = f"{kind}.{fmt}" + (".gz" if compress else "")
+        if isinstance(request, ASGIRequest):
+            chunks = astream_export(kind, rows, fmt, compress)
+        else:
+            chunks = stream_export(kind, rows, fmt, compress)
+        response = StreamingHttpResponse(
+            chunks,
+            content_type=(
+                "application/gzip"
+                if compress
+                else "text/csv" if fmt == "csv" else "application/x-ndjson"
+            ),
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+TASK_FIELDS = (
+    "id",
+    "title",
+    "priority",
+    "status",
+    "start_date",
+    "end_date",
+    "description",
+    "assigned_to_id",
+    "assigned_to__email",
+    "assigned_by_id",
+    "assigned_by__email",
+    "created",
+    "modified",
+)
+COMMENT_FIELDS = (
+    "id",
+    "comment_text",
+    "user_reference_id",
+    "user_reference__email",
+    "created",
+    "modified",
+)
+SUBTASK_FIELDS = (
+    "id",
+    "title",
+    "status",
+    "assigned_to_id",
+    "assigned_to__email",
+    "created",
+    "modified",
+)
+
+
+def api_row(row, fields):
+    return {field.replace("__", "_"): row[field] for field in fields}
+
+
+class ApiView(LoginRequiredMixin, ReplicaReadMixin, QueryBudgetMixin, View):
+    """
+    Read-only JSON views. Rows are fetched with .values() and every
+    response carries an ETag, so a client sending If-None-Match gets a
+    304 before any row is serialized.
+    """
+
+    raise_exception = True
+
+    def page_response(self, request, rows, fields, validators, **options):
+        """
+        One keyset page of a .values() queryset as JSON, or a 304 when the
+        client copy is current. options go to the KeysetPaginator.
+        """
+        response = validators.not_modified(request)
+        if response is not None:
+            return response
+        paginator = KeysetPaginator(rows, **options)
+        try:
+            page = paginator.page(request.GET.get("cursor"))
+        except InvalidCursor:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+        return validators.apply(
+            JsonResponse(
+                {
+                    "results": [api_row(row, fields) for row in page],
+                    "next": page.next_cursor,
+                    "previous": page.previous_cursor,
+                }
+            )
+        )
+
+    def visible_task_id(self, request, id):
+        if not visible_tasks(request.user).filter(pk=id).exists():
+            raise Http404("No such task")
+        return id
+
+
+class TaskListApi(ApiView):
+    """tasks visible to the user, newest first, optionally by status"""
+
+    max_queries = 4
+
+    def get(self, request):
+        tasks = visible_tasks_by_created(request.user)
+        if request.GET.get("status"):
+            tasks = tasks.filter(status=request.GET["status"])
+        return self.page_response(
+            request,
+            tasks.values(*TASK_FIELDS, "visible_created"),
+            TASK_FIELDS,
+            Validators.for_collection(tasks, request.GET.urlencode()),
+            keys=VISIBLE_KEYS,
+            descending=True,
+        )
+
+
+class TaskDetailApi(ApiView):
+    """a single visible task"""
+
+    max_queries = 3
+
+    def get(self, request, id):
+        tasks = visible_tasks(request.user).filter(pk=id)
+        task = tasks.values(*TASK_FIELDS).first()
+        if task is None:
+            raise Http404("No such task")
+        validators = Validators(task["modified"])
+        response = validators.not_modified(request)
+        if response is not None:
+            return response
+        return validators.apply(JsonResponse(api_row(task, TASK_FIELDS)))
+
+
+class TaskCommentsApi(ApiView):
+    """comments of a task, oldest first"""
+
+    max_queries = 5
+
+    def get(self, request, id):
+        comments = Comment.objects.filter(
+            task_reference_id=self.visible_task_id(request, id)
+        )
+        return self.page_response(
+            request,
+            comments.values(*COMMENT_FIELDS),
+            COMMENT_FIELDS,
+            Validators.for_collection(comments, request.GET.urlencode()),
+        )
+
+
+class TaskSubTasksApi(ApiView):
+    """subtasks of a task, oldest first"""
+
+    max_queries = 5
+
+    def get(self, request, id):
+        subtasks = SubTask.objects.filter(
+            parent_task_id=self.visible_task_id(request, id)
+        )
+        return self.page_response(
+            request,
+            subtasks.values(*SUBTASK_FIELDS),
+            SUBTASK_FIELDS,
+            Validators.for_collection(subtasks, request.GET.urlencode()),
+        )
+
+
+class ChangesApi(ApiView):
+    """
+    What changed in the user's tasks, comments and subtasks after the
+    since cursor, oldest first, each with the object as it is now (null
+    once it is gone), and the cursor to ask with next. Without since
+    only the current cursor comes back: take it before downloading the
+    full lists, then keep asking for the changes after it.
+    """
+
+    max_queries = 8
+    # a lagging replica could serve an entry before one below it arrives
+    read_from_replica = False
+    OBJECTS = {
+        "task": (Task.objects, TASK_FIELDS),
+        "comment": (Comment.objects, COMMENT_FIELDS),
+        "subtask": (SubTask.objects, SUBTASK_FIELDS),
+    }
+
+    def get(self, request):
+        if "since" not in request.GET:
+            return JsonResponse(
+                {"results": [], "next": changelog.head(), "more": False}
+            )
+        try:
+            since = changelog.parse_cursor(request.GET["since"])
+            size = int(request.GET.get("limit", changelog.PAGE_SIZE))
+        except ValueError:
+            return JsonResponse({"error": "invalid cursor"}, status=400)
+        size = max(1, min(size, changelog.MAX_PAGE_SIZE))
+        entries, more = changelog.changes_for(request.user, since, size)
+        wanted = {}
+        for entry in entries:
+            if entry.action in ("created", "updated"):
+                wanted.setdefault(entry.kind, set()).add(entry.object_id)
+        current = {}
+        for kind, ids in wanted.items():
+            manager, fields = self.OBJECTS[kind]
+            current[kind] = {
+                row["id"]: api_row(row, fields)
+                for row in manager.filter(pk__in=ids).values(*fields)
+            }
+        return JsonResponse(
+            {
+                "results": [
+                    {
+                        "cursor": changelog.cursor(entry),
+                        "kind": entry.kind,
+                        "action": entry.action,
+                        "id": entry.object_id,
+                        "task_id": entry.task_id,
+                        "at": entry.created,
+                        "data": (
+                            current.get(entry.kind, {}).get(entry.object_id)
+                            if entry.action in ("created", "updated")
+                            else None
+                        ),
+                    }
+                    for entry in entries
+                ],
+                "next": (
+                    changelog.cursor(entries[-1])
+                    if entries
+                    else changelog.format_cursor(*since)
+                ),
+                "more": more,
+            }
+        )
+
+
+class UserAutocomplete(ApiView):
+    """
+    Up to limit users whose email starts with q, for the assignee boxes
+    of the task and subtask forms
+    """
+
+    max_queries = 3
+
+    def get(self, request):
+        try:
+            limit = int(request.GET.get("limit", MAX_RESULTS))
+        except ValueError:
+            limit = MAX_RESULTS
+        limit = max(1, min(limit, MAX_RESULTS))
+        response = JsonResponse(
+            {"results": suggest_users(request.GET.get("q", ""), limit)}
+        )
+        # the browser answers repeated keystrokes itself for a while
+        patch_cache_control(response, private=True, max_age=60)
+        return response
+
+
+class TaskBulkAction(LoginRequiredMixin, View):
+    """
+    Apply one status, priority, reassign or delete action to many of the
+    user's tasks at once and report the affected counts as JSON
+    """
+
+    raise_exception = True
+
+    def post(self, request):
+        form = BulkTaskActionForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        action = form.cleaned_data["action"]
+        result = bulk_update_tasks(
+            form.select(visible_tasks(request.user)), action, form.value()
+        )
+        return JsonResponse({"action": action, **result})
+
+
+class MetricsView(View):
+    """
+    Prometheus metrics of every worker process, for scrapers sending
+    METRICS_TOKEN or, when no token is set, for staff users only
+    """
+
+    def get(self, request):
+        token = getattr(settings, "METRICS_TOKEN", None)
+        if token:
+            if request.headers.get("Authorization") != f"Bearer {token}":
+                return HttpResponse("Unauthorized", status=401)
+        elif not request.user.is_staff:
+            return HttpResponse("Forbidden", status=403)
+        return HttpResponse(
+            registry.exposition(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """LoginRequiredMixin for async views; the user is loaded off the loop"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(
+            request, *args, **kwargs
+        )
+
+
+class TaskEvents(AsyncLoginRequiredMixin, View):
+    """
+    Server-Sent Events stream of the changes to the tasks, subtasks and
+    comments of the user, for the pages to update in place. Only served
+    by the ASGI deployment: under WSGI a stream would hold a worker
+    thread, so the 204 tells the browser not to reconnect.
+    """
+
+    raise_exception = True
+
+    async def get(self, request):
+        if not settings.ASYNC_VIEWS:
+            return HttpResponse(status=204)
+        user = await sync_to_async(lambda: request.user)()
+        response = StreamingHttpResponse(
+            stream(None if user.is_superuser else user.pk),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        # let nginx pass events through as they come
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class AsyncHomePage(AsyncLoginRequiredMixin, HomePage):
+    """HomePage for ASGI: the task page and the counts load concurrently"""
+
+    async def async_dispatch(self, request, *args, **kwargs):
+        # loaded before the validators, which are worked out from them
+        self.loaded = tuple(
+            await run_queries(
+                lambda: self.task_page(request),
+                lambda: get_dashboard_counts(request.user),
+            )
+        )
+        return await super().async_dispatch(request, *args, **kwargs)
+
+    async def get(self, request):
+        return await sync_to_async(self.respond)(request, *self.loaded)
+
+
+class AsyncTaskDetails(AsyncLoginRequiredMixin, TaskDetails):
+    """TaskDetails for ASGI"""
+
+    async def get(self, request, id):
+        task = await self.tasks().filter(id=id).afirst()
+        if task is None:
+            raise Http404("No such task")
+        return await sync_to_async(self.respond)(request, task)
+
+
+class AsyncCommentShow(AsyncLoginRequiredMixin, CommentShow):
+    """CommentShow for ASGI: the task and its comments load concurrently"""
+
+    async def get(self, request, id):
+        task, page = await run_queries(
+            lambda: Task.objects.filter(id=id).first(),
+            lambda: self.comment_page(request, id),
+        )
+        if task is None:
+            raise Http404("No such task")
+        return await sync_to_async(self.respond)(request, task, page)
+
+
+class AsyncTaskSearch(AsyncLoginRequiredMixin, TaskSearch):
+    """TaskSearch for ASGI; the search runs without pinning the loop"""
+
+    async def get(self, request):
+        (context,) = await run_queries(lambda: self.results(request))
+        return await sync_to_async(render)(request, "search.html", context)
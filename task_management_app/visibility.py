@@ -0,0 +1,101 @@
+from django.db.models import F, Q
+from .models import ArchivedTask, Task, TaskParticipant
+
+# keyset pagination keys matching the ordering of visible_tasks_by_created
+VISIBLE_KEYS = ("visible_created", "id")
+
+
+def participant_roles(state):
+    """{user id: role} of the users on a task with the given tracked state"""
+    roles = {}
+    for field, role in (
+        ("assigned_to_id", "assigned_to"),
+        ("assigned_by_id", "assigned_by"),
+    ):
+        user_id = state[field]
+        if user_id is not None:
+            roles[user_id] = "both" if user_id in roles else role
+    return roles
+
+
+def sync_participants(task, old):
+    """bring the participant rows of a saved task in line with its users"""
+    roles = participant_roles(task.tracked_state())
+    if old is not None:
+        if participant_roles(old) == roles:
+            return
+        TaskParticipant.objects.filter(task=task).exclude(
+            user_id__in=roles
+        ).delete()
+        for user_id, role in roles.items():
+            TaskParticipant.objects.update_or_create(
+                task=task,
+                user_id=user_id,
+                defaults={"role": role, "created": task.created},
+            )
+        return
+    TaskParticipant.objects.bulk_create(
+        TaskParticipant(
+            task=task, user_id=user_id, role=role, created=task.created
+        )
+        for user_id, role in roles.items()
+    )
+
+
+def add_participants(tasks, chunk_size=5000):
+    """
+    Create the participant rows of tasks written without signals (bulk
+    import, backfill). Existing rows are left alone.
+    """
+    rows = tasks.order_by("id").values_list(
+        "id", "assigned_to_id", "assigned_by_id", "created"
+    )
+    batch = []
+    for task_id, assigned_to_id, assigned_by_id, created in rows.iterator(
+        chunk_size
+    ):
+        roles = participant_roles(
+            {
+                "assigned_to_id": assigned_to_id,
+                "assigned_by_id": assigned_by_id,
+            }
+        )
+        batch.extend(
+            TaskParticipant(
+                task_id=task_id, user_id=user_id, role=role, created=created
+            )
+            for user_id, role in roles.items()
+        )
+        if len(batch) >= chunk_size:
+            TaskParticipant.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TaskParticipant.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def visible_tasks(user):
+    """tasks a user may see: all for superusers, else the ones they are on"""
+    if user.is_superuser:
+        return Task.objects.all()
+    return Task.objects.filter(participants__user=user)
+
+
+def visible_tasks_by_created(user):
+    """
+    visible_tasks annotated with visible_created, to be paginated on
+    VISIBLE_KEYS. For regular users the ordering then comes straight from
+    the (user, created, task) participant index.
+    """
+    if user.is_superuser:
+        return Task.objects.annotate(visible_created=F("created"))
+    return visible_tasks(user).annotate(
+        visible_created=F("participants__created")
+    )
+
+
+def visible_archived_tasks(user):
+    """archived tasks a user may see, the same way as visible_tasks"""
+    if user.is_superuser:
+        return ArchivedTask.objects.all()
+    return ArchivedTask.objects.filter(
+        Q(assigned_to=user) | Q(assigned_by=user)
+    )
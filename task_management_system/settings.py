@@ -43,7 +43,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'task_management_app.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'task_management_app.assets.StaticAssetMiddleware',
+    'task_management_app.compression.CompressionMiddleware',
+    'task_management_app.routers.ReplicaRoutingMiddleware',
+    'task_management_app.querybudget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -78,15 +83,53 @@ WSGI_APPLICATION = 'task_management_system.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'your_database_name',
-        'USER': 'root',
-        'PASSWORD': 'developer',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'ENGINE': os.getenv(
+            'DATABASE_ENGINE', 'django.db.backends.postgresql'
+        ),
+        'NAME': os.getenv('DATABASE_NAME', 'your_database_name'),
+        'USER': os.getenv('DATABASE_USER', 'root'),
+        'PASSWORD': os.getenv('DATABASE_PASSWORD', 'developer'),
+        'HOST': os.getenv('DATABASE_HOST', 'localhost'),
+        'PORT': os.getenv('DATABASE_PORT', '5432'),
     }
 }
 
+# With DATABASE_ENGINE=task_management_app.backends.postgresql_pool each
+# process checks its PostgreSQL connections out of a pool (per database)
+# instead of connecting for every request
+POOLED_ENGINE = "task_management_app.backends.postgresql_pool"
+DATABASE_POOL = {
+    "min_size": int(os.getenv("DATABASE_POOL_MIN_SIZE", "2")),
+    "max_size": int(os.getenv("DATABASE_POOL_MAX_SIZE", "20")),
+    # seconds before idle connections beyond min_size are closed
+    "max_idle": float(os.getenv("DATABASE_POOL_MAX_IDLE", "300")),
+    # seconds a request waits for a connection when max_size are in use
+    "timeout": float(os.getenv("DATABASE_POOL_TIMEOUT", "10")),
+    "pre_ping": os.getenv("DATABASE_POOL_PRE_PING", "True") == "True",
+}
+if DATABASES["default"]["ENGINE"] == POOLED_ENGINE:
+    DATABASES["default"]["OPTIONS"] = {"pool": DATABASE_POOL}
+
+# Read replicas of the default database, comma separated: host[:port]
+# entries for PostgreSQL (same credentials as the primary), or file
+# names for SQLite, e.g. to try the routing locally with a copy of the
+# primary file. Read only views read from a random replica, unless the
+# client wrote less than REPLICA_STICKY_SECONDS ago.
+REPLICA_DATABASES = []
+for number, location in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICAS", "").split(",")), 1
+):
+    replica = {**DATABASES["default"], "TEST": {"MIRROR": "default"}}
+    if replica["ENGINE"].endswith("sqlite3"):
+        replica["NAME"] = location.strip()
+    else:
+        host, _, port = location.strip().partition(":")
+        replica.update(HOST=host, PORT=port or replica["PORT"])
+    DATABASES[f"replica{number}"] = replica
+    REPLICA_DATABASES.append(f"replica{number}")
+DATABASE_ROUTERS = ["task_management_app.routers.PrimaryReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -127,8 +170,78 @@ STATICFILES_DIRS=[os.path.join(BASE_DIR,'static')]
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic (run through build_assets) writes hashed, minified and
+# precompressed files that StaticAssetMiddleware serves
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "task_management_app.assets.AssetStorage"},
+}
+
 AUTH_USER_MODEL='task_management_app.User'
 
+# Cache of rendered task rows and details. FRAGMENT_CACHE_BACKEND picks
+# locmem (per process), file or redis (needs the redis package)
+FRAGMENT_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "task-fragments",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv(
+            "FRAGMENT_CACHE_LOCATION", BASE_DIR / "cache" / "fragments"
+        ),
+    },
+    "redis": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv(
+            "FRAGMENT_CACHE_LOCATION", "redis://127.0.0.1:6379/1"
+        ),
+    },
+}
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "fragments": {
+        **FRAGMENT_CACHE_BACKENDS[os.getenv("FRAGMENT_CACHE_BACKEND", "locmem")],
+        "KEY_PREFIX": "tms",
+    },
+}
+TASK_FRAGMENT_CACHE = "fragments"
+TASK_FRAGMENT_TIMEOUT = 24 * 3600
+
+# Request metrics served at /metrics. With several worker processes set
+# METRICS_DIR to a directory they share (emptied on restart); with
+# METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>",
+# without it only logged in staff users are served
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_FLUSH_SECONDS = 5
+
+# Route the hot read views to their async versions (set by asgi.py), and
+# let those run independent queries at once on separate connections. That
+# is only on by default with the pooled engine, where the extra connections
+# are reused instead of opened for every request
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
+ASYNC_PARALLEL_QUERIES = os.getenv(
+    "ASYNC_PARALLEL_QUERIES",
+    str(DATABASES["default"]["ENGINE"] == POOLED_ENGINE),
+) == "True"
+
+# Live updates streamed to the pages by the ASGI deployment. The broker
+# defaults to PostgreSQL LISTEN/NOTIFY on PostgreSQL (every worker and
+# node) and to task_management_app.events.InProcessBroker otherwise (a
+# single ASGI worker). A stream is cut short when its client falls more
+# than EVENTS_QUEUE_SIZE events or EVENTS_QUEUE_BYTES behind
+EVENTS_BROKER = os.getenv("EVENTS_BROKER")
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_STREAM_SECONDS = 300
+EVENTS_QUEUE_SIZE = 100
+EVENTS_QUEUE_BYTES = 64 * 1024
+
+# Raise instead of logging when a view goes over its query budget (DEBUG only)
+QUERY_BUDGET_RAISE = os.getenv("QUERY_BUDGET_RAISE", "False") == "True"
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -138,9 +251,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.getenv(
+    "EMAIL_BACKEND", 'django.core.mail.backends.smtp.EmailBackend'
+)
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER =os.getenv("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD")
+EMAIL_TIMEOUT = 30
+
+# Outbox delivery (manage.py deliver_outbox)
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF_SECONDS = 30
+OUTBOX_MAX_BACKOFF_SECONDS = 3600
+OUTBOX_LEASE_SECONDS = 600
+
+# Purge of soft deleted tasks (manage.py purge_deleted_tasks)
+TASK_PURGE_AFTER = int(os.getenv("TASK_PURGE_AFTER", "0"))
+TASK_PURGE_CHUNK_SIZE = 500
+
+# Change feed served at /api/changes/. Entries written after the oldest
+# transaction still open are held back, so none can commit below a cursor
+# already handed out; compact_changelog removes the entries older than
+# CHANGELOG_COMPACT_AFTER_DAYS that newer ones supersede
+CHANGELOG_PAGE_SIZE = 200
+CHANGELOG_COMPACT_AFTER_DAYS = int(
+    os.getenv("CHANGELOG_COMPACT_AFTER_DAYS", "7")
+)
+
+# Archival of old completed tasks (manage.py archive_tasks)
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv("TASK_ARCHIVE_AFTER_DAYS", "180"))
+TASK_ARCHIVE_BATCH_SIZE = 500